@@ -3,6 +3,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
 
+from .search import gan_khoa_tim_kiem
+
 class VaiTro(models.Model):
     MaVaiTro = models.CharField(max_length=20, unique=True, primary_key=True)
     TenVaiTro = models.CharField(max_length=50)
@@ -24,9 +26,18 @@ class TaiKhoan(models.Model):
     DiaChi = models.CharField(max_length=255)
     SoDienThoai = models.CharField(max_length=20, validators=[RegexValidator(r'^\d{10,11}$', 'Số điện thoại không hợp lệ')], unique=True)
     Email = models.EmailField(unique=True)
+    # Họ tên / tên không dấu, chữ thường để tìm kiếm theo tiền tố (accounts/search.py)
+    HoTenKhongDau = models.CharField(max_length=101, blank=True, default='', editable=False, db_index=True)
+    TenKhongDau = models.CharField(max_length=50, blank=True, default='', editable=False, db_index=True)
 
     def __str__(self):
         return f"{self.Ho} {self.Ten}"
 
+    def save(self, *args, **kwargs):
+        gan_khoa_tim_kiem(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'HoTenKhongDau', 'TenKhongDau'}
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'TAIKHOAN'
\ No newline at end of file
@@ -0,0 +1,174 @@
+# accounts/pagination.py
+"""
+Phân trang keyset (cursor) dùng chung cho các API danh sách.
+
+- Chỉ bật khi request có ?cursor=... hoặc ?page_size=...; nếu không, API vẫn trả về
+  danh sách đầy đủ như trước.
+- Trang sau được lấy bằng điều kiện WHERE trên các cột sắp xếp (mặc định khóa chính)
+  thay vì OFFSET, nên thời gian mỗi trang không phụ thuộc vị trí trang hay số dòng trong bảng.
+- ?estimate_total=1 thêm "count": với bảng không lọc, lấy số dòng từ thống kê của CSDL
+  (sys.dm_db_partition_stats trên SQL Server, pg_class.reltuples trên PostgreSQL);
+  với danh sách có lọc, đếm tối đa ESTIMATE_CAP dòng. "count_estimated" cho biết số đó
+  là ước lượng (hoặc là cận dưới khi chạm ESTIMATE_CAP).
+"""
+import base64
+import json
+from functools import reduce
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .search import HANG_TIM_KIEM
+
+# Số dòng đếm tối đa khi ước lượng tổng số của danh sách có lọc
+ESTIMATE_CAP = 10000
+
+
+def _uoc_luong_so_dong_bang(model, using):
+    """Số dòng của cả bảng theo thống kê của CSDL, None nếu CSDL không hỗ trợ."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'microsoft':
+        sql = (
+            "SELECT SUM(row_count) FROM sys.dm_db_partition_stats "
+            "WHERE object_id = OBJECT_ID(%s) AND index_id IN (0, 1)"
+        )
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [connection.ops.quote_name(table)])
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        # PostgreSQL trả về -1 khi bảng chưa từng được ANALYZE
+        return None
+    return int(row[0])
+
+
+def uoc_luong_tong_so(queryset):
+    """(số dòng, có phải ước lượng không) mà không COUNT(*) toàn bảng."""
+    if not queryset.query.where and not queryset.query.distinct:
+        so_dong = _uoc_luong_so_dong_bang(queryset.model, queryset.db)
+        if so_dong is not None:
+            return so_dong, True
+    so_dong = queryset.order_by()[:ESTIMATE_CAP].count()
+    return so_dong, so_dong >= ESTIMATE_CAP
+
+
+class KeysetPagination(BasePagination):
+    """
+    View có thể khai báo `keyset_ordering` (tuple tên cột, '-' để giảm dần; được dùng cột của
+    bảng liên kết như 'IDNienKhoa__TenNienKhoa', nên select_related bảng đó). Cột cuối
+    phải là duy nhất (mặc định 'id') và các cột không được NULL.
+    Kết quả phân trang: {"next": url trang sau hoặc null, "results": [...]}.
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    estimate_query_param = 'estimate_total'
+    ordering = ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        if HANG_TIM_KIEM in queryset.query.annotations:
+            # Kết quả tìm kiếm: giữ thứ hạng khớp, trong cùng hạng mới theo khóa của view
+            self.ordering = (HANG_TIM_KIEM,) + self.ordering
+        self.page_size = self._doc_page_size(params)
+        self.count = None
+        if params.get(self.estimate_query_param) in ('1', 'true'):
+            self.count, self.count_estimated = uoc_luong_tong_so(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        vi_tri = self._giai_ma(params.get(self.cursor_query_param))
+        if vi_tri is not None:
+            queryset = queryset.filter(self._sau(vi_tri))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self._vi_tri(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link()}
+        if self.count is not None:
+            payload["count"] = self.count
+            payload["count_estimated"] = self.count_estimated
+        payload["results"] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self._ma_hoa(self.next_position))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_estimated': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+    def _doc_page_size(self, params):
+        try:
+            so_dong = int(params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(so_dong, 1), self.max_page_size)
+
+    def _sau(self, vi_tri):
+        """(c1 > v1) OR (c1 = v1 AND c2 > v2) OR ... theo chiều sắp xếp của từng cột."""
+        dieu_kien = []
+        for i, (cot, gia_tri) in enumerate(zip(self.ordering, vi_tri)):
+            ten = cot.lstrip('-')
+            bang_nhau = {c.lstrip('-'): v for c, v in zip(self.ordering[:i], vi_tri[:i])}
+            so_sanh = 'lt' if cot.startswith('-') else 'gt'
+            dieu_kien.append(Q(**bang_nhau, **{f"{ten}__{so_sanh}": gia_tri}))
+        return reduce(lambda a, b: a | b, dieu_kien)
+
+    def _vi_tri(self, instance):
+        vi_tri = []
+        for cot in self.ordering:
+            ten = cot.lstrip('-')
+            if ten == HANG_TIM_KIEM:
+                vi_tri.append(getattr(instance, ten))
+                continue
+            *duong, ten = ten.split('__')
+            obj = instance
+            for buoc in duong:
+                obj = getattr(obj, buoc)
+            vi_tri.append(getattr(obj, obj._meta.get_field(ten).attname))
+        return vi_tri
+
+    def _ma_hoa(self, vi_tri):
+        data = json.dumps(vi_tri, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def _giai_ma(self, cursor):
+        if not cursor:
+            return None
+        try:
+            vi_tri = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (TypeError, ValueError):
+            raise NotFound("Con trỏ phân trang không hợp lệ.")
+        if not isinstance(vi_tri, list) or len(vi_tri) != len(self.ordering):
+            raise NotFound("Con trỏ phân trang không hợp lệ.")
+        return vi_tri
@@ -0,0 +1,59 @@
+# accounts/search.py
+"""
+Tìm kiếm họ tên không dấu bằng tiền tố, dùng được index.
+
+HocSinh và TaiKhoan lưu sẵn hai cột chuẩn hóa (chữ thường, bỏ dấu, gộp khoảng trắng),
+cập nhật mỗi lần save():
+- HoTenKhongDau: "nguyen van an"  -> tìm theo họ hoặc họ tên đầy đủ
+- TenKhongDau:   "an"             -> tìm theo tên
+Cả hai cột có index nên điều kiện LIKE 'tu khoa%' là index seek thay vì quét bảng như
+LIKE '%...%' của SearchFilter.
+"""
+import unicodedata
+
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework.filters import BaseFilterBackend
+
+# Tên annotation thứ hạng kết quả tìm kiếm (0 là khớp nhất), KeysetPagination sắp theo cột này trước
+HANG_TIM_KIEM = 'HangTimKiem'
+
+
+def bo_dau(value):
+    """'  Nguyễn Văn  Đức ' -> 'nguyen van duc'"""
+    value = unicodedata.normalize('NFD', value or '').replace('đ', 'd').replace('Đ', 'D')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.lower().split())
+
+
+def gan_khoa_tim_kiem(obj):
+    """Cập nhật HoTenKhongDau / TenKhongDau của một HocSinh hoặc TaiKhoan (chưa lưu)."""
+    obj.HoTenKhongDau = bo_dau(f"{obj.Ho} {obj.Ten}")
+    obj.TenKhongDau = bo_dau(obj.Ten)
+
+
+class TimKiemKhongDauFilter(BaseFilterBackend):
+    """
+    Thay cho SearchFilter: ?search=nguyen van / ?search=Đức.
+    Khớp khi họ tên hoặc tên bắt đầu bằng từ khóa (không phân biệt dấu, hoa thường);
+    từ khóa có '@' thì tìm theo tiền tố Email. Kết quả xếp hạng:
+    0 - tên hoặc họ tên trùng hẳn, 1 - họ tên bắt đầu bằng từ khóa, 2 - tên bắt đầu bằng từ khóa.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        tu_khoa = request.query_params.get(self.search_param, '').strip()
+        if not tu_khoa:
+            return queryset
+
+        if '@' in tu_khoa and getattr(view, 'tim_kiem_email', False):
+            return queryset.filter(Email__istartswith=tu_khoa)
+
+        tu_khoa = bo_dau(tu_khoa)
+        return queryset.filter(
+            Q(HoTenKhongDau__startswith=tu_khoa) | Q(TenKhongDau__startswith=tu_khoa)
+        ).annotate(**{HANG_TIM_KIEM: Case(
+            When(Q(TenKhongDau=tu_khoa) | Q(HoTenKhongDau=tu_khoa), then=Value(0)),
+            When(HoTenKhongDau__startswith=tu_khoa, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )}).order_by(HANG_TIM_KIEM, 'TenKhongDau', 'HoTenKhongDau', 'id')
@@ -3,9 +3,12 @@ from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.db.models import Count
 from .models import TaiKhoan, VaiTro
 from .serializers import TaiKhoanSerializer, VaiTroSerializer, UserProfileSerializer
 from .permissions import IsBGH
+from .pagination import KeysetPagination
+from .search import TimKiemKhongDauFilter
 
 # --- Views cho Admin/BGH quản lý ---
 class CreateTaiKhoanView(generics.CreateAPIView):
@@ -14,9 +17,12 @@ class CreateTaiKhoanView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated, IsBGH] # Sử dụng permission class mới
 
 class ListTaiKhoanView(generics.ListAPIView):
-    queryset = TaiKhoan.objects.all()
+    queryset = TaiKhoan.objects.select_related('user', 'MaVaiTro').all()
     serializer_class = TaiKhoanSerializer
     permission_classes = [IsAuthenticated, IsBGH]
+    pagination_class = KeysetPagination
+    filter_backends = [TimKiemKhongDauFilter]
+    tim_kiem_email = True
 
 class UpdateTaiKhoanView(generics.UpdateAPIView):
     queryset = TaiKhoan.objects.all()
@@ -50,14 +56,20 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         context.update({"request": self.request})
         return context
 
+def dem_tai_khoan_theo_vai_tro():
+    """Số tài khoản theo từng vai trò bằng một truy vấn GROUP BY: {MaVaiTro: số lượng}."""
+    return dict(TaiKhoan.objects.values_list('MaVaiTro_id').annotate(SoLuong=Count('id')).order_by())
+
+
 class DashboardStatsView(APIView):
     permission_classes = [IsAuthenticated, IsBGH]
 
     def get(self, request, *args, **kwargs):
+        theo_vai_tro = dem_tai_khoan_theo_vai_tro()
         data = {
-            'total_accounts': TaiKhoan.objects.count(),
-            'teacher_accounts': TaiKhoan.objects.filter(MaVaiTro__MaVaiTro='GiaoVien').count(),
-            'giaovu_accounts': TaiKhoan.objects.filter(MaVaiTro__MaVaiTro='GiaoVu').count(),
-            'bgh_accounts': TaiKhoan.objects.filter(MaVaiTro__MaVaiTro='BGH').count(),
+            'total_accounts': sum(theo_vai_tro.values()),
+            'teacher_accounts': theo_vai_tro.get('GiaoVien', 0),
+            'giaovu_accounts': theo_vai_tro.get('GiaoVu', 0),
+            'bgh_accounts': theo_vai_tro.get('BGH', 0),
         }
         return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -141,13 +141,45 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR")
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake", # Tên bất kỳ để định danh cache
-    }
+    },
+    # Cache kết quả báo cáo (reporting/cache.py). Mặc định dùng bộ nhớ của từng tiến trình:
+    # khi điểm thay đổi, chỉ worker ghi điểm thấy phiên bản mới, các worker khác vẫn trả kết quả
+    # cũ đến khi hết REPORT_CACHE_TIMEOUT. Triển khai nhiều worker phải đặt REPORT_CACHE_DIR
+    # để các worker dùng chung một cache trên đĩa (phiên bản được đổi cho mọi worker).
+    "baocao": (
+        {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": REPORT_CACHE_DIR,
+        }
+        if REPORT_CACHE_DIR else
+        {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "bao-cao",
+        }
+    ),
 }
 
+# Thời gian (giây) giữ một kết quả báo cáo trong cache. Cache dùng chung thì kết quả cũ đã bị
+# thay bằng phiên bản mới nên giữ lâu được; cache trong tiến trình thì đây cũng là thời gian
+# tối đa một worker khác trả báo cáo cũ, nên mặc định ngắn (đổi lại tính lại thường hơn).
+REPORT_CACHE_TIMEOUT = int(os.getenv("REPORT_CACHE_TIMEOUT", 600 if REPORT_CACHE_DIR else 30))
+
+# Cách tính báo cáo trực tiếp từ DIEMSO: "sql" (GROUP BY trong CSDL) hoặc
+# "numpy" (nạp dữ liệu dạng cột rồi tính vectorized, xem reporting/analytics.py)
+REPORT_ANALYTICS_BACKEND = os.getenv("REPORT_ANALYTICS_BACKEND", "sql")
+
+# Số tiến trình dựng học bạ (reporting/hoc_ba.py); 0 nghĩa là dựng ngay trong tiến trình web
+REPORT_CARD_PROCESSES = int(os.getenv("REPORT_CARD_PROCESSES", 2))
+
+# Font TrueType có đủ dấu tiếng Việt dùng cho học bạ PDF
+REPORT_PDF_FONT = os.getenv("REPORT_PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -0,0 +1,154 @@
+# classes/assignment.py
+"""
+Tự động phân lớp: chia học sinh chưa có lớp của một niên khóa và khối vào các lớp đã có.
+
+- Sĩ số sau khi xếp được san đều giữa các lớp (lớp ít học sinh được nhận trước) và
+  không vượt SiSoToiDa; học sinh không còn chỗ được trả về trong "KhongDuCho".
+- Mỗi lớp nhận học sinh nam/nữ/khác gần đúng tỉ lệ giới tính chung của cả khối.
+- Kế hoạch được tính hoàn toàn trong bộ nhớ (3 truy vấn đọc), nên xem trước (dry run)
+  và xếp thật cho cùng kết quả. Khi xếp thật, SiSo của mỗi lớp được cộng bằng một UPDATE có
+  điều kiện sức chứa (membership.giu_cho) rồi mọi dòng LopHoc_HocSinh được thêm bằng một
+  bulk_create, trong cùng transaction.
+"""
+import heapq
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+
+from reporting import snapshots
+from students.models import HocSinh
+from .autocomplete import tang_phien_ban_goi_y
+from .membership import VuotSiSo, cap_nhat_hang_loat, giu_cho
+from .models import LopHoc, LopHoc_HocSinh
+
+BATCH_SIZE = 500
+
+
+def _xen_ke_gioi_tinh(hoc_sinh):
+    """Sắp học sinh sao cho các giới tính xen kẽ theo tỉ lệ (vd 2 nam : 1 nữ : 2 nam ...)."""
+    theo_gioi_tinh = {}
+    for hs in hoc_sinh:
+        theo_gioi_tinh.setdefault(hs["GioiTinh"], []).append(hs)
+    thu_tu = []
+    for ds in theo_gioi_tinh.values():
+        thu_tu.extend(((i + 0.5) / len(ds), hs["id"], hs) for i, hs in enumerate(ds))
+    thu_tu.sort(key=lambda x: x[:2])
+    return [hs for _, _, hs in thu_tu]
+
+
+def _si_so_muc_tieu(lop_hoc, so_hoc_sinh_moi, si_so_toi_da):
+    """Sĩ số đích của từng lớp: mỗi chỗ mới dành cho lớp đang ít học sinh nhất còn chỗ."""
+    muc_tieu = {lop["id"]: lop["SiSo"] for lop in lop_hoc}
+    heap = [(lop["SiSo"], lop["id"]) for lop in lop_hoc if lop["SiSo"] < si_so_toi_da]
+    heapq.heapify(heap)
+    for _ in range(so_hoc_sinh_moi):
+        if not heap:
+            break
+        si_so, lop_id = heapq.heappop(heap)
+        muc_tieu[lop_id] = si_so + 1
+        if si_so + 1 < si_so_toi_da:
+            heapq.heappush(heap, (si_so + 1, lop_id))
+    return muc_tieu
+
+
+def lap_ke_hoach(IDNienKhoa, IDKhoi, si_so_toi_da):
+    """
+    Kế hoạch phân lớp, chưa ghi gì vào CSDL:
+    {"LopHoc": [{"id", "TenLop", "SiSoCu", "SiSoMoi", "GioiTinh": {...}, "HocSinhMoi": [...]}],
+     "KhongDuCho": [học sinh], "SoHocSinhChuaXep": n}
+    """
+    lop_hoc = list(
+        LopHoc.objects.filter(IDNienKhoa=IDNienKhoa, IDKhoi=IDKhoi).order_by('TenLop', 'id').values('id', 'TenLop')
+    )
+    lop_ids = [lop["id"] for lop in lop_hoc]
+
+    # Sĩ số và số học sinh theo giới tính hiện có, đếm từ danh sách lớp
+    gioi_tinh_lop = {lop_id: Counter() for lop_id in lop_ids}
+    for lop_id, gioi_tinh, so in (
+        LopHoc_HocSinh.objects.filter(IDLopHoc_id__in=lop_ids)
+        .values_list('IDLopHoc_id', 'IDHocSinh__GioiTinh').annotate(so=Count('id')).order_by()
+    ):
+        gioi_tinh_lop[lop_id][gioi_tinh] = so
+    for lop in lop_hoc:
+        lop["SiSo"] = sum(gioi_tinh_lop[lop["id"]].values())
+
+    da_phan_lop = LopHoc_HocSinh.objects.filter(IDNienKhoa=IDNienKhoa).values('IDHocSinh_id')
+    hoc_sinh = [
+        {"id": id, "HoTen": f"{ho} {ten}", "GioiTinh": gioi_tinh}
+        for id, ho, ten, gioi_tinh in HocSinh.objects.filter(IDNienKhoaTiepNhan=IDNienKhoa, KhoiDuKien=IDKhoi)
+        .exclude(pk__in=da_phan_lop).order_by('Ten', 'Ho', 'id').values_list('id', 'Ho', 'Ten', 'GioiTinh')
+    ]
+
+    muc_tieu = _si_so_muc_tieu(lop_hoc, len(hoc_sinh), si_so_toi_da)
+    tong_muc_tieu = sum(muc_tieu.values()) or 1
+
+    # Tỉ lệ giới tính chung của khối sau khi xếp (kể cả học sinh đã có lớp)
+    tong_gioi_tinh = Counter(hs["GioiTinh"] for hs in hoc_sinh)
+    for dem in gioi_tinh_lop.values():
+        tong_gioi_tinh.update(dem)
+
+    si_so = {lop["id"]: lop["SiSo"] for lop in lop_hoc}
+    moi = {lop_id: [] for lop_id in lop_ids}
+    khong_du_cho = []
+    for hs in _xen_ke_gioi_tinh(hoc_sinh):
+        ti_le = tong_gioi_tinh[hs["GioiTinh"]] / tong_muc_tieu
+        con_cho = [lop_id for lop_id in lop_ids if si_so[lop_id] < muc_tieu[lop_id]]
+        if not con_cho:
+            khong_du_cho.append(hs)
+            continue
+        # Lớp đang thiếu giới tính này nhiều nhất so với tỉ lệ chung, rồi lớp còn nhiều chỗ nhất
+        lop_id = max(con_cho, key=lambda l: (
+            ti_le * muc_tieu[l] - gioi_tinh_lop[l][hs["GioiTinh"]],
+            muc_tieu[l] - si_so[l],
+            -l,
+        ))
+        moi[lop_id].append(hs)
+        si_so[lop_id] += 1
+        gioi_tinh_lop[lop_id][hs["GioiTinh"]] += 1
+
+    return {
+        "LopHoc": [
+            {
+                "id": lop["id"], "TenLop": lop["TenLop"],
+                "SiSoCu": lop["SiSo"], "SiSoMoi": si_so[lop["id"]],
+                "GioiTinh": dict(gioi_tinh_lop[lop["id"]]),
+                "HocSinhMoi": moi[lop["id"]],
+            }
+            for lop in lop_hoc
+        ],
+        "KhongDuCho": khong_du_cho,
+        "SoHocSinhChuaXep": len(hoc_sinh),
+    }
+
+
+def phan_lop_tu_dong(IDNienKhoa, IDKhoi, si_so_toi_da, xem_truoc=False):
+    """
+    Lập kế hoạch và (nếu không phải xem trước) ghi kế hoạch vào CSDL. Ném VuotSiSo hoặc
+    IntegrityError nếu lớp/học sinh vừa bị người khác thay đổi; khi đó không ghi gì.
+    """
+    if xem_truoc:
+        return lap_ke_hoach(IDNienKhoa, IDKhoi, si_so_toi_da)
+
+    with transaction.atomic(), cap_nhat_hang_loat():
+        ke_hoach = lap_ke_hoach(IDNienKhoa, IDKhoi, si_so_toi_da)
+
+        # Giữ chỗ từng lớp bằng UPDATE có điều kiện thay vì khóa mọi lớp của khối
+        for lop in ke_hoach["LopHoc"]:
+            if lop["HocSinhMoi"] and not giu_cho(lop["id"], len(lop["HocSinhMoi"]), si_so_toi_da):
+                raise VuotSiSo(lop["id"], si_so_toi_da)
+
+        # Học sinh vừa được xếp lớp ở nơi khác -> vi phạm uq_lophoc_hocsinh_mot_lop_moi_nam
+        thanh_vien = [
+            LopHoc_HocSinh(IDLopHoc_id=lop["id"], IDHocSinh_id=hs["id"], IDNienKhoa_id=IDNienKhoa)
+            for lop in ke_hoach["LopHoc"] for hs in lop["HocSinhMoi"]
+        ]
+        LopHoc_HocSinh.objects.bulk_create(thanh_vien, batch_size=BATCH_SIZE)
+
+        # bulk_create không phát signal
+        for lop in ke_hoach["LopHoc"]:
+            if lop["HocSinhMoi"]:
+                snapshots.danh_dau_lop(lop["id"])
+        if thanh_vien:
+            tang_phien_ban_goi_y(IDNienKhoa)
+    return ke_hoach
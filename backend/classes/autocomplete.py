@@ -0,0 +1,150 @@
+# classes/autocomplete.py
+"""
+Gợi ý (typeahead) học sinh, lớp học, môn học của một niên khóa từ chỉ mục trong bộ nhớ.
+
+- Mỗi tiến trình giữ một chỉ mục cho từng niên khóa, dựng lần đầu khi được hỏi (4 truy vấn).
+- Chỉ mục là danh sách (khóa không dấu, mục) đã sắp xếp; mỗi tên có một khóa cho mỗi vị trí
+  đầu từ ("nguyen van an", "van an", "an") nên gõ họ, tên đệm hay tên đều khớp.
+  Tìm tiền tố bằng bisect, không truy vấn CSDL.
+- Chỉ mục gắn với phiên bản "goiy" của niên khóa (reporting/cache.py). Signals trong
+  classes/signals.py đổi phiên bản khi HocSinh, LopHoc, MonHoc hoặc danh sách lớp thay đổi;
+  tiến trình thấy phiên bản khác sẽ dựng lại ở lần hỏi sau.
+- Phiên bản chỉ dùng chung giữa các worker khi cache "baocao" dùng chung (REPORT_CACHE_DIR).
+  Với LocMemCache mỗi worker chỉ thấy thay đổi của chính nó, nên chỉ mục còn bị dựng lại
+  sau TUOI_TOI_DA_CHI_MUC giây: gợi ý ở worker khác cũ tối đa chừng ấy thời gian.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.search import bo_dau
+from reporting.cache import dung_chung, phien_ban, tang_phien_ban
+from students.models import HocSinh
+from subjects.models import MonHoc
+from .models import LopHoc, LopHoc_HocSinh
+
+NHOM_PHIEN_BAN = "goiy"
+LOAI = ("HocSinh", "LopHoc", "MonHoc")
+
+SO_GOI_Y = 10
+SO_GOI_Y_TOI_DA = 50
+
+# Số khóa duyệt tối đa cho một lần tìm (từ khóa quá ngắn khớp rất nhiều khóa)
+SO_KHOA_QUET_TOI_DA = 5000
+
+# Tuổi tối đa (giây) của chỉ mục khi phiên bản không dùng chung giữa các worker
+TUOI_TOI_DA_CHI_MUC = 60
+
+_chi_muc = {}
+_lock = threading.Lock()
+
+
+def tang_phien_ban_goi_y(nien_khoa_id):
+    """Gọi sau khi sửa hàng loạt (bulk_create/update) vì các thao tác đó không phát signal."""
+    transaction.on_commit(lambda: tang_phien_ban(nien_khoa_id, NHOM_PHIEN_BAN))
+
+
+class ChiMucTienTo:
+    """
+    Hai danh sách (khóa, chỉ số mục) đã sắp xếp để tìm theo tiền tố: khóa là cả tên, và khóa
+    bắt đầu từ từ thứ hai trở đi. Kết quả khớp từ đầu tên được xếp trước.
+    """
+
+    def __init__(self, muc, ten):
+        self.muc = muc
+        dau, giua = [], []
+        for i, item in enumerate(muc):
+            tu = ten(item).split()
+            dau.append((" ".join(tu), i))
+            giua.extend((" ".join(tu[j:]), i) for j in range(1, len(tu)))
+        dau.sort()
+        giua.sort()
+        self.danh_sach = [
+            ([k for k, _ in ds], [i for _, i in ds]) for ds in (dau, giua)
+        ]
+
+    def tim(self, tu_khoa, so_luong, loc=None):
+        """Các mục có một khóa bắt đầu bằng `tu_khoa`; `loc(item)` (tùy chọn) loại bớt mục."""
+        ket_qua, da_co = [], set()
+        for khoa, chi_so in self.danh_sach:
+            k = bisect_left(khoa, tu_khoa)
+            het = min(len(khoa), k + SO_KHOA_QUET_TOI_DA)
+            while k < het and len(ket_qua) < so_luong and khoa[k].startswith(tu_khoa):
+                i = chi_so[k]
+                k += 1
+                if i in da_co or (loc is not None and not loc(self.muc[i])):
+                    continue
+                da_co.add(i)
+                ket_qua.append(self.muc[i])
+        return ket_qua
+
+
+def _dung_chi_muc(nien_khoa_id):
+    thanh_vien = LopHoc_HocSinh.objects.filter(IDNienKhoa=nien_khoa_id)
+    lop_cua_hs = dict(thanh_vien.values_list('IDHocSinh_id', 'IDLopHoc_id'))
+    lop_hoc = [
+        {"id": id, "TenLop": ten, "IDKhoi": khoi, "TenKhoi": ten_khoi}
+        for id, ten, khoi, ten_khoi in LopHoc.objects.filter(IDNienKhoa=nien_khoa_id)
+        .values_list('id', 'TenLop', 'IDKhoi_id', 'IDKhoi__TenKhoi').order_by('TenLop')
+    ]
+    ten_lop = {lop["id"]: lop["TenLop"] for lop in lop_hoc}
+
+    hoc_sinh = []
+    rows = HocSinh.objects.filter(
+        Q(IDNienKhoaTiepNhan=nien_khoa_id) | Q(pk__in=thanh_vien.values('IDHocSinh_id'))
+    ).values_list('id', 'Ho', 'Ten', 'HoTenKhongDau', 'GioiTinh', 'NgaySinh', 'KhoiDuKien_id')
+    for id, ho, ten, khong_dau, gioi_tinh, ngay_sinh, khoi in rows.iterator(chunk_size=2000):
+        lop = lop_cua_hs.get(id)
+        hoc_sinh.append({
+            "id": id, "HoTen": f"{ho} {ten}", "GioiTinh": gioi_tinh, "NgaySinh": ngay_sinh.isoformat(),
+            "KhoiDuKien": khoi, "IDLopHoc": lop, "TenLop": ten_lop.get(lop),
+            "_khoa": khong_dau or bo_dau(f"{ho} {ten}"),
+        })
+
+    mon_hoc = [
+        {"id": id, "TenMonHoc": ten}
+        for id, ten in MonHoc.objects.filter(IDNienKhoa=nien_khoa_id).values_list('id', 'TenMonHoc').order_by('TenMonHoc')
+    ]
+    return {
+        "HocSinh": ChiMucTienTo(hoc_sinh, lambda hs: hs["_khoa"]),
+        "LopHoc": ChiMucTienTo(lop_hoc, lambda lop: bo_dau(lop["TenLop"])),
+        "MonHoc": ChiMucTienTo(mon_hoc, lambda mon: bo_dau(mon["TenMonHoc"])),
+    }
+
+
+def _con_dung(da_co, hien_tai):
+    if da_co is None or da_co[0] != hien_tai:
+        return False
+    return dung_chung() or time.monotonic() - da_co[1] < TUOI_TOI_DA_CHI_MUC
+
+
+def lay_chi_muc(nien_khoa_id):
+    """Chỉ mục của niên khóa ở phiên bản hiện tại, dựng lại nếu đã cũ."""
+    nien_khoa_id = int(nien_khoa_id)
+    hien_tai = phien_ban(nien_khoa_id, NHOM_PHIEN_BAN)
+    da_co = _chi_muc.get(nien_khoa_id)
+    if _con_dung(da_co, hien_tai):
+        return da_co[2]
+    with _lock:
+        da_co = _chi_muc.get(nien_khoa_id)
+        if not _con_dung(da_co, hien_tai):
+            da_co = (hien_tai, time.monotonic(), _dung_chi_muc(nien_khoa_id))
+            _chi_muc[nien_khoa_id] = da_co
+    return da_co[2]
+
+
+def goi_y(nien_khoa_id, tu_khoa, loai=LOAI, so_luong=SO_GOI_Y, loc_hoc_sinh=None):
+    """{loại: [mục, ...]} cho các loại được yêu cầu."""
+    chi_muc = lay_chi_muc(nien_khoa_id)
+    tu_khoa = bo_dau(tu_khoa)
+    ket_qua = {}
+    for ten in loai:
+        loc = loc_hoc_sinh if ten == "HocSinh" else None
+        ket_qua[ten] = [
+            {k: v for k, v in item.items() if not k.startswith("_")}
+            for item in chi_muc[ten].tim(tu_khoa, so_luong, loc)
+        ]
+    return ket_qua
@@ -0,0 +1,31 @@
+# classes/management/commands/repair_siso.py
+from django.core.management.base import BaseCommand, CommandError
+
+from configurations.models import NienKhoa
+from classes.membership import dong_bo_si_so
+
+
+class Command(BaseCommand):
+    help = "Đếm lại LopHoc.SiSo từ LOPHOC_HOCSINH cho mọi lớp của một niên khóa (một câu UPDATE mỗi niên khóa)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nien-khoa', type=int, help="ID niên khóa cần đồng bộ sĩ số")
+        parser.add_argument('--all', action='store_true', help="Đồng bộ cho mọi niên khóa")
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ liệt kê các lớp bị lệch, không sửa")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            nien_khoa_ids = list(NienKhoa.objects.values_list('pk', flat=True))
+        elif options['nien_khoa']:
+            if not NienKhoa.objects.filter(pk=options['nien_khoa']).exists():
+                raise CommandError(f"Không tìm thấy niên khóa có ID {options['nien_khoa']}.")
+            nien_khoa_ids = [options['nien_khoa']]
+        else:
+            raise CommandError("Hãy truyền --nien-khoa <ID> hoặc --all.")
+
+        for nk in nien_khoa_ids:
+            lech = dong_bo_si_so(nk, sua=not options['dry_run'])
+            for _, ten_lop, si_so, thuc_te in lech:
+                self.stdout.write(f"  {ten_lop}: SiSo {si_so} -> {thuc_te}")
+            trang_thai = "cần sửa" if options['dry_run'] else "đã sửa"
+            self.stdout.write(f"Niên khóa {nk}: {len(lech)} lớp lệch sĩ số ({trang_thai}).")
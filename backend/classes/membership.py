@@ -0,0 +1,153 @@
+# classes/membership.py
+"""
+Cập nhật danh sách học sinh của lớp theo lô và duy trì LopHoc.SiSo.
+
+- cap_nhat_danh_sach_lop(): so sánh danh sách mới với danh sách hiện có, chỉ xóa/thêm phần
+  chênh lệch (một DELETE, một bulk_create) và cộng/trừ SiSo bằng một câu UPDATE dùng F().
+- Trong khối `with cap_nhat_hang_loat():` các signal đếm lại sĩ số và làm cũ chỉ mục gợi ý
+  theo từng dòng (classes/signals.py) được bỏ qua; người gọi tự cập nhật một lần cho cả lô.
+- Sức chứa được kiểm tra ngay trong câu UPDATE SiSo (giu_cho(): WHERE SiSo <= SiSoToiDa - n),
+  nên nhiều người sửa cùng lúc không thể làm lớp vượt sĩ số mà không cần khóa bảng; ràng buộc
+  uq_lophoc_hocsinh_mot_lop_moi_nam của CSDL bảo đảm mỗi học sinh chỉ thuộc một lớp mỗi niên khóa.
+- dong_bo_si_so(): đếm lại SiSo của mọi lớp trong một niên khóa bằng một câu UPDATE
+  (lệnh `manage.py repair_siso`).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from reporting import snapshots
+from .autocomplete import tang_phien_ban_goi_y
+from .models import LopHoc, LopHoc_HocSinh
+
+BATCH_SIZE = 500
+
+# Số ID mỗi điều kiện IN (SQL Server giới hạn 2100 tham số)
+ID_MOI_TRUY_VAN = 1000
+
+_trang_thai = threading.local()
+
+
+@contextmanager
+def cap_nhat_hang_loat():
+    """Tắt các signal cập nhật sĩ số / gợi ý theo từng dòng LopHoc_HocSinh trong khối with."""
+    _trang_thai.muc = getattr(_trang_thai, 'muc', 0) + 1
+    try:
+        yield
+    finally:
+        _trang_thai.muc -= 1
+
+
+def dang_cap_nhat_hang_loat():
+    return getattr(_trang_thai, 'muc', 0) > 0
+
+
+def si_so_thuc_te():
+    """Biểu thức số học sinh thực có của lớp (dùng trong annotate/update của LopHoc)."""
+    return Coalesce(
+        Subquery(
+            LopHoc_HocSinh.objects.filter(IDLopHoc=OuterRef('pk')).order_by()
+            .values('IDLopHoc').annotate(so=Count('id')).values('so'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def dem_lai_si_so(lop_hoc_ids):
+    """Đếm lại SiSo của các lớp cho trước bằng một câu UPDATE."""
+    lop_hoc_ids = list(lop_hoc_ids)
+    for i in range(0, len(lop_hoc_ids), ID_MOI_TRUY_VAN):
+        LopHoc.objects.filter(pk__in=lop_hoc_ids[i:i + ID_MOI_TRUY_VAN]).update(SiSo=si_so_thuc_te())
+
+
+class VuotSiSo(Exception):
+    """Thêm học sinh sẽ làm lớp vượt SiSoToiDa."""
+
+    def __init__(self, lop_hoc_id, si_so_toi_da):
+        self.lop_hoc_id = lop_hoc_id
+        self.si_so_toi_da = si_so_toi_da
+        super().__init__(f"Lớp {lop_hoc_id} sẽ vượt sĩ số tối đa ({si_so_toi_da}).")
+
+
+class DaCoLop(Exception):
+    """Học sinh đã thuộc một lớp khác trong cùng niên khóa."""
+
+    def __init__(self, hoc_sinh_ids):
+        self.hoc_sinh_ids = sorted(hoc_sinh_ids)
+        super().__init__(f"Học sinh đã có lớp trong niên khóa: {self.hoc_sinh_ids}")
+
+
+def giu_cho(lop_hoc_id, so_luong, si_so_toi_da=None):
+    """
+    Cộng `so_luong` (có thể âm) vào SiSo bằng một câu UPDATE có điều kiện: khi thêm học sinh,
+    chỉ cập nhật nếu sĩ số mới không vượt `si_so_toi_da`. Trả về False nếu lớp đã đầy.
+    """
+    qs = LopHoc.objects.filter(pk=lop_hoc_id)
+    if so_luong > 0 and si_so_toi_da is not None:
+        qs = qs.filter(SiSo__lte=si_so_toi_da - so_luong)
+    return qs.update(SiSo=F('SiSo') + so_luong) == 1
+
+
+def cap_nhat_danh_sach_lop(lop_hoc, hoc_sinh_ids, si_so_toi_da=None):
+    """
+    Đặt danh sách học sinh của `lop_hoc` thành `hoc_sinh_ids` (như lop_hoc.HocSinh.set()).
+    Trả về (số học sinh thêm, số học sinh bớt). Ném VuotSiSo, DaCoLop, hoặc IntegrityError
+    nếu danh sách vừa bị người khác sửa cùng lúc; khi đó không có thay đổi nào được ghi.
+    """
+    moi = set(hoc_sinh_ids)
+    with transaction.atomic(), cap_nhat_hang_loat():
+        hien_co = set(LopHoc_HocSinh.objects.filter(IDLopHoc=lop_hoc).values_list('IDHocSinh_id', flat=True))
+        them = sorted(moi - hien_co)
+        bot = sorted(hien_co - moi)
+        if not them and not bot:
+            return 0, 0
+
+        da_co_lop = set(
+            LopHoc_HocSinh.objects.filter(IDNienKhoa=lop_hoc.IDNienKhoa_id, IDHocSinh_id__in=them)
+            .exclude(IDLopHoc=lop_hoc).values_list('IDHocSinh_id', flat=True)
+        ) if them else set()
+        if da_co_lop:
+            raise DaCoLop(da_co_lop)
+
+        # Đếm số dòng thực sự bị xóa: người khác có thể vừa xóa trước
+        da_bot = 0
+        for i in range(0, len(bot), ID_MOI_TRUY_VAN):
+            _, theo_model = LopHoc_HocSinh.objects.filter(
+                IDLopHoc=lop_hoc, IDHocSinh_id__in=bot[i:i + ID_MOI_TRUY_VAN]
+            ).delete()
+            da_bot += theo_model.get(LopHoc_HocSinh._meta.label, 0)
+
+        # Giữ chỗ trước khi thêm: câu UPDATE khóa dòng lớp đến hết transaction
+        if not giu_cho(lop_hoc.pk, len(them) - da_bot, si_so_toi_da):
+            raise VuotSiSo(lop_hoc.pk, si_so_toi_da)
+        # Trùng (lớp, học sinh) hoặc (học sinh, niên khóa) do sửa đồng thời -> IntegrityError
+        LopHoc_HocSinh.objects.bulk_create(
+            [LopHoc_HocSinh(IDLopHoc=lop_hoc, IDHocSinh_id=hs, IDNienKhoa_id=lop_hoc.IDNienKhoa_id) for hs in them],
+            batch_size=BATCH_SIZE,
+        )
+
+        # bulk_create không phát signal
+        snapshots.danh_dau_lop(lop_hoc.pk)
+        tang_phien_ban_goi_y(lop_hoc.IDNienKhoa_id)
+    return len(them), da_bot
+
+
+def dong_bo_si_so(nien_khoa_id, sua=True):
+    """
+    Các lớp của niên khóa có SiSo khác số học sinh thực có: [(id, TenLop, SiSo, thực tế)].
+    sua=True thì ghi lại SiSo của cả niên khóa bằng một câu UPDATE.
+    """
+    lop_qs = LopHoc.objects.filter(IDNienKhoa=nien_khoa_id)
+    lech = [
+        (id, ten, si_so, thuc_te)
+        for id, ten, si_so, thuc_te in lop_qs.annotate(thuc_te=si_so_thuc_te())
+        .values_list('id', 'TenLop', 'SiSo', 'thuc_te').order_by('TenLop')
+        if si_so != thuc_te
+    ]
+    if sua and lech:
+        lop_qs.update(SiSo=si_so_thuc_te())
+    return lech
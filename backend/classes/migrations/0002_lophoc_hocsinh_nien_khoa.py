@@ -0,0 +1,49 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def sao_nien_khoa(apps, schema_editor):
+    LopHoc = apps.get_model('classes', 'LopHoc')
+    LopHoc_HocSinh = apps.get_model('classes', 'LopHoc_HocSinh')
+    LopHoc_HocSinh.objects.update(
+        IDNienKhoa=Subquery(LopHoc.objects.filter(pk=OuterRef('IDLopHoc')).values('IDNienKhoa')[:1])
+    )
+    trung = (
+        LopHoc_HocSinh.objects.values('IDHocSinh', 'IDNienKhoa').annotate(so_lop=Count('id'))
+        .filter(so_lop__gt=1).order_by()
+    )
+    if trung.exists():
+        vi_du = ", ".join(f"HS {r['IDHocSinh']} (NK {r['IDNienKhoa']})" for r in trung[:10])
+        raise RuntimeError(
+            f"Có {trung.count()} học sinh thuộc nhiều lớp trong cùng niên khóa, ví dụ: {vi_du}. "
+            "Hãy xếp lại các học sinh này trước khi migrate."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0001_initial'),
+        ('configurations', '0005_remove_thamso_chophepsuadiem_remove_thamso_ghichu_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lophoc_hocsinh',
+            name='IDNienKhoa',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='configurations.nienkhoa'),
+        ),
+        migrations.RunPython(sao_nien_khoa, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lophoc_hocsinh',
+            name='IDNienKhoa',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, to='configurations.nienkhoa'),
+        ),
+        migrations.AddConstraint(
+            model_name='lophoc_hocsinh',
+            constraint=models.UniqueConstraint(fields=('IDHocSinh', 'IDNienKhoa'), name='uq_lophoc_hocsinh_mot_lop_moi_nam'),
+        ),
+    ]
@@ -25,4 +25,15 @@ class LopHoc_MonHoc(models.Model):
 class LopHoc_HocSinh(models.Model):
     IDLopHoc = models.ForeignKey(LopHoc, on_delete=models.CASCADE)
     IDHocSinh = models.ForeignKey('students.HocSinh', on_delete=models.CASCADE)
-    class Meta: db_table = 'LOPHOC_HOCSINH'; unique_together = ('IDLopHoc', 'IDHocSinh')
\ No newline at end of file
+    # Sao từ IDLopHoc.IDNienKhoa để CSDL bảo đảm mỗi học sinh chỉ thuộc một lớp trong một niên khóa.
+    # bulk_create / HocSinh.add() phải tự truyền giá trị (through_defaults={'IDNienKhoa': ...}).
+    IDNienKhoa = models.ForeignKey('configurations.NienKhoa', on_delete=models.PROTECT, editable=False)
+    def save(self, *args, **kwargs):
+        if self.IDNienKhoa_id is None:
+            self.IDNienKhoa_id = LopHoc.objects.values_list('IDNienKhoa_id', flat=True).get(pk=self.IDLopHoc_id)
+        super().save(*args, **kwargs)
+    class Meta:
+        db_table = 'LOPHOC_HOCSINH'; unique_together = ('IDLopHoc', 'IDHocSinh')
+        constraints = [
+            models.UniqueConstraint(fields=['IDHocSinh', 'IDNienKhoa'], name='uq_lophoc_hocsinh_mot_lop_moi_nam'),
+        ]
\ No newline at end of file
@@ -0,0 +1,167 @@
+# classes/rollover.py
+"""
+Kết chuyển niên khóa: dựng cấu trúc của niên khóa mới từ niên khóa cũ và cho học sinh lên lớp.
+
+- MonHoc, LopHoc (SiSo = 0) và LopHoc_MonHoc được sao sang niên khóa đích bằng bulk_create;
+  môn/lớp đã có tên trong niên khóa đích được dùng lại, nên chạy lại không tạo trùng.
+- Học sinh đạt (trung bình DiemTB cả năm >= DiemDatMon của niên khóa cũ) lên khối kế tiếp,
+  vào lớp cùng tên đổi số khối (10A1 -> 11A1) của niên khóa đích. Học sinh đạt ở khối cuối
+  được tính là tốt nghiệp. Học sinh không đạt hoặc chưa có điểm không được xếp lớp và được
+  liệt kê để giáo vụ xử lý; học sinh đạt nhưng đã có lớp ở niên khóa đích được liệt kê
+  trong "DaCoLop".
+- Tất cả trong một transaction, số truy vấn không phụ thuộc số học sinh (trừ một UPDATE SiSo
+  cho mỗi lớp nhận học sinh).
+"""
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Avg
+
+from configurations.models import ThamSo
+from grading.models import DiemSo
+from reporting.cache import tang_phien_ban
+from reporting.queries import lay_diem_dat_mon
+from subjects.models import MonHoc
+from .autocomplete import tang_phien_ban_goi_y
+from .membership import VuotSiSo, cap_nhat_hang_loat, giu_cho
+from .models import Khoi, LopHoc, LopHoc_HocSinh, LopHoc_MonHoc
+
+BATCH_SIZE = 500
+
+
+def _so_khoi(ten_khoi):
+    so = re.search(r'\d+', ten_khoi or '')
+    return int(so.group()) if so else None
+
+
+def _ten_lop_len_lop(ten_lop, so_khoi):
+    """'10A1' ở khối 10 -> '11A1'; None nếu tên lớp không bắt đầu bằng số khối."""
+    if so_khoi is None or not ten_lop.startswith(str(so_khoi)):
+        return None
+    return f"{so_khoi + 1}{ten_lop[len(str(so_khoi)):]}"
+
+
+def _sao_mon_hoc(tu, den):
+    """Sao MonHoc; trả về ({id môn cũ: id môn mới}, số môn mới tạo)."""
+    da_co = set(MonHoc.objects.filter(IDNienKhoa=den).values_list('TenMonHoc', flat=True))
+    nguon = list(MonHoc.objects.filter(IDNienKhoa=tu).values_list('id', 'TenMonHoc', 'IDToHop_id'))
+    moi = [
+        MonHoc(TenMonHoc=ten, IDNienKhoa_id=den, IDToHop_id=to_hop)
+        for _, ten, to_hop in nguon if ten not in da_co
+    ]
+    MonHoc.objects.bulk_create(moi, batch_size=BATCH_SIZE)
+    # Lấy lại ID theo tên: không phải backend nào cũng trả ID từ bulk_create
+    theo_ten = dict(MonHoc.objects.filter(IDNienKhoa=den).values_list('TenMonHoc', 'id'))
+    return {id: theo_ten[ten] for id, ten, _ in nguon}, len(moi)
+
+
+def _sao_lop_hoc(lop_nguon, den):
+    """Sao LopHoc; trả về ({tên lớp: (id, id khối, sĩ số)} của niên khóa đích, số lớp mới tạo)."""
+    da_co = set(LopHoc.objects.filter(IDNienKhoa=den).values_list('TenLop', flat=True))
+    moi = [
+        LopHoc(TenLop=ten, IDKhoi_id=khoi, IDToHop_id=to_hop, IDNienKhoa_id=den, SiSo=0)
+        for _, ten, khoi, to_hop in lop_nguon if ten not in da_co
+    ]
+    LopHoc.objects.bulk_create(moi, batch_size=BATCH_SIZE)
+    lop_dich = {
+        ten: (id, khoi, si_so) for id, ten, khoi, si_so in
+        LopHoc.objects.filter(IDNienKhoa=den).values_list('id', 'TenLop', 'IDKhoi_id', 'SiSo')
+    }
+    return lop_dich, len(moi)
+
+
+def _sao_lop_mon_hoc(tu, den, lop_nguon, lop_dich, mon_map):
+    lop_map = {id: lop_dich[ten][0] for id, ten, _, _ in lop_nguon}
+    da_co = set(LopHoc_MonHoc.objects.filter(IDLopHoc__IDNienKhoa=den).values_list('IDLopHoc_id', 'IDMonHoc_id'))
+    moi = {
+        (lop_map[lop], mon_map[mon])
+        for lop, mon in LopHoc_MonHoc.objects.filter(IDLopHoc__IDNienKhoa=tu).values_list('IDLopHoc_id', 'IDMonHoc_id')
+    } - da_co
+    LopHoc_MonHoc.objects.bulk_create(
+        [LopHoc_MonHoc(IDLopHoc_id=lop, IDMonHoc_id=mon) for lop, mon in sorted(moi)], batch_size=BATCH_SIZE
+    )
+    return len(moi)
+
+
+def ket_chuyen_nien_khoa(tu, den):
+    """
+    Kết chuyển niên khóa `tu` sang `den` (đối tượng NienKhoa; `den` phải có ThamSo).
+    Trả về báo cáo những gì đã tạo. Ném VuotSiSo nếu lớp đích vừa bị người khác thêm học sinh.
+    """
+    si_so_toi_da = ThamSo.objects.get(IDNienKhoa=den).SiSoToiDa
+    diem_dat_mon = lay_diem_dat_mon(tu.pk)
+    so_cua_khoi = {id: _so_khoi(ten) for id, ten in Khoi.objects.values_list('id', 'TenKhoi')}
+    khoi_theo_so = {so: id for id, so in so_cua_khoi.items() if so is not None}
+    # Khối cuối (không có khối số kế tiếp) -> None
+    khoi_ke_tiep = {id: khoi_theo_so.get(so + 1) if so is not None else None for id, so in so_cua_khoi.items()}
+
+    with transaction.atomic(), cap_nhat_hang_loat():
+        lop_nguon = list(LopHoc.objects.filter(IDNienKhoa=tu).values_list('id', 'TenLop', 'IDKhoi_id', 'IDToHop_id'))
+        mon_map, so_mon_moi = _sao_mon_hoc(tu.pk, den.pk)
+        lop_dich, so_lop_moi = _sao_lop_hoc(lop_nguon, den.pk)
+        so_lop_mon_moi = _sao_lop_mon_hoc(tu.pk, den.pk, lop_nguon, lop_dich, mon_map)
+
+        # Trung bình DiemTB cả năm của từng học sinh, một GROUP BY
+        diem_ca_nam = dict(
+            DiemSo.objects.filter(IDLopHoc__IDNienKhoa=tu).values('IDHocSinh_id')
+            .annotate(tb=Avg('DiemTB')).order_by().values_list('IDHocSinh_id', 'tb')
+        )
+        da_co_lop = set(LopHoc_HocSinh.objects.filter(IDNienKhoa=den).values_list('IDHocSinh_id', flat=True))
+        lop_cu = {id: (ten, khoi) for id, ten, khoi, _ in lop_nguon}
+
+        len_lop = defaultdict(list)   # id lớp đích -> [id học sinh]
+        tot_nghiep, khong_len_lop, chua_xep_lop, da_co_lop_dich = 0, [], [], []
+        thanh_vien = LopHoc_HocSinh.objects.filter(IDNienKhoa=tu).values_list(
+            'IDHocSinh_id', 'IDHocSinh__Ho', 'IDHocSinh__Ten', 'IDLopHoc_id'
+        ).order_by('IDLopHoc_id', 'IDHocSinh__Ten', 'IDHocSinh__Ho')
+        for hs, ho, ten, lop in thanh_vien.iterator(chunk_size=2000):
+            ten_lop, khoi = lop_cu[lop]
+            tb = diem_ca_nam.get(hs)
+            dong = {"id": hs, "HoTen": f"{ho} {ten}", "TenLop": ten_lop,
+                    "DiemTBCaNam": round(tb, 2) if tb is not None else None}
+            if tb is None or tb < diem_dat_mon:
+                khong_len_lop.append(dong)
+                continue
+            if so_cua_khoi.get(khoi) is None:
+                chua_xep_lop.append({**dong, "LyDo": "Không xác định được khối kế tiếp."})
+                continue
+            if khoi_ke_tiep[khoi] is None:
+                tot_nghiep += 1
+                continue
+            if hs in da_co_lop:
+                # Đã được xếp lớp ở niên khóa đích (lần chạy trước hoặc xếp tay)
+                da_co_lop_dich.append(dong)
+                continue
+            dich = lop_dich.get(_ten_lop_len_lop(ten_lop, so_cua_khoi[khoi]))
+            if dich is None or dich[1] != khoi_ke_tiep[khoi]:
+                chua_xep_lop.append({**dong, "LyDo": "Không có lớp tương ứng ở khối kế tiếp."})
+            elif dich[2] + len(len_lop[dich[0]]) + 1 > si_so_toi_da:
+                chua_xep_lop.append({**dong, "LyDo": "Lớp tương ứng đã đủ sĩ số."})
+            else:
+                len_lop[dich[0]].append(hs)
+
+        for lop, hoc_sinh in len_lop.items():
+            if not giu_cho(lop, len(hoc_sinh), si_so_toi_da):
+                raise VuotSiSo(lop, si_so_toi_da)
+        LopHoc_HocSinh.objects.bulk_create([
+            LopHoc_HocSinh(IDLopHoc_id=lop, IDHocSinh_id=hs, IDNienKhoa_id=den.pk)
+            for lop, hoc_sinh in len_lop.items() for hs in hoc_sinh
+        ], batch_size=BATCH_SIZE)
+
+        # bulk_create không phát signal: làm cũ cache báo cáo và chỉ mục gợi ý của niên khóa đích
+        transaction.on_commit(lambda: tang_phien_ban(den.pk))
+        tang_phien_ban_goi_y(den.pk)
+
+    return {
+        "NienKhoaNguon": tu.TenNienKhoa,
+        "NienKhoaDich": den.TenNienKhoa,
+        "MonHocMoi": so_mon_moi,
+        "LopHocMoi": so_lop_moi,
+        "LopHocMonHocMoi": so_lop_mon_moi,
+        "LenLop": sum(len(hs) for hs in len_lop.values()),
+        "TotNghiep": tot_nghiep,
+        "KhongLenLop": khong_len_lop,
+        "ChuaXepLop": chua_xep_lop,
+        "DaCoLop": da_co_lop_dich,
+    }
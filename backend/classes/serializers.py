@@ -1,6 +1,6 @@
 # classes/serializers.py
 from rest_framework import serializers
-from .models import Khoi, LopHoc
+from .models import Khoi, LopHoc, LopHoc_HocSinh
 from subjects.serializers import MonHocSerializer 
 from configurations.models import ThamSo, NienKhoa
 class KhoiSerializer(serializers.ModelSerializer):
@@ -62,6 +62,14 @@ class LopHocSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'TenLop': f"Tên lớp '{ten_lop}' đã tồn tại trong niên khóa này."}
             )
+
+        # Học sinh chỉ thuộc một lớp mỗi niên khóa và báo cáo đã tổng hợp theo niên khóa cũ:
+        # lớp đã có học sinh thì không được chuyển sang niên khóa khác
+        if (instance and nien_khoa and nien_khoa.pk != instance.IDNienKhoa_id
+                and LopHoc_HocSinh.objects.filter(IDLopHoc=instance).exists()):
+            raise serializers.ValidationError(
+                {'IDNienKhoa': "Không thể đổi niên khóa của lớp đã có học sinh."}
+            )
         
         
         if not instance and khoi and nien_khoa:
@@ -1,34 +1,49 @@
 
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.db.models import F
 from django.dispatch import receiver
 from .models import LopHoc, LopHoc_HocSinh
+from .autocomplete import tang_phien_ban_goi_y
+from .membership import dang_cap_nhat_hang_loat, dem_lai_si_so
+from students.models import HocSinh
+from subjects.models import MonHoc
 
 
 @receiver(m2m_changed, sender=LopHoc.HocSinh.through)
-def update_siso_on_m2m_change(sender, instance, action, **kwargs):
-    if action in ["post_add", "post_remove", "post_clear"]:
-        # 'instance' ở đây là đối tượng LopHoc
-        instance.SiSo = instance.HocSinh.count()
-        instance.save(update_fields=['SiSo'])
+def update_siso_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if dang_cap_nhat_hang_loat():
+        return
+    if not reverse:
+        # 'instance' là LopHoc
+        if action in ["post_add", "post_remove", "post_clear"]:
+            dem_lai_si_so([instance.pk])
+        return
+    # 'instance' là HocSinh, pk_set là ID các lớp (clear không có pk_set nên lấy trước khi xóa)
+    if action == "pre_clear":
+        instance._si_so_lop_cu = list(instance.lophoc_list.values_list('pk', flat=True))
+    elif action == "post_clear":
+        dem_lai_si_so(getattr(instance, '_si_so_lop_cu', ()))
+    elif action in ["post_add", "post_remove"]:
+        dem_lai_si_so(pk_set or ())
 
 
 def update_siso(lop_hoc_id):
-    try:
-        lop_hoc = LopHoc.objects.get(id=lop_hoc_id)
-        lop_hoc.SiSo = lop_hoc.HocSinh.count()
-        lop_hoc.save(update_fields=['SiSo'])
-    except LopHoc.DoesNotExist:
-        
-        pass
+    dem_lai_si_so([lop_hoc_id])
 
 
 @receiver(post_save, sender=LopHoc_HocSinh)
-def update_siso_on_save(sender, instance, **kwargs):
+def update_siso_on_save(sender, instance, created, **kwargs):
     """
     Cập nhật sĩ số khi một học sinh được thêm vào lớp qua admin inline.
     'instance' ở đây là đối tượng LopHoc_HocSinh.
     """
-    update_siso(instance.IDLopHoc.id)
+    if dang_cap_nhat_hang_loat():
+        return
+    if created:
+        LopHoc.objects.filter(pk=instance.IDLopHoc_id).update(SiSo=F('SiSo') + 1)
+    else:
+        # Dòng có thể đã chuyển lớp, không biết lớp cũ: đếm lại lớp hiện tại
+        update_siso(instance.IDLopHoc_id)
 
 
 @receiver(post_delete, sender=LopHoc_HocSinh)
@@ -37,4 +52,83 @@ def update_siso_on_delete(sender, instance, **kwargs):
     Cập nhật sĩ số khi một học sinh bị xóa khỏi lớp qua admin inline.
     'instance' ở đây là đối tượng LopHoc_HocSinh.
     """
-    update_siso(instance.IDLopHoc.id)
\ No newline at end of file
+    if dang_cap_nhat_hang_loat():
+        return
+    LopHoc.objects.filter(pk=instance.IDLopHoc_id, SiSo__gt=0).update(SiSo=F('SiSo') - 1)
+
+@receiver(post_save, sender=LopHoc)
+def dong_bo_nien_khoa_thanh_vien(sender, instance, created, **kwargs):
+    """
+    LopHoc_HocSinh.IDNienKhoa sao từ lớp: giữ khớp khi lớp đổi niên khóa (API chặn việc này
+    với lớp đã có học sinh, xem LopHocSerializer.validate).
+    """
+    if not created:
+        LopHoc_HocSinh.objects.filter(IDLopHoc=instance).exclude(
+            IDNienKhoa=instance.IDNienKhoa_id
+        ).update(IDNienKhoa=instance.IDNienKhoa_id)
+
+# ===== Chỉ mục gợi ý (classes/autocomplete.py) =====
+def _nien_khoa_cua_hoc_sinh(hoc_sinh):
+    nam = set(LopHoc_HocSinh.objects.filter(IDHocSinh=hoc_sinh).values_list('IDNienKhoa_id', flat=True))
+    nam.add(hoc_sinh.IDNienKhoaTiepNhan_id)
+    return nam
+
+
+@receiver(post_save, sender=HocSinh)
+def lam_cu_goi_y_hoc_sinh(sender, instance, created, **kwargs):
+    moi = instance.gia_tri_goi_y()
+    cu = getattr(instance, '_goi_y_cu', None)
+    instance._goi_y_cu = moi
+    if created:
+        # Học sinh mới chưa thuộc lớp nào
+        tang_phien_ban_goi_y(instance.IDNienKhoaTiepNhan_id)
+        return
+    if cu == moi:
+        return
+    cac_nam = _nien_khoa_cua_hoc_sinh(instance)
+    if cu is not None:
+        # Đổi niên khóa tiếp nhận: học sinh phải biến khỏi chỉ mục của niên khóa cũ
+        cac_nam.add(cu[HocSinh.TRUONG_GOI_Y.index('IDNienKhoaTiepNhan_id')])
+    for nien_khoa_id in cac_nam:
+        tang_phien_ban_goi_y(nien_khoa_id)
+
+
+@receiver(pre_delete, sender=HocSinh)
+def lam_cu_goi_y_hoc_sinh_bi_xoa(sender, instance, **kwargs):
+    for nien_khoa_id in _nien_khoa_cua_hoc_sinh(instance):
+        tang_phien_ban_goi_y(nien_khoa_id)
+
+
+@receiver(post_save, sender=LopHoc)
+@receiver(post_delete, sender=LopHoc)
+@receiver(post_save, sender=MonHoc)
+@receiver(post_delete, sender=MonHoc)
+def lam_cu_goi_y_nien_khoa(sender, instance, **kwargs):
+    tang_phien_ban_goi_y(instance.IDNienKhoa_id)
+
+
+@receiver(post_save, sender=LopHoc_HocSinh)
+@receiver(post_delete, sender=LopHoc_HocSinh)
+def lam_cu_goi_y_thanh_vien(sender, instance, **kwargs):
+    if dang_cap_nhat_hang_loat():
+        return
+    tang_phien_ban_goi_y(instance.IDNienKhoa_id)
+
+
+@receiver(m2m_changed, sender=LopHoc.HocSinh.through)
+def lam_cu_goi_y_thanh_vien_m2m(sender, instance, action, reverse, **kwargs):
+    if dang_cap_nhat_hang_loat():
+        return
+    # Chiều thuận 'instance' là LopHoc, chiều ngược là HocSinh
+    if reverse and action == "pre_clear":
+        # Sau khi clear không còn biết học sinh từng thuộc lớp của niên khóa nào
+        instance._goi_y_nien_khoa_cu = _nien_khoa_cua_hoc_sinh(instance)
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        cac_nam = _nien_khoa_cua_hoc_sinh(instance) | getattr(instance, '_goi_y_nien_khoa_cu', set())
+    else:
+        cac_nam = {instance.IDNienKhoa_id}
+    for nien_khoa_id in cac_nam:
+        tang_phien_ban_goi_y(nien_khoa_id)
@@ -1,3 +1,100 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import TaiKhoan, VaiTro
+from configurations.models import NienKhoa, ThamSo
+from students.models import HocSinh
+from .membership import DaCoLop, VuotSiSo, cap_nhat_danh_sach_lop, giu_cho
+from .models import Khoi, LopHoc, LopHoc_HocSinh
+
+
+def tao_nien_khoa(ten):
+    nien_khoa = NienKhoa.objects.create(TenNienKhoa=ten)
+    ThamSo.objects.create(
+        IDNienKhoa=nien_khoa, TuoiToiThieu=15, TuoiToiDa=20, SoMonHocToiDa=9, SiSoToiDa=40,
+        DiemDatMon=5, SoLopK10=10, SoLopK11=10, SoLopK12=10,
+        ChoPhepSuaDiemHK1=True, ChoPhepSuaDiemHK2=True,
+    )
+    return nien_khoa
+
+
+def tao_hoc_sinh(nien_khoa, so_luong):
+    nam = int(nien_khoa.TenNienKhoa[:4]) - 16
+    return [
+        HocSinh.objects.create(
+            Ho="Nguyễn", Ten=f"An {i}", GioiTinh="Nam", NgaySinh=datetime.date(nam, 1, 1),
+            DiaChi="x", Email=f"hs{nien_khoa.pk}_{i}@x.com", IDNienKhoaTiepNhan=nien_khoa,
+        )
+        for i in range(so_luong)
+    ]
+
+
+class DanhSachLopTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nien_khoa = tao_nien_khoa("2024-2025")
+        cls.khoi = Khoi.objects.create(TenKhoi="Khối 10")
+        cls.lop_a = LopHoc.objects.create(TenLop="10A1", IDKhoi=cls.khoi, IDNienKhoa=cls.nien_khoa)
+        cls.lop_b = LopHoc.objects.create(TenLop="10A2", IDKhoi=cls.khoi, IDNienKhoa=cls.nien_khoa)
+        cls.hoc_sinh = tao_hoc_sinh(cls.nien_khoa, 3)
+
+    def test_them_vuot_si_so_khong_ghi_gi(self):
+        ids = [hs.pk for hs in self.hoc_sinh]
+        with self.assertRaises(VuotSiSo):
+            cap_nhat_danh_sach_lop(self.lop_a, ids, si_so_toi_da=2)
+        self.lop_a.refresh_from_db()
+        self.assertEqual(self.lop_a.SiSo, 0)
+        self.assertFalse(LopHoc_HocSinh.objects.filter(IDLopHoc=self.lop_a).exists())
+
+    def test_giu_cho_tu_choi_khi_lop_day(self):
+        self.assertTrue(giu_cho(self.lop_a.pk, 2, si_so_toi_da=2))
+        self.assertFalse(giu_cho(self.lop_a.pk, 1, si_so_toi_da=2))
+        self.lop_a.refresh_from_db()
+        self.assertEqual(self.lop_a.SiSo, 2)
+
+    def test_hoc_sinh_da_co_lop_cung_nien_khoa(self):
+        hs = self.hoc_sinh[0]
+        self.assertEqual(cap_nhat_danh_sach_lop(self.lop_a, [hs.pk]), (1, 0))
+        with self.assertRaises(DaCoLop) as ctx:
+            cap_nhat_danh_sach_lop(self.lop_b, [hs.pk])
+        self.assertEqual(ctx.exception.hoc_sinh_ids, [hs.pk])
+
+        # Ràng buộc của CSDL vẫn chặn khi bỏ qua bước kiểm tra
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LopHoc_HocSinh.objects.create(IDLopHoc=self.lop_b, IDHocSinh=hs)
+        self.lop_b.refresh_from_db()
+        self.assertEqual(self.lop_b.SiSo, 0)
+
+
+class DoiNienKhoaLopTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nien_khoa_cu = tao_nien_khoa("2023-2024")
+        cls.nien_khoa = tao_nien_khoa("2024-2025")
+        khoi = Khoi.objects.create(TenKhoi="Khối 10")
+        cls.lop = LopHoc.objects.create(TenLop="10A1", IDKhoi=khoi, IDNienKhoa=cls.nien_khoa)
+        cap_nhat_danh_sach_lop(cls.lop, [hs.pk for hs in tao_hoc_sinh(cls.nien_khoa, 1)])
+
+        VaiTro.objects.create(MaVaiTro="BGH", TenVaiTro="Ban giám hiệu")
+        user = User.objects.create_user("bgh", password="x" * 8)
+        TaiKhoan.objects.create(
+            user=user, Ho="Lê", Ten="Đạt", MaVaiTro_id="BGH", GioiTinh="Nam",
+            NgaySinh="1980-01-01", DiaChi="x", SoDienThoai="0123456789", Email="bgh@x.com",
+        )
+        cls.user = user
 
-# Create your tests here.
+    def test_khong_doi_nien_khoa_lop_da_co_hoc_sinh(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.patch(
+            f"/api/classes/lophoc/{self.lop.pk}/",
+            {"TenLop": "10A1", "IDNienKhoa": self.nien_khoa_cu.pk}, format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("IDNienKhoa", response.json())
+        self.lop.refresh_from_db()
+        self.assertEqual(self.lop.IDNienKhoa_id, self.nien_khoa.pk)
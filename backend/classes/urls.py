@@ -9,8 +9,11 @@ from .views import (
     MonHocTheoLopView,
     LopHocMonHocUpdateView,
     LopHocHocSinhManagementView,
+    PhanLopTuDongView,
     XuatDanhSachHocSinhView,
-    DanhSachHocSinhJsonView
+    XuatDanhSachNienKhoaView,
+    DanhSachHocSinhJsonView,
+    GoiYView,
 )
 
 urlpatterns = [
@@ -21,7 +24,10 @@ urlpatterns = [
     path('monhoc-theo-lop/', MonHocTheoLopView.as_view(), name='monhoc-theo-lop'),
     path('lophoc/<int:pk>/monhoc/', LopHocMonHocUpdateView.as_view(), name='lophoc-monhoc-update'),
     path('lophoc/<int:pk>/hocsinh/', LopHocHocSinhManagementView.as_view(), name='lophoc-hocsinh-management'),
+    path('lophoc/phan-lop-tu-dong/', PhanLopTuDongView.as_view(), name='phan-lop-tu-dong'),
     path('lophoc/xuat-danh-sach/', XuatDanhSachHocSinhView.as_view(), name='xuat-danh-sach-hoc-sinh'),
-    path('lophoc/danh-sach-json/', DanhSachHocSinhJsonView.as_view(), name='danh-sach-hoc-sinh-json')
+    path('lophoc/xuat-danh-sach-nien-khoa/', XuatDanhSachNienKhoaView.as_view(), name='xuat-danh-sach-nien-khoa'),
+    path('lophoc/danh-sach-json/', DanhSachHocSinhJsonView.as_view(), name='danh-sach-hoc-sinh-json'),
+    path('goi-y/', GoiYView.as_view(), name='goi-y')
 
 ]
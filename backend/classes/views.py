@@ -1,13 +1,24 @@
 # classes/views.py
+import zipfile
+from itertools import groupby
+from operator import itemgetter
+
+from django.http import StreamingHttpResponse
 from rest_framework import generics, views, status, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError, NotFound, PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import IntegrityError
+from django.db.models import Prefetch, Value
 
 from accounts.permissions import IsBGH, IsGiaoVu
+from accounts.pagination import KeysetPagination
 from .models import Khoi, LopHoc, LopHoc_MonHoc, LopHoc_HocSinh
+from . import autocomplete
+from .assignment import phan_lop_tu_dong
+from .membership import DaCoLop, VuotSiSo, cap_nhat_danh_sach_lop
 from .serializers import KhoiSerializer, LopHocSerializer, LopHocMonHocUpdateSerializer
 from students.serializers import HocSinhSerializer
 from students.models import HocSinh
@@ -17,10 +28,9 @@ from grading.models import DiemSo
 
 from configurations.models import ThamSo, NienKhoa
 
-from django.http import HttpResponse
-import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from reporting.excel import ExcelExport
+from reporting.jobs import XuatFileNenMixin
+from reporting.streaming import CHUNK_SIZE, StreamExportMixin, stream_response, stream_zip
 
 def _is_current_nienkhoa(nienkhoa_id):
     """Hàm helper để kiểm tra niên khóa hiện hành."""
@@ -35,13 +45,19 @@ class KhoiListView(generics.ListAPIView):
 
 # Tạo và lọc lớp học (admin)
 class LopHocListCreateView(generics.ListCreateAPIView):
-    queryset = LopHoc.objects.select_related('IDKhoi', 'IDNienKhoa', 'IDToHop').prefetch_related('MonHoc').order_by('-IDNienKhoa__TenNienKhoa', 'TenLop')
+    # Môn học đã gán cho lớp thì chắc chắn không xóa được (is_deletable = False)
+    queryset = LopHoc.objects.select_related('IDKhoi', 'IDNienKhoa', 'IDToHop').prefetch_related(
+        Prefetch('MonHoc', queryset=MonHoc.objects.select_related('IDNienKhoa', 'IDToHop').annotate(DaGanLop=Value(True)))
+    ).order_by('-IDNienKhoa__TenNienKhoa', 'TenLop')
     serializer_class = LopHocSerializer
     permission_classes = [IsAuthenticated, IsBGH | IsGiaoVu]
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['IDNienKhoa', 'IDKhoi', 'IDToHop']
     search_fields = ['TenLop']
+    pagination_class = KeysetPagination
+    # Khi phân trang giữ thứ tự niên khóa mới trước, tên lớp của danh sách không phân trang
+    keyset_ordering = ('-IDNienKhoa__TenNienKhoa', 'TenLop', 'id')
 
 # Danh sách lớp học dùng cho dropdown (lọc đơn giản theo Niên Khóa)
 class LopHocListView(generics.ListAPIView):
@@ -185,14 +201,14 @@ class LopHocHocSinhManagementView(APIView):
 
         # Lấy ID của tất cả học sinh đã được phân lớp trong niên khóa này
         assigned_student_ids = LopHoc_HocSinh.objects.filter(
-            IDLopHoc__IDNienKhoa=nien_khoa
+            IDNienKhoa=nien_khoa
         ).values_list('IDHocSinh_id', flat=True)
 
         students_available = HocSinh.objects.filter(
             IDNienKhoaTiepNhan=nien_khoa,
             KhoiDuKien=khoi
         ).exclude(
-            id__in=list(assigned_student_ids)
+            id__in=assigned_student_ids
         ).order_by('Ten', 'Ho')
 
         # Serialize dữ liệu
@@ -227,115 +243,273 @@ class LopHocHocSinhManagementView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Dùng `set` để cập nhật, DRF sẽ tự động xử lý thêm/xóa
-        # Signal `m2m_changed` sẽ được kích hoạt để cập nhật sĩ số
-        lop_hoc.HocSinh.set(student_ids)
+        try:
+            student_ids = {int(i) for i in student_ids}
+        except (TypeError, ValueError):
+            return Response({"detail": "Dữ liệu student_ids phải là danh sách ID học sinh."}, status=status.HTTP_400_BAD_REQUEST)
+        if HocSinh.objects.filter(pk__in=student_ids).count() != len(student_ids):
+            return Response({"detail": "Có học sinh không tồn tại trong danh sách."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Chỉ thêm/xóa phần chênh lệch so với danh sách hiện tại, SiSo cộng/trừ một lần
+        try:
+            so_them, so_bot = cap_nhat_danh_sach_lop(lop_hoc, student_ids, siso_toida)
+        except DaCoLop as e:
+            ten = [f"{ho} {ten}" for ho, ten in HocSinh.objects.filter(pk__in=e.hoc_sinh_ids).values_list('Ho', 'Ten')]
+            return Response(
+                {"detail": f"Học sinh đã được xếp vào lớp khác trong niên khóa: {', '.join(ten)}.",
+                 "student_ids": e.hoc_sinh_ids},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except (VuotSiSo, IntegrityError):
+            return Response(
+                {"detail": "Danh sách lớp vừa được người khác thay đổi hoặc lớp đã đủ sĩ số. Vui lòng tải lại và thử lại."},
+                status=status.HTTP_409_CONFLICT
+            )
 
-        return Response({"message": f"Cập nhật danh sách học sinh cho lớp {lop_hoc.TenLop} thành công."}, status=status.HTTP_200_OK)
+        return Response({
+            "message": f"Cập nhật danh sách học sinh cho lớp {lop_hoc.TenLop} thành công.",
+            "so_them": so_them,
+            "so_bot": so_bot,
+        }, status=status.HTTP_200_OK)
     
 
-class XuatDanhSachHocSinhView(APIView):
+class PhanLopTuDongView(APIView):
+    """
+    Tự động phân lớp học sinh chưa có lớp của một niên khóa và khối (classes/assignment.py).
+    GET: xem trước kế hoạch, không ghi gì. POST: phân lớp thật (chỉ niên khóa hiện hành).
+    Tham số: IDNienKhoa, IDKhoi (query string với GET, body với POST).
+    """
+    permission_classes = [IsAuthenticated, IsGiaoVu | IsBGH]
+
+    def _phan_lop(self, params, xem_truoc):
+        IDNienKhoa = params.get('IDNienKhoa')
+        IDKhoi = params.get('IDKhoi')
+        if not IDNienKhoa or not IDKhoi:
+            return Response({"detail": "Thiếu IDNienKhoa hoặc IDKhoi."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            IDNienKhoa, IDKhoi = int(IDNienKhoa), int(IDKhoi)
+        except (TypeError, ValueError):
+            return Response({"detail": "Tham số không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+        if not xem_truoc and not _is_current_nienkhoa(IDNienKhoa):
+            raise PermissionDenied("Chỉ được phép phân lớp cho niên khóa hiện hành.")
+        try:
+            siso_toida = ThamSo.objects.get(IDNienKhoa_id=IDNienKhoa).SiSoToiDa
+        except ThamSo.DoesNotExist:
+            return Response(
+                {"detail": "Chưa có quy định về sĩ số cho niên khóa này."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            ke_hoach = phan_lop_tu_dong(IDNienKhoa, IDKhoi, siso_toida, xem_truoc=xem_truoc)
+        except (VuotSiSo, IntegrityError):
+            return Response(
+                {"detail": "Lớp học hoặc học sinh vừa được người khác thay đổi. Vui lòng xem trước và thử lại."},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not ke_hoach["LopHoc"]:
+            return Response({"detail": "Khối này chưa có lớp học nào trong niên khóa."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "XemTruoc": xem_truoc,
+            "SiSoToiDa": siso_toida,
+            "DaXep": ke_hoach["SoHocSinhChuaXep"] - len(ke_hoach["KhongDuCho"]),
+            **ke_hoach,
+        })
+
+    def get(self, request):
+        return self._phan_lop(request.query_params, xem_truoc=True)
+
+    def post(self, request):
+        return self._phan_lop(request.data, xem_truoc=False)
+
+
+def _ghi_danh_sach_lop(export, ten_lop, ten_nien_khoa, si_so, siso_toida, hoc_sinh_list):
+    """Ghi một sheet danh sách lớp; `hoc_sinh_list` là các bộ (Ho, Ten, GioiTinh, NgaySinh, Email, DiaChi)."""
+    ws = export.add_sheet(f"DS Lop {ten_lop}")
+
+    ws.append(["DANH SÁCH HỌC SINH"], style='tieu_de', track_width=False)
+    ws.merge('A1:F1')
+
+    ws.append([])
+    ws.append(['Niên khóa:', ten_nien_khoa], styles=['nhan'])
+    ws.append(['Lớp:', ten_lop], styles=['nhan'])
+    # === BỔ SUNG DÒNG SĨ SỐ ===
+    ws.append(['Sĩ số:', f"{si_so} / {siso_toida}"], styles=['nhan'])
+    ws.append([])
+
+    table_headers = ['STT', 'Họ và tên', 'Giới tính', 'Ngày sinh', 'Email', 'Địa chỉ']
+    ws.append(table_headers, style='tieu_de_cot')
+
+    # Cột STT căn giữa, các cột còn lại căn trái
+    row_styles = ['o'] + ['o_trai'] * (len(table_headers) - 1)
+    for index, (ho, ten, gioi_tinh, ngay_sinh, email, dia_chi) in enumerate(hoc_sinh_list, start=1):
+        ws.append([
+            index, f"{ho} {ten}", gioi_tinh,
+            ngay_sinh.strftime('%d/%m/%Y'), email or '', dia_chi
+        ], styles=row_styles)
+
+
+def _siso_toida(nien_khoa_id):
+    siso_toida = ThamSo.objects.filter(IDNienKhoa=nien_khoa_id).values_list('SiSoToiDa', flat=True).first()
+    return "N/A" if siso_toida is None else siso_toida # Giá trị mặc định nếu không có quy định
+
+
+def tao_file_danh_sach_lop(params):
+    """Dựng file Excel danh sách học sinh của lớp `lophoc_id`. Trả về None nếu lớp không tồn tại."""
+    try:
+        lop_hoc = LopHoc.objects.select_related('IDNienKhoa').get(pk=params.get('lophoc_id'))
+    except LopHoc.DoesNotExist:
+        return None
+
+    hoc_sinh_list = lop_hoc.HocSinh.all().order_by('Ten', 'Ho').values_list(
+        'Ho', 'Ten', 'GioiTinh', 'NgaySinh', 'Email', 'DiaChi'
+    )
+
+    export = ExcelExport()
+    _ghi_danh_sach_lop(
+        export, lop_hoc.TenLop, lop_hoc.IDNienKhoa.TenNienKhoa, lop_hoc.SiSo,
+        _siso_toida(lop_hoc.IDNienKhoa_id), hoc_sinh_list.iterator(),
+    )
+
+    filename = f"Danh_sach_lop_{lop_hoc.TenLop}_{lop_hoc.IDNienKhoa.TenNienKhoa}.xlsx"
+    return export, filename
+
+
+def danh_sach_cac_lop(IDNienKhoa, IDKhoi=None):
+    """
+    Generator (lớp, [học sinh]) cho mọi lớp của niên khóa (hoặc một khối), theo TenLop.
+    Học sinh của tất cả các lớp được đọc bằng một truy vấn sắp theo lớp rồi Ten, Ho,
+    nên mỗi lần chỉ giữ danh sách của một lớp trong bộ nhớ.
+    """
+    lop_qs = LopHoc.objects.filter(IDNienKhoa=IDNienKhoa)
+    if IDKhoi:
+        lop_qs = lop_qs.filter(IDKhoi=IDKhoi)
+    lop_hoc = list(lop_qs.order_by('TenLop', 'id').values('id', 'TenLop', 'SiSo'))
+
+    rows = LopHoc_HocSinh.objects.filter(IDNienKhoa=IDNienKhoa, IDLopHoc__in=lop_qs.values('pk')).order_by(
+        'IDLopHoc__TenLop', 'IDLopHoc_id', 'IDHocSinh__Ten', 'IDHocSinh__Ho', 'IDHocSinh_id',
+    ).values_list(
+        'IDLopHoc_id', 'IDHocSinh__Ho', 'IDHocSinh__Ten', 'IDHocSinh__GioiTinh',
+        'IDHocSinh__NgaySinh', 'IDHocSinh__Email', 'IDHocSinh__DiaChi',
+    )
+    nhom = groupby(rows.iterator(chunk_size=CHUNK_SIZE), key=itemgetter(0))
+    hien_tai = next(nhom, None)
+    for lop in lop_hoc:
+        hoc_sinh = []
+        if hien_tai is not None and hien_tai[0] == lop['id']:
+            hoc_sinh = [row[1:] for row in hien_tai[1]]
+            hien_tai = next(nhom, None)
+        yield lop, hoc_sinh
+
+
+def tao_file_danh_sach_nien_khoa(params):
+    """Dựng một file Excel, mỗi lớp của niên khóa một sheet. Trả về None nếu không có niên khóa."""
+    nien_khoa = NienKhoa.objects.filter(pk=params.get('IDNienKhoa')).first()
+    if nien_khoa is None:
+        return None
+    siso_toida = _siso_toida(nien_khoa.pk)
+
+    export = ExcelExport()
+    for lop, hoc_sinh in danh_sach_cac_lop(nien_khoa.pk, params.get('IDKhoi')):
+        _ghi_danh_sach_lop(export, lop['TenLop'], nien_khoa.TenNienKhoa, lop['SiSo'], siso_toida, hoc_sinh)
+    if not export.sheets:
+        return None
+    return export, f"Danh_sach_lop_{nien_khoa.TenNienKhoa}.xlsx"
+
+
+def file_danh_sach_tung_lop(nien_khoa, IDKhoi=None):
+    """Generator (tên file, nội dung .xlsx) cho từng lớp, dùng để stream file ZIP."""
+    siso_toida = _siso_toida(nien_khoa.pk)
+    for lop, hoc_sinh in danh_sach_cac_lop(nien_khoa.pk, IDKhoi):
+        export = ExcelExport()
+        _ghi_danh_sach_lop(export, lop['TenLop'], nien_khoa.TenNienKhoa, lop['SiSo'], siso_toida, hoc_sinh)
+        yield f"Danh_sach_lop_{lop['TenLop']}_{nien_khoa.TenNienKhoa}.xlsx", export.to_bytes()
+
+
+class XuatDanhSachHocSinhView(XuatFileNenMixin, APIView):
     """
     API để xuất danh sách học sinh của một lớp ra file Excel.
+    Thêm ?async=1 để xuất nền (xem reporting/jobs.py).
     """
     permission_classes = [IsAuthenticated]
+    loai_xuat = 'danh_sach_lop'
 
     def get(self, request, *args, **kwargs):
         lophoc_id = request.query_params.get('lophoc_id')
         if not lophoc_id:
             return Response({"detail": "Vui lòng cung cấp ID của lớp học."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        try:
-            lop_hoc = LopHoc.objects.select_related('IDNienKhoa').get(pk=lophoc_id)
-        except LopHoc.DoesNotExist:
+        if not LopHoc.objects.filter(pk=lophoc_id).exists():
             return Response({"detail": "Lớp học không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+        if self.xuat_nen(request):
+            return self.tao_tac_vu(request)
 
-        # Lấy sĩ số tối đa để hiển thị
-        try:
-            tham_so = ThamSo.objects.get(IDNienKhoa=lop_hoc.IDNienKhoa)
-            siso_toida = tham_so.SiSoToiDa
-        except ThamSo.DoesNotExist:
-            siso_toida = "N/A" # Giá trị mặc định nếu không có quy định
-
-        hoc_sinh_list = lop_hoc.HocSinh.all().order_by('Ten', 'Ho')
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"DS Lop {lop_hoc.TenLop}"
-
-        title_font = Font(name='Calibri', size=16, bold=True)
-        header_font = Font(name='Calibri', size=12, bold=True)
-        center_alignment = Alignment(horizontal='center', vertical='center')
-        left_alignment = Alignment(horizontal='left', vertical='center')
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-        ws.merge_cells('A1:F1')
-        title_cell = ws['A1']
-        title_cell.value = "DANH SÁCH HỌC SINH"
-        title_cell.font = title_font
-        title_cell.alignment = center_alignment
-
-        ws.append([]) 
-        ws.append(['Niên khóa:', lop_hoc.IDNienKhoa.TenNienKhoa])
-        ws['A3'].font = header_font
-        ws.append(['Lớp:', lop_hoc.TenLop])
-        ws['A4'].font = header_font
-        
-        # === BỔ SUNG DÒNG SĨ SỐ ===
-        ws.append(['Sĩ số:', f"{lop_hoc.SiSo} / {siso_toida}"])
-        ws['A5'].font = header_font
-        ws.append([]) 
-
-        table_headers = ['STT', 'Họ và tên', 'Giới tính', 'Ngày sinh', 'Email', 'Địa chỉ']
-        ws.append(table_headers)
-        header_row_num = ws.max_row
-        
-        for cell in ws[header_row_num]:
-            cell.font = header_font
-            cell.alignment = center_alignment
-            cell.border = thin_border
-
-        for index, hs in enumerate(hoc_sinh_list, start=1):
-            row_data = [
-                index, f"{hs.Ho} {hs.Ten}", hs.GioiTinh,
-                hs.NgaySinh.strftime('%d/%m/%Y'), hs.Email or '', hs.DiaChi
-            ]
-            ws.append(row_data)
-            # Áp dụng border và căn lề cho dòng dữ liệu
-            for cell in ws[ws.max_row]:
-                cell.border = thin_border
-                if cell.column == 1: # Cột STT
-                    cell.alignment = center_alignment
-                else:
-                    cell.alignment = left_alignment
-        
-        for col_index in range(1, len(table_headers) + 1):
-            column_letter = get_column_letter(col_index)
-            max_length = 0
-            for cell in ws[column_letter]:
-                try:
-                    if cell.value:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        filename = f"Danh_sach_lop_{lop_hoc.TenLop}_{lop_hoc.IDNienKhoa.TenNienKhoa}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename*="UTF-8\'\'{filename}"' 
-        wb.save(response)
-        return response
+        export, filename = tao_file_danh_sach_lop(request.query_params)
+        return export.as_response(filename)
     
 
-class DanhSachHocSinhJsonView(generics.ListAPIView):
+class XuatDanhSachNienKhoaView(XuatFileNenMixin, APIView):
     """
-    API trả về danh sách học sinh của một lớp dưới dạng JSON để hiển thị trên web.
+    Xuất danh sách học sinh của mọi lớp trong niên khóa: IDNienKhoa, tùy chọn IDKhoi.
+    dinh_dang=xlsx (mặc định): một file, mỗi lớp một sheet (hỗ trợ ?async=1).
+    dinh_dang=zip: file ZIP gồm một file Excel cho mỗi lớp, gửi dần trong lúc dựng.
+    """
+    permission_classes = [IsAuthenticated]
+    loai_xuat = 'danh_sach_nien_khoa'
+
+    def get(self, request, *args, **kwargs):
+        IDNienKhoa = request.query_params.get('IDNienKhoa')
+        IDKhoi = request.query_params.get('IDKhoi')
+        dinh_dang = request.query_params.get('dinh_dang', 'xlsx')
+        if not IDNienKhoa:
+            return Response({"detail": "Vui lòng cung cấp ID của niên khóa."}, status=status.HTTP_400_BAD_REQUEST)
+        if dinh_dang not in ('xlsx', 'zip'):
+            return Response({"detail": "Định dạng phải là xlsx hoặc zip."}, status=status.HTTP_400_BAD_REQUEST)
+        nien_khoa = NienKhoa.objects.filter(pk=IDNienKhoa).first()
+        if nien_khoa is None:
+            return Response({"detail": "Niên khóa không tồn tại."}, status=status.HTTP_404_NOT_FOUND)
+        lop_qs = LopHoc.objects.filter(IDNienKhoa=nien_khoa)
+        if IDKhoi:
+            lop_qs = lop_qs.filter(IDKhoi=IDKhoi)
+        if not lop_qs.exists():
+            return Response({"detail": "Không có lớp học nào trong phạm vi đã chọn."}, status=status.HTTP_404_NOT_FOUND)
+
+        if dinh_dang == 'zip':
+            # File .xlsx đã được nén sẵn nên chỉ lưu (ZIP_STORED)
+            response = StreamingHttpResponse(
+                stream_zip(file_danh_sach_tung_lop(nien_khoa, IDKhoi), zipfile.ZIP_STORED),
+                content_type="application/zip",
+            )
+            response['Content-Disposition'] = f'attachment; filename="Danh_sach_lop_{nien_khoa.TenNienKhoa}.zip"'
+            return response
+
+        if self.xuat_nen(request):
+            return self.tao_tac_vu(request)
+        export, filename = tao_file_danh_sach_nien_khoa(request.query_params)
+        return export.as_response(filename)
+
+
+class DanhSachHocSinhJsonView(StreamExportMixin, generics.ListAPIView):
+    """
+    API trả về danh sách học sinh của một lớp dưới dạng JSON để hiển thị trên web,
+    hoặc CSV/NDJSON khi có ?format=csv|ndjson.
     """
     serializer_class = HocSinhSerializer
     permission_classes = [IsAuthenticated]
 
+    # Cột khi stream: các trường của HocSinhSerializer
+    COT_STREAM = {
+        'id': 'id', 'TenNienKhoaTiepNhan': 'IDNienKhoaTiepNhan__TenNienKhoa', 'TenKhoiDuKien': 'KhoiDuKien__TenKhoi',
+        'Ho': 'Ho', 'Ten': 'Ten', 'GioiTinh': 'GioiTinh', 'NgaySinh': 'NgaySinh', 'DiaChi': 'DiaChi',
+        'Email': 'Email', 'IDNienKhoaTiepNhan': 'IDNienKhoaTiepNhan_id', 'KhoiDuKien': 'KhoiDuKien_id',
+    }
+
+    def list(self, request, *args, **kwargs):
+        dinh_dang = self.dinh_dang_stream(request)
+        if not dinh_dang:
+            return super().list(request, *args, **kwargs)
+        rows = self.get_queryset().values_list(*self.COT_STREAM.values()).iterator(chunk_size=CHUNK_SIZE)
+        return stream_response(dinh_dang, list(self.COT_STREAM), rows, f"danh_sach_lop_{request.query_params.get('lophoc_id')}")
+
     def get_queryset(self):
         lophoc_id = self.request.query_params.get('lophoc_id')
         if not lophoc_id:
@@ -346,4 +520,40 @@ class DanhSachHocSinhJsonView(generics.ListAPIView):
             # Lấy danh sách học sinh và sắp xếp theo Tên, Họ
             return lop_hoc.HocSinh.all().order_by('Ten', 'Ho')
         except LopHoc.DoesNotExist:
-            return HocSinh.objects.none()
\ No newline at end of file
+            return HocSinh.objects.none()
+
+class GoiYView(APIView):
+    """
+    Gợi ý khi gõ (typeahead) học sinh, lớp học, môn học trong một niên khóa, trả lời từ
+    chỉ mục trong bộ nhớ (classes/autocomplete.py).
+    Tham số: IDNienKhoa, q, tùy chọn loai (HocSinh,LopHoc,MonHoc), limit,
+    và cho học sinh: khoi_id (khối dự kiến), chua_phan_lop=1.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        IDNienKhoa = request.query_params.get("IDNienKhoa")
+        if not IDNienKhoa:
+            return Response({"detail": "Thiếu IDNienKhoa"}, status=status.HTTP_400_BAD_REQUEST)
+        loai = [l for l in request.query_params.get("loai", ",".join(autocomplete.LOAI)).split(",") if l]
+        if not loai or any(l not in autocomplete.LOAI for l in loai):
+            return Response(
+                {"detail": f"loai phải là một hoặc nhiều giá trị trong {', '.join(autocomplete.LOAI)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            IDNienKhoa = int(IDNienKhoa)
+            so_luong = int(request.query_params.get("limit", autocomplete.SO_GOI_Y))
+            khoi_id = request.query_params.get("khoi_id")
+            khoi_id = int(khoi_id) if khoi_id else None
+        except ValueError:
+            return Response({"detail": "Tham số không hợp lệ"}, status=status.HTTP_400_BAD_REQUEST)
+        so_luong = min(max(so_luong, 1), autocomplete.SO_GOI_Y_TOI_DA)
+
+        chua_phan_lop = request.query_params.get("chua_phan_lop") in ("1", "true")
+        loc = None
+        if khoi_id or chua_phan_lop:
+            def loc(hs):
+                return (not khoi_id or hs["KhoiDuKien"] == khoi_id) and (not chua_phan_lop or hs["IDLopHoc"] is None)
+
+        return Response(autocomplete.goi_y(IDNienKhoa, request.query_params.get("q", ""), loai, so_luong, loc))
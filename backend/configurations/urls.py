@@ -9,6 +9,7 @@ urlpatterns = [
     path('quydinh/settings/latest/', views.LatestQuyDinhSettingsView.as_view(), name='latest-quydinh-settings'),
     path('quydinh/latest/', views.LatestQuyDinhView.as_view(), name='latest-quydinh'),
     path('quydinh/<int:IDNienKhoa>/', views.QuyDinhDetailView.as_view(), name='detail-quydinh'),
+    path('nienkhoa/ket-chuyen/', views.KetChuyenNienKhoaView.as_view(), name='ket-chuyen-nien-khoa'),
     path('nienkhoa-list/', views.ListNienKhoaView.as_view(), name='nienkhoa-list'),
     path('khoi-list/', views.ListKhoiView.as_view(), name='khoi-list'),
     path('tao-nien-khoa-va-tham-so/', TaoNienKhoaVaThamSoView.as_view(), name='tao-nien-khoa-tham-so'),
@@ -9,7 +9,10 @@ from .models import NienKhoa, ThamSo
 from .serializers import ThamSoSerializer, CreateQuyDinhVaNienKhoaSerializer, NienKhoaSerializer, GiaoVuUpdateThamSoSerializer
 from students.models import HocSinh
 from classes.models import LopHoc
+from classes.membership import VuotSiSo
+from classes.rollover import ket_chuyen_nien_khoa
 from .serializers import CreateQuyDinhVaNienKhoaSerializer
+from django.db import IntegrityError, transaction
 
 class TaoNienKhoaVaThamSoView(generics.CreateAPIView):
     queryset = ThamSo.objects.all()
@@ -115,6 +118,51 @@ class LatestQuyDinhView(views.APIView):
         return Response(serializer.data)
     
 
+class KetChuyenNienKhoaView(views.APIView):
+    """
+    Kết chuyển niên khóa (classes/rollover.py): sao môn học, lớp học, môn của lớp sang niên khóa
+    đích và cho học sinh đạt lên lớp. Body: IDNienKhoaNguon, tùy chọn IDNienKhoaDich (mặc định
+    niên khóa liền sau) và xem_truoc=true (chạy rồi hoàn tác, chỉ trả về báo cáo).
+    """
+    permission_classes = [IsAuthenticated, IsBGH]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            tu = NienKhoa.objects.get(pk=request.data.get('IDNienKhoaNguon'))
+        except (NienKhoa.DoesNotExist, ValueError, TypeError):
+            return Response({"detail": "Không tìm thấy niên khóa nguồn."}, status=status.HTTP_404_NOT_FOUND)
+
+        IDNienKhoaDich = request.data.get('IDNienKhoaDich')
+        try:
+            if IDNienKhoaDich:
+                den = NienKhoa.objects.get(pk=IDNienKhoaDich)
+            else:
+                nam = int(tu.TenNienKhoa.split('-')[0]) + 1
+                den = NienKhoa.objects.get(TenNienKhoa=f"{nam}-{nam + 1}")
+        except (NienKhoa.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {"detail": "Không tìm thấy niên khóa đích. Hãy tạo niên khóa và quy định mới trước."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if den.TenNienKhoa <= tu.TenNienKhoa:
+            return Response({"detail": "Niên khóa đích phải sau niên khóa nguồn."}, status=status.HTTP_400_BAD_REQUEST)
+        if not ThamSo.objects.filter(IDNienKhoa=den).exists():
+            return Response({"detail": "Niên khóa đích chưa có quy định."}, status=status.HTTP_400_BAD_REQUEST)
+
+        xem_truoc = str(request.data.get('xem_truoc', '')).lower() in ('1', 'true')
+        try:
+            with transaction.atomic():
+                bao_cao = ket_chuyen_nien_khoa(tu, den)
+                if xem_truoc:
+                    transaction.set_rollback(True)
+        except (VuotSiSo, IntegrityError):
+            return Response(
+                {"detail": "Lớp học của niên khóa đích vừa được người khác thay đổi. Vui lòng thử lại."},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({"XemTruoc": xem_truoc, **bao_cao}, status=status.HTTP_200_OK if xem_truoc else status.HTTP_201_CREATED)
+
+
 class ListNienKhoaView(generics.ListAPIView):
     queryset = NienKhoa.objects.all()
     serializer_class = NienKhoaSerializer
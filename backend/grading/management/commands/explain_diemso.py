@@ -0,0 +1,69 @@
+# grading/management/commands/explain_diemso.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Q, FilteredRelation
+
+from grading.models import DiemSo
+from reporting.queries import bao_cao_mon_hoc_queryset, diem_tb_hoc_ky_queryset
+from students.models import HocSinh
+from classes.models import LopHoc
+
+
+class Command(BaseCommand):
+    help = (
+        "In kế hoạch thực thi (query plan) của các truy vấn DIEMSO dùng nhiều nhất "
+        "để kiểm tra các index UQ_DIEMSO_HS_LOP_MON_HK, IX_DIEMSO_MON_HK_LOP, IX_DIEMSO_LOP_HK."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lop', type=int, help="ID lớp học (mặc định lấy từ một dòng DIEMSO bất kỳ)")
+        parser.add_argument('--mon', type=int, help="ID môn học")
+        parser.add_argument('--hocky', type=int, help="ID học kỳ")
+
+    def handle(self, *args, **options):
+        mau = DiemSo.objects.values('IDLopHoc_id', 'IDMonHoc_id', 'IDHocKy_id').first()
+        if mau is None and not all(options[k] for k in ('lop', 'mon', 'hocky')):
+            raise CommandError("Bảng DIEMSO chưa có dữ liệu, hãy truyền --lop, --mon và --hocky.")
+        mau = mau or {}
+        lop = options['lop'] or mau['IDLopHoc_id']
+        mon = options['mon'] or mau['IDMonHoc_id']
+        hocky = options['hocky'] or mau['IDHocKy_id']
+        nien_khoa = LopHoc.objects.filter(pk=lop).values_list('IDNienKhoa_id', flat=True).first()
+
+        truy_van = {
+            "Bảng điểm (lớp, môn, học kỳ)": HocSinh.objects.filter(lophoc_list__id=lop).annotate(
+                diem=FilteredRelation('diemso', condition=Q(
+                    diemso__IDLopHoc_id=lop, diemso__IDMonHoc_id=mon, diemso__IDHocKy_id=hocky,
+                )),
+            ).values('id', 'Ho', 'Ten', Diem15=F('diem__Diem15'), Diem1Tiet=F('diem__Diem1Tiet')),
+            "Cập nhật điểm (lớp, môn, học kỳ)": DiemSo.objects.filter(
+                IDLopHoc_id=lop, IDMonHoc_id=mon, IDHocKy_id=hocky,
+            ),
+            "Báo cáo môn học (môn, học kỳ) theo lớp": bao_cao_mon_hoc_queryset(mon, hocky),
+            "Báo cáo học kỳ (niên khóa, học kỳ) theo lớp và học sinh": diem_tb_hoc_ky_queryset(nien_khoa, hocky),
+        }
+
+        for ten, qs in truy_van.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {ten}"))
+            self.stdout.write(str(qs.query))
+            self.stdout.write(self._explain(qs))
+            self.stdout.write("")
+
+    def _explain(self, qs):
+        if connection.vendor != 'microsoft':
+            return qs.explain()
+
+        # mssql-django không hỗ trợ QuerySet.explain(), dùng SHOWPLAN_TEXT của SQL Server
+        sql, params = qs.query.sql_with_params()
+        lines = []
+        with connection.cursor() as cursor:
+            cursor.execute("SET SHOWPLAN_TEXT ON")
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    lines.extend(str(row[0]) for row in cursor.fetchall())
+                    if not cursor.nextset():
+                        break
+            finally:
+                cursor.execute("SET SHOWPLAN_TEXT OFF")
+        return "\n".join(lines)
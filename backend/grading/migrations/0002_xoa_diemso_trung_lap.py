@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def xoa_diemso_trung_lap(apps, schema_editor):
+    """
+    Gộp các dòng DIEMSO trùng (IDHocSinh, IDLopHoc, IDMonHoc, IDHocKy) trước khi thêm
+    ràng buộc unique. Giữ lại dòng có đủ điểm, nếu như nhau thì giữ dòng mới nhất.
+    """
+    DiemSo = apps.get_model('grading', 'DiemSo')
+    db_alias = schema_editor.connection.alias
+
+    giu_lai = {}
+    xoa_ids = []
+    rows = DiemSo.objects.using(db_alias).values_list(
+        'id', 'IDHocSinh_id', 'IDLopHoc_id', 'IDMonHoc_id', 'IDHocKy_id', 'Diem15', 'Diem1Tiet'
+    ).order_by('id')
+    for id_, hs, lop, mon, hk, diem15, diem1tiet in rows.iterator(chunk_size=2000):
+        key = (hs, lop, mon, hk)
+        do_day_du = (diem15 is not None) + (diem1tiet is not None)
+        hien_tai = giu_lai.get(key)
+        if hien_tai is None:
+            giu_lai[key] = (do_day_du, id_)
+        elif do_day_du >= hien_tai[0]:
+            xoa_ids.append(hien_tai[1])
+            giu_lai[key] = (do_day_du, id_)
+        else:
+            xoa_ids.append(id_)
+
+    for i in range(0, len(xoa_ids), 1000):
+        DiemSo.objects.using(db_alias).filter(id__in=xoa_ids[i:i + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grading', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(xoa_diemso_trung_lap, migrations.RunPython.noop),
+    ]
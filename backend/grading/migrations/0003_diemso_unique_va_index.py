@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0001_initial'),
+        ('grading', '0002_xoa_diemso_trung_lap'),
+        ('students', '0002_hocsinh_khoidukien_alter_hocsinh_gioitinh'),
+        ('subjects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diemso',
+            index=models.Index(fields=['IDMonHoc', 'IDHocKy', 'IDLopHoc'], include=('IDHocSinh', 'Diem15', 'Diem1Tiet', 'DiemTB'), name='IX_DIEMSO_MON_HK_LOP'),
+        ),
+        migrations.AddIndex(
+            model_name='diemso',
+            index=models.Index(fields=['IDLopHoc', 'IDHocKy'], include=('IDHocSinh', 'DiemTB'), name='IX_DIEMSO_LOP_HK'),
+        ),
+        migrations.AddConstraint(
+            model_name='diemso',
+            constraint=models.UniqueConstraint(fields=('IDHocSinh', 'IDLopHoc', 'IDMonHoc', 'IDHocKy'), name='UQ_DIEMSO_HS_LOP_MON_HK'),
+        ),
+    ]
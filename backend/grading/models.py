@@ -16,12 +16,37 @@ class DiemSo(models.Model):
     Diem1Tiet = models.FloatField(null=True, blank=True)
     DiemTB = models.FloatField(null=True, blank=True)
 
+    @staticmethod
+    def tinh_diem_tb(diem15, diem1tiet):
+        """Điểm TB = (Điểm 15 phút + 2 * Điểm 1 tiết) / 3, làm tròn 2 chữ số."""
+        if diem15 is None or diem1tiet is None:
+            return None
+        return round((2 * diem1tiet + diem15) / 3, 2)
+
     def save(self, *args, **kwargs):
-        if self.Diem15 is not None and self.Diem1Tiet is not None:
-            self.DiemTB = round((2 * self.Diem1Tiet + self.Diem15) / 3, 2)
-        else:
-            self.DiemTB = None
+        self.DiemTB = self.tinh_diem_tb(self.Diem15, self.Diem1Tiet)
         super().save(*args, **kwargs)
 
     class Meta:
         db_table = 'DIEMSO'
+        constraints = [
+            # Mỗi học sinh chỉ có một dòng điểm cho một (lớp, môn, học kỳ)
+            models.UniqueConstraint(
+                fields=['IDHocSinh', 'IDLopHoc', 'IDMonHoc', 'IDHocKy'],
+                name='UQ_DIEMSO_HS_LOP_MON_HK',
+            ),
+        ]
+        indexes = [
+            # Bảng điểm (lớp, môn, học kỳ) và báo cáo môn học (môn, học kỳ) theo lớp
+            models.Index(
+                fields=['IDMonHoc', 'IDHocKy', 'IDLopHoc'],
+                include=['IDHocSinh', 'Diem15', 'Diem1Tiet', 'DiemTB'],
+                name='IX_DIEMSO_MON_HK_LOP',
+            ),
+            # Báo cáo học kỳ (lớp, học kỳ)
+            models.Index(
+                fields=['IDLopHoc', 'IDHocKy'],
+                include=['IDHocSinh', 'DiemTB'],
+                name='IX_DIEMSO_LOP_HK',
+            ),
+        ]
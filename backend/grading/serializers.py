@@ -41,8 +41,13 @@ class DiemSoSerializer(serializers.ModelSerializer):
 
 
 class HocSinhDiemSerializer(serializers.ModelSerializer):
-    Diem15 = serializers.SerializerMethodField()
-    Diem1Tiet = serializers.SerializerMethodField()
+    """
+    Một dòng của bảng điểm (lớp, môn, học kỳ).
+    `Diem15` và `Diem1Tiet` được annotate sẵn trong queryset của view (một truy vấn JOIN),
+    `DiemDatMon` được truyền qua context nên không phát sinh truy vấn theo từng học sinh.
+    """
+    Diem15 = serializers.FloatField(read_only=True)
+    Diem1Tiet = serializers.FloatField(read_only=True)
     DiemTB = serializers.SerializerMethodField()
     DatHayKhong = serializers.SerializerMethodField()
     HoTen = serializers.SerializerMethodField()
@@ -54,35 +59,31 @@ class HocSinhDiemSerializer(serializers.ModelSerializer):
     def get_HoTen(self, obj):
         return f"{obj.Ho} {obj.Ten}"
 
-    def get_diemso(self, obj):
-        context = self.context
-        return DiemSo.objects.filter(
-            IDHocSinh=obj,
-            IDLopHoc_id=context.get("IDLopHoc"),
-            IDMonHoc_id=context.get("IDMonHoc"),
-            IDHocKy_id=context.get("IDHocKy"),
-        ).first()
-
-    def get_Diem15(self, obj):
-        ds = self.get_diemso(obj)
-        return ds.Diem15 if ds else None
-
-    def get_Diem1Tiet(self, obj):
-        ds = self.get_diemso(obj)
-        return ds.Diem1Tiet if ds else None
-
     def get_DiemTB(self, obj):
-        ds = self.get_diemso(obj)
-        if ds and ds.Diem15 is not None and ds.Diem1Tiet is not None:
-            return round((ds.Diem15 + 2 * ds.Diem1Tiet) / 3, 2)
+        if obj.Diem15 is not None and obj.Diem1Tiet is not None:
+            return round((obj.Diem15 + 2 * obj.Diem1Tiet) / 3, 2)
         return None
 
     def get_DatHayKhong(self, obj):
         dtb = self.get_DiemTB(obj)
-        if dtb is None:
-            return None
-        try:
-            thamso = ThamSo.objects.get(IDNienKhoa=obj.IDNienKhoaTiepNhan)
-            return "Đạt" if dtb >= thamso.DiemDatMon else "Không đạt"
-        except ThamSo.DoesNotExist:
+        diem_dat_mon = self.context.get('DiemDatMon')
+        if dtb is None or diem_dat_mon is None:
             return None
+        return "Đạt" if dtb >= diem_dat_mon else "Không đạt"
+
+
+class DiemHangLoatItemSerializer(serializers.Serializer):
+    IDHocSinh = serializers.IntegerField()
+    Diem15 = serializers.FloatField(min_value=0, max_value=10, allow_null=True, required=False)
+    Diem1Tiet = serializers.FloatField(min_value=0, max_value=10, allow_null=True, required=False)
+
+
+class CapNhatDiemHangLoatSerializer(serializers.Serializer):
+    """
+    Dữ liệu đầu vào của API cập nhật điểm hàng loạt cho một (lớp, môn, học kỳ).
+    Từng dòng trong `DanhSachDiem` được kiểm tra riêng ở view để trả về kết quả theo dòng.
+    """
+    IDLopHoc = serializers.IntegerField()
+    IDMonHoc = serializers.IntegerField()
+    IDHocKy = serializers.IntegerField()
+    DanhSachDiem = serializers.ListField(child=serializers.DictField(), allow_empty=False)
@@ -0,0 +1,195 @@
+# grading/services.py
+import unicodedata
+
+import numpy as np
+import openpyxl
+from django.db import IntegrityError, transaction
+
+from grading.models import DiemSo
+from classes.models import LopHoc, LopHoc_HocSinh
+from configurations.models import ThamSo
+from reporting import snapshots
+
+
+def kiem_tra_khoa_diem(lop_hoc_id, hoc_ky_id):
+    """
+    Kiểm tra quyền nhập/sửa điểm theo quy định (ThamSo) của niên khóa chứa lớp.
+    Trả về thông báo lỗi nếu học kỳ đang bị khóa, ngược lại trả về None.
+    """
+    try:
+        lop_hoc = LopHoc.objects.select_related('IDNienKhoa__thamso').get(pk=lop_hoc_id)
+        thamso = lop_hoc.IDNienKhoa.thamso
+    except (LopHoc.DoesNotExist, ThamSo.DoesNotExist):
+        # Nếu không tìm thấy tham số, cho phép sửa để tránh chặn oan
+        return None
+
+    # Giả định ID Học kỳ 1 là 1, Học kỳ 2 là 2
+    id_hoc_ky = int(hoc_ky_id)
+    if id_hoc_ky == 1 and not thamso.ChoPhepSuaDiemHK1:
+        return "Hệ thống đã khóa chức năng nhập/sửa điểm cho Học kỳ 1."
+    if id_hoc_ky == 2 and not thamso.ChoPhepSuaDiemHK2:
+        return "Hệ thống đã khóa chức năng nhập/sửa điểm cho Học kỳ 2."
+    return None
+
+
+def luu_diem_hang_loat(lop_hoc_id, mon_hoc_id, hoc_ky_id, rows, batch_size=500):
+    """
+    Ghi điểm của nhiều học sinh cho cùng một (lớp, môn, học kỳ) trong một transaction.
+
+    `rows` là danh sách dict {IDHocSinh, Diem15, Diem1Tiet} đã được kiểm tra hợp lệ;
+    dòng không có khóa Diem15/Diem1Tiet thì giữ nguyên điểm đó (None nghĩa là xóa điểm).
+    Các bản ghi đã có được cập nhật bằng bulk_update, bản ghi mới được tạo bằng
+    bulk_create. Trả về dict {IDHocSinh: DiemSo} kèm tập ID học sinh được tạo mới.
+    """
+    try:
+        return _luu_diem(lop_hoc_id, mon_hoc_id, hoc_ky_id, rows, batch_size)
+    except IntegrityError:
+        # Một phiên khác vừa tạo cùng dòng điểm (vi phạm UQ_DIEMSO_HS_LOP_MON_HK):
+        # thử lại một lần, lần này các dòng đó sẽ được cập nhật thay vì tạo mới.
+        return _luu_diem(lop_hoc_id, mon_hoc_id, hoc_ky_id, rows, batch_size)
+
+
+def _luu_diem(lop_hoc_id, mon_hoc_id, hoc_ky_id, rows, batch_size):
+    with transaction.atomic():
+        # Một lớp chỉ có vài chục học sinh nên tải toàn bộ bảng điểm (lớp, môn, học kỳ)
+        # một lần, tránh mệnh đề IN quá dài.
+        hien_co = {
+            d.IDHocSinh_id: d
+            for d in DiemSo.objects.filter(
+                IDLopHoc_id=lop_hoc_id, IDMonHoc_id=mon_hoc_id, IDHocKy_id=hoc_ky_id
+            )
+        }
+
+        tao_moi, cap_nhat, ket_qua = [], [], {}
+        for row in rows:
+            hs_id = row['IDHocSinh']
+            obj = hien_co.get(hs_id)
+            if obj is None:
+                obj = DiemSo(
+                    IDHocSinh_id=hs_id, IDLopHoc_id=lop_hoc_id,
+                    IDMonHoc_id=mon_hoc_id, IDHocKy_id=hoc_ky_id,
+                )
+                tao_moi.append(obj)
+            else:
+                cap_nhat.append(obj)
+            # Trường không có trong dòng thì giữ nguyên điểm đã có
+            if 'Diem15' in row:
+                obj.Diem15 = row['Diem15']
+            if 'Diem1Tiet' in row:
+                obj.Diem1Tiet = row['Diem1Tiet']
+            # bulk_create/bulk_update không gọi save() nên phải tự tính DiemTB
+            obj.DiemTB = DiemSo.tinh_diem_tb(obj.Diem15, obj.Diem1Tiet)
+            ket_qua[hs_id] = obj
+
+        if tao_moi:
+            DiemSo.objects.bulk_create(tao_moi, batch_size=batch_size)
+        if cap_nhat:
+            DiemSo.objects.bulk_update(cap_nhat, ['Diem15', 'Diem1Tiet', 'DiemTB'], batch_size=batch_size)
+        # bulk_create/bulk_update không phát signal nên phải tự đánh dấu ô báo cáo cần tính lại
+        snapshots.danh_dau_o(lop_hoc_id, mon_hoc_id, hoc_ky_id)
+
+    return ket_qua, {obj.IDHocSinh_id for obj in tao_moi}
+
+
+# ====== NHẬP ĐIỂM TỪ FILE EXCEL ======
+TIEU_DE_HO_TEN = "Họ tên"
+
+
+def _chuan_hoa_ho_ten(value):
+    return " ".join(unicodedata.normalize('NFC', str(value)).split()).casefold()
+
+
+def _doc_diem(value):
+    """Chuyển giá trị ô Excel thành float; ô trống -> NaN, không phải số -> None."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return np.nan
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def nhap_diem_tu_excel(file, lop_hoc_id, mon_hoc_id, hoc_ky_id, batch_size=500):
+    """
+    Đọc file Excel cùng bố cục với file do XuatExcelDiemSoAPIView xuất ra
+    (dòng tiêu đề "Họ tên | Điểm 15 phút | Điểm 1 tiết | ...") và ghi điểm hàng loạt.
+
+    File được đọc ở chế độ read-only (streaming). Việc kiểm tra thang điểm 0-10 chạy
+    một lần trên toàn bộ mảng điểm, họ tên được ánh xạ sang IDHocSinh bằng một map
+    lấy từ danh sách lớp. Trả về (số dòng đã ghi, danh sách lỗi theo dòng).
+    """
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        dong_so, ho_ten, diem_tho = [], [], []
+        da_thay_tieu_de = False
+        for idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
+            if not row:
+                continue
+            if not da_thay_tieu_de:
+                da_thay_tieu_de = row[0] is not None and str(row[0]).strip() == TIEU_DE_HO_TEN
+                continue
+            row = tuple(row) + (None,) * (3 - len(row))
+            if row[0] is None or not str(row[0]).strip():
+                continue
+            dong_so.append(idx)
+            ho_ten.append(str(row[0]).strip())
+            diem_tho.append((_doc_diem(row[1]), _doc_diem(row[2])))
+    finally:
+        wb.close()
+
+    if not da_thay_tieu_de:
+        return 0, [{"Dong": None, "errors": {"file": f"Không tìm thấy dòng tiêu đề '{TIEU_DE_HO_TEN}'."}}]
+
+    n = len(dong_so)
+    sai_kieu = np.array([[v is None for v in cap] for cap in diem_tho], dtype=bool).reshape(n, 2)
+    diem = np.array([[np.nan if v is None else v for v in cap] for cap in diem_tho], dtype=float).reshape(n, 2)
+    co_diem = ~np.isnan(diem)
+    ngoai_khoang = co_diem & ((diem < 0) | (diem > 10))
+
+    # Ánh xạ họ tên -> IDHocSinh trong lớp bằng một truy vấn; tên trùng trong lớp bị đánh dấu mơ hồ
+    ma_hoc_sinh, ten_trung = {}, set()
+    thanh_vien = LopHoc_HocSinh.objects.filter(IDLopHoc_id=lop_hoc_id).values_list(
+        'IDHocSinh_id', 'IDHocSinh__Ho', 'IDHocSinh__Ten'
+    )
+    for hs_id, ho, ten in thanh_vien:
+        key = _chuan_hoa_ho_ten(f"{ho} {ten}")
+        if key in ma_hoc_sinh:
+            ten_trung.add(key)
+        ma_hoc_sinh[key] = hs_id
+
+    ten_cot = ('Diem15', 'Diem1Tiet')
+    loi, dong_hop_le, da_gap = [], [], set()
+    for i in range(n):
+        errors = {}
+        for j, cot in enumerate(ten_cot):
+            if sai_kieu[i, j]:
+                errors[cot] = "Điểm phải là số."
+            elif ngoai_khoang[i, j]:
+                errors[cot] = "Điểm phải nằm trong khoảng 0 đến 10."
+        key = _chuan_hoa_ho_ten(ho_ten[i])
+        hs_id = ma_hoc_sinh.get(key)
+        if key in ten_trung:
+            errors['HoTen'] = "Có nhiều học sinh cùng họ tên trong lớp, vui lòng nhập trực tiếp."
+        elif hs_id is None:
+            errors['HoTen'] = "Không tìm thấy học sinh trong lớp."
+        elif hs_id in da_gap:
+            errors['HoTen'] = "Học sinh bị lặp trong file."
+        if errors:
+            loi.append({"Dong": dong_so[i], "HoTen": ho_ten[i], "errors": errors})
+            continue
+        da_gap.add(hs_id)
+        # Ô trống không ghi đè điểm đã có
+        dong = {'IDHocSinh': hs_id}
+        for j, cot in enumerate(ten_cot):
+            if co_diem[i, j]:
+                dong[cot] = float(diem[i, j])
+        dong_hop_le.append(dong)
+
+    if dong_hop_le:
+        luu_diem_hang_loat(lop_hoc_id, mon_hoc_id, hoc_ky_id, dong_hop_le, batch_size=batch_size)
+    return len(dong_hop_le), loi
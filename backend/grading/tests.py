@@ -1,3 +1,66 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from classes.membership import cap_nhat_danh_sach_lop
+from classes.models import Khoi, LopHoc, LopHoc_MonHoc
+from classes.tests import tao_hoc_sinh, tao_nien_khoa
+from subjects.models import MonHoc
+from .models import DiemSo, HocKy
+
+URL_HANG_LOAT = "/api/grading/diemso/cap-nhat-hang-loat/"
+
+
+class CapNhatDiemHangLoatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        nien_khoa = tao_nien_khoa("2024-2025")
+        cls.hoc_ky = HocKy.objects.create(id=1, TenHocKy="Học kỳ 1")
+        khoi = Khoi.objects.create(TenKhoi="Khối 10")
+        cls.lop = LopHoc.objects.create(TenLop="10A1", IDKhoi=khoi, IDNienKhoa=nien_khoa)
+        cls.mon = MonHoc.objects.create(TenMonHoc="Toán", IDNienKhoa=nien_khoa)
+        LopHoc_MonHoc.objects.create(IDLopHoc=cls.lop, IDMonHoc=cls.mon)
+        cls.hs1, cls.hs2 = tao_hoc_sinh(nien_khoa, 2)
+        cap_nhat_danh_sach_lop(cls.lop, [cls.hs1.pk, cls.hs2.pk])
+        cls.diem = DiemSo.objects.create(
+            IDHocSinh=cls.hs1, IDLopHoc=cls.lop, IDMonHoc=cls.mon, IDHocKy=cls.hoc_ky,
+            Diem15=4, Diem1Tiet=8,
+        )
+        cls.user = User.objects.create_user("gv", password="x" * 8)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def gui(self, danh_sach):
+        return self.client.post(URL_HANG_LOAT, {
+            "IDLopHoc": self.lop.pk, "IDMonHoc": self.mon.pk, "IDHocKy": self.hoc_ky.pk,
+            "DanhSachDiem": danh_sach,
+        }, format="json")
+
+    def test_dong_thieu_cot_diem_giu_diem_cu(self):
+        response = self.gui([{"IDHocSinh": self.hs1.pk, "Diem15": 6}])
+        self.assertEqual(response.status_code, 200)
+        self.diem.refresh_from_db()
+        self.assertEqual((self.diem.Diem15, self.diem.Diem1Tiet), (6, 8))
+        self.assertEqual(self.diem.DiemTB, DiemSo.tinh_diem_tb(6, 8))
+
+    def test_null_xoa_diem(self):
+        response = self.gui([{"IDHocSinh": self.hs1.pk, "Diem1Tiet": None}])
+        self.assertEqual(response.status_code, 200)
+        self.diem.refresh_from_db()
+        self.assertEqual((self.diem.Diem15, self.diem.Diem1Tiet), (4, None))
+
+    def test_tao_moi_va_bao_loi_theo_dong(self):
+        response = self.gui([
+            {"IDHocSinh": self.hs2.pk, "Diem1Tiet": 7},
+            {"IDHocSinh": self.hs2.pk, "Diem15": 5},
+            {"IDHocSinh": self.hs1.pk, "Diem15": 11},
+        ])
+        self.assertEqual(response.status_code, 200)
+        trang_thai = [dong["status"] for dong in response.json()["KetQua"]]
+        self.assertEqual(trang_thai[1:], ["error", "error"])
+        moi = DiemSo.objects.get(IDHocSinh=self.hs2, IDMonHoc=self.mon, IDHocKy=self.hoc_ky)
+        self.assertEqual((moi.Diem15, moi.Diem1Tiet), (None, 7))
+        self.diem.refresh_from_db()
+        self.assertEqual(self.diem.Diem15, 4)
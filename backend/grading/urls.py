@@ -2,13 +2,19 @@ from django.urls import path
 from .views import (
     DiemSoListView,
     cap_nhat_diem,
+    cap_nhat_diem_hang_loat,
     ListHocKyView,
     XuatExcelDiemSoAPIView,
+    NhapExcelDiemSoAPIView,
+    TrichXuatDiemSoView,
 )
 
 urlpatterns = [
     path('diemso/', DiemSoListView.as_view(), name='diemso-list'),
     path('diemso/cap-nhat/', cap_nhat_diem, name='cap-nhat-diem'),
+    path('diemso/cap-nhat-hang-loat/', cap_nhat_diem_hang_loat, name='cap-nhat-diem-hang-loat'),
     path('hocky-list/', ListHocKyView.as_view(), name='hocky-list'),
     path('diemso/xuat-excel/', XuatExcelDiemSoAPIView.as_view(), name='diemso-xuat-excel'),
+    path('diemso/nhap-excel/', NhapExcelDiemSoAPIView.as_view(), name='diemso-nhap-excel'),
+    path('diemso/trich-xuat/', TrichXuatDiemSoView.as_view(), name='diemso-trich-xuat'),
 ]
@@ -1,43 +1,33 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.parsers import MultiPartParser, FormParser
 
 from django.http import HttpResponse
-import openpyxl
-import io
-from openpyxl.styles import Border, Side, Alignment, Font, PatternFill
-from openpyxl.cell.cell import Cell
+from django.db.models import F, Q, FilteredRelation
+import zipfile
 
 from grading.models import DiemSo, HocKy
-from grading.serializers import DiemSoSerializer, HocKySerializer, HocSinhDiemSerializer
+from grading.serializers import (
+    DiemSoSerializer, HocKySerializer, HocSinhDiemSerializer,
+    CapNhatDiemHangLoatSerializer, DiemHangLoatItemSerializer,
+)
+from grading.services import kiem_tra_khoa_diem, luu_diem_hang_loat, nhap_diem_tu_excel
 from students.models import HocSinh
 from classes.models import LopHoc_HocSinh, LopHoc_MonHoc
 from configurations.models import ThamSo
+from accounts.permissions import IsBGH, IsGiaoVu
+from reporting.excel import ExcelExport
+from reporting.jobs import XuatFileNenMixin
+from reporting.streaming import CHUNK_SIZE, StreamExportMixin, stream_response
 
-from classes.models import LopHoc
 from configurations.models import  NienKhoa
 
 
-# ====== HÀM: Tự động giãn cột Excel ======
-def auto_adjust_column_width(ws):
-    for col in ws.columns:
-        max_length = 0
-        column_letter = None
-        for cell in col:
-            if isinstance(cell, Cell): 
-                if column_letter is None:
-                    column_letter = cell.column_letter
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-        if column_letter:
-            ws.column_dimensions[column_letter].width = max_length + 2
-
-
 # ====== API LẤY DANH SÁCH HỌC SINH VÀ ĐIỂM ======
-class DiemSoListView(APIView):
+class DiemSoListView(StreamExportMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -61,22 +51,56 @@ class DiemSoListView(APIView):
         if not LopHoc_MonHoc.objects.filter(IDLopHoc_id=IDLopHoc, IDMonHoc_id=IDMonHoc).exists():
             return Response({"detail": "Môn học không thuộc lớp học này"}, status=400)
 
-        # Lọc học sinh theo IDLopHoc và IDNienKhoa đã xác định
-        hoc_sinh_ids = LopHoc_HocSinh.objects.filter(IDLopHoc_id=IDLopHoc).values_list("IDHocSinh_id", flat=True)
-        hoc_sinh_list = HocSinh.objects.filter(id__in=hoc_sinh_ids, IDNienKhoaTiepNhan_id=IDNienKhoa)
+        # Điểm đạt môn chỉ cần lấy một lần cho cả bảng điểm
+        diem_dat_mon = ThamSo.objects.filter(IDNienKhoa_id=IDNienKhoa).values_list('DiemDatMon', flat=True).first()
+
+        # Lọc học sinh theo IDLopHoc và IDNienKhoa đã xác định, LEFT JOIN sẵn điểm của
+        # (lớp, môn, học kỳ) để cả bảng điểm chỉ tốn một truy vấn
+        hoc_sinh_list = HocSinh.objects.filter(
+            lophoc_list__id=IDLopHoc,
+            IDNienKhoaTiepNhan_id=IDNienKhoa,
+        ).annotate(
+            diem=FilteredRelation('diemso', condition=Q(
+                diemso__IDLopHoc_id=IDLopHoc,
+                diemso__IDMonHoc_id=IDMonHoc,
+                diemso__IDHocKy_id=IDHocKy,
+            )),
+        ).annotate(
+            Diem15=F('diem__Diem15'),
+            Diem1Tiet=F('diem__Diem1Tiet'),
+        ).only('id', 'Ho', 'Ten').order_by('id')
+
+        dinh_dang = self.dinh_dang_stream(request)
+        if dinh_dang:
+            return stream_response(
+                dinh_dang, HocSinhDiemSerializer.Meta.fields,
+                _dong_bang_diem(hoc_sinh_list, diem_dat_mon), "bang_diem",
+            )
 
         serializer = HocSinhDiemSerializer(
             hoc_sinh_list,
             many=True,
-            context={
-                'IDLopHoc': IDLopHoc,
-                'IDMonHoc': IDMonHoc,
-                'IDHocKy': IDHocKy,
-            }
+            context={'DiemDatMon': diem_dat_mon}
         )
+
+        # ?compact=1: trả về dạng các mảng song song, mỗi trường một mảng
+        if request.query_params.get('compact') in ('1', 'true'):
+            fields = HocSinhDiemSerializer.Meta.fields
+            rows = serializer.data
+            return Response({field: [row[field] for row in rows] for field in fields})
+
         return Response(serializer.data)
 
 
+def _dong_bang_diem(hoc_sinh_list, diem_dat_mon):
+    """Các dòng của bảng điểm theo thứ tự HocSinhDiemSerializer.Meta.fields, đọc bằng con trỏ."""
+    rows = hoc_sinh_list.values_list('id', 'Ho', 'Ten', 'Diem15', 'Diem1Tiet')
+    for hs_id, ho, ten, diem15, diem1tiet in rows.iterator(chunk_size=CHUNK_SIZE):
+        dtb = DiemSo.tinh_diem_tb(diem15, diem1tiet)
+        dat = None if dtb is None or diem_dat_mon is None else ("Đạt" if dtb >= diem_dat_mon else "Không đạt")
+        yield hs_id, f"{ho} {ten}", diem15, diem1tiet, dtb, dat
+
+
 # ====== API CẬP NHẬT HOẶC TẠO ĐIỂM MỚI ======
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -88,24 +112,9 @@ def cap_nhat_diem(request):
             return Response({f: 'Trường này bắt buộc'}, status=400)
 
     # === LOGIC KIỂM TRA QUYỀN SỬA ĐIỂM ===
-    try:
-        lop_hoc = LopHoc.objects.select_related('IDNienKhoa__thamso').get(pk=data['IDLopHoc'])
-        thamso = lop_hoc.IDNienKhoa.thamso
-        id_hoc_ky = int(data['IDHocKy'])
-
-        # Giả định ID Học kỳ 1 là 1, Học kỳ 2 là 2
-        if id_hoc_ky == 1 and not thamso.ChoPhepSuaDiemHK1:
-            raise PermissionDenied("Hệ thống đã khóa chức năng nhập/sửa điểm cho Học kỳ 1.")
-        elif id_hoc_ky == 2 and not thamso.ChoPhepSuaDiemHK2:
-            raise PermissionDenied("Hệ thống đã khóa chức năng nhập/sửa điểm cho Học kỳ 2.")
-
-    except (LopHoc.DoesNotExist, ThamSo.DoesNotExist):
-        # Nếu không tìm thấy tham số, cho phép sửa để tránh chặn oan
-        pass 
-    except PermissionDenied as e:
-        # Bắt lỗi và trả về cho client
-        return Response({"detail": str(e)}, status=status.HTTP_403_FORBIDDEN)
-    
+    loi_khoa_diem = kiem_tra_khoa_diem(data['IDLopHoc'], data['IDHocKy'])
+    if loi_khoa_diem:
+        return Response({"detail": loi_khoa_diem}, status=status.HTTP_403_FORBIDDEN)
 
     diem15 = data.get('Diem15')
     diem1tiet = data.get('Diem1Tiet')
@@ -136,6 +145,120 @@ def cap_nhat_diem(request):
     return Response(DiemSoSerializer(obj).data, status=status.HTTP_200_OK)
 
 
+# ====== API CẬP NHẬT ĐIỂM HÀNG LOẠT CHO MỘT LỚP/MÔN/HỌC KỲ ======
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cap_nhat_diem_hang_loat(request):
+    """
+    Nhận danh sách {IDHocSinh, Diem15, Diem1Tiet} của một (IDLopHoc, IDMonHoc, IDHocKy).
+    Quyền sửa điểm và môn học của lớp chỉ được kiểm tra một lần; toàn bộ các dòng
+    hợp lệ được ghi trong một transaction. Trả về kết quả theo từng dòng.
+    """
+    serializer = CapNhatDiemHangLoatSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    IDLopHoc = serializer.validated_data['IDLopHoc']
+    IDMonHoc = serializer.validated_data['IDMonHoc']
+    IDHocKy = serializer.validated_data['IDHocKy']
+
+    loi_khoa_diem = kiem_tra_khoa_diem(IDLopHoc, IDHocKy)
+    if loi_khoa_diem:
+        return Response({"detail": loi_khoa_diem}, status=status.HTTP_403_FORBIDDEN)
+
+    if not LopHoc_MonHoc.objects.filter(IDLopHoc_id=IDLopHoc, IDMonHoc_id=IDMonHoc).exists():
+        return Response({"detail": "Môn học không thuộc lớp học này"}, status=400)
+
+    hoc_sinh_trong_lop = set(
+        LopHoc_HocSinh.objects.filter(IDLopHoc_id=IDLopHoc).values_list('IDHocSinh_id', flat=True)
+    )
+
+    # Kiểm tra từng dòng, giữ nguyên thứ tự gửi lên để trả kết quả tương ứng
+    ket_qua, dong_hop_le, da_gap = [], [], set()
+    for dong in serializer.validated_data['DanhSachDiem']:
+        item = DiemHangLoatItemSerializer(data=dong)
+        if not item.is_valid():
+            ket_qua.append({"IDHocSinh": dong.get('IDHocSinh'), "status": "error", "errors": item.errors})
+            continue
+        hs_id = item.validated_data['IDHocSinh']
+        if hs_id not in hoc_sinh_trong_lop:
+            ket_qua.append({"IDHocSinh": hs_id, "status": "error", "errors": {"IDHocSinh": "Học sinh không thuộc lớp học này."}})
+            continue
+        if hs_id in da_gap:
+            ket_qua.append({"IDHocSinh": hs_id, "status": "error", "errors": {"IDHocSinh": "Học sinh bị lặp trong danh sách."}})
+            continue
+        da_gap.add(hs_id)
+        dong_hop_le.append(item.validated_data)
+        ket_qua.append(None)  # Điền sau khi ghi
+
+    da_luu, tao_moi = luu_diem_hang_loat(IDLopHoc, IDMonHoc, IDHocKy, dong_hop_le)
+
+    dong_iter = iter(dong_hop_le)
+    for i, kq in enumerate(ket_qua):
+        if kq is not None:
+            continue
+        hs_id = next(dong_iter)['IDHocSinh']
+        obj = da_luu[hs_id]
+        ket_qua[i] = {
+            "IDHocSinh": hs_id,
+            "status": "created" if hs_id in tao_moi else "updated",
+            "Diem15": obj.Diem15,
+            "Diem1Tiet": obj.Diem1Tiet,
+            "DiemTB": obj.DiemTB,
+        }
+
+    so_loi = sum(1 for kq in ket_qua if kq["status"] == "error")
+    return Response({
+        "SoDongThanhCong": len(dong_hop_le),
+        "SoDongLoi": so_loi,
+        "KetQua": ket_qua,
+    }, status=status.HTTP_200_OK)
+
+
+
+# ====== API NHẬP ĐIỂM TỪ FILE EXCEL ======
+class NhapExcelDiemSoAPIView(APIView):
+    """
+    Nhận file Excel cùng bố cục với file xuất bảng điểm (form-data: `file`,
+    `IDLopHoc`, `IDMonHoc`, `IDHocKy`) và ghi điểm hàng loạt.
+    Các dòng hợp lệ được lưu, các dòng lỗi được trả về kèm số dòng trong file.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        file = request.FILES.get('file')
+        IDLopHoc = request.data.get('IDLopHoc')
+        IDMonHoc = request.data.get('IDMonHoc')
+        IDHocKy = request.data.get('IDHocKy')
+
+        if not file:
+            return Response({"file": "Vui lòng chọn file Excel."}, status=400)
+        if not all([IDLopHoc, IDMonHoc, IDHocKy]):
+            return Response({"detail": "Thiếu tham số Lớp học, Môn học hoặc Học kỳ."}, status=400)
+        try:
+            IDLopHoc, IDMonHoc, IDHocKy = int(IDLopHoc), int(IDMonHoc), int(IDHocKy)
+        except (TypeError, ValueError):
+            return Response({"detail": "Lớp học, Môn học và Học kỳ phải là ID hợp lệ."}, status=400)
+
+        loi_khoa_diem = kiem_tra_khoa_diem(IDLopHoc, IDHocKy)
+        if loi_khoa_diem:
+            return Response({"detail": loi_khoa_diem}, status=status.HTTP_403_FORBIDDEN)
+
+        if not LopHoc_MonHoc.objects.filter(IDLopHoc_id=IDLopHoc, IDMonHoc_id=IDMonHoc).exists():
+            return Response({"detail": "Môn học không thuộc lớp học này"}, status=400)
+
+        try:
+            so_dong, loi = nhap_diem_tu_excel(file, IDLopHoc, IDMonHoc, IDHocKy)
+        except (zipfile.BadZipFile, KeyError, OSError):
+            return Response({"file": "File không đúng định dạng Excel (.xlsx)."}, status=400)
+
+        return Response({
+            "SoDongThanhCong": so_dong,
+            "SoDongLoi": len(loi),
+            "Loi": loi,
+        }, status=status.HTTP_200_OK)
+
 
 class ListHocKyView(generics.ListAPIView):
     queryset = HocKy.objects.all()
@@ -144,95 +267,105 @@ class ListHocKyView(generics.ListAPIView):
 
 
 
-class XuatExcelDiemSoAPIView(APIView):
+def tao_file_bang_diem(params):
+    """
+    Dựng file Excel bảng điểm của một (lớp, môn, học kỳ) từ các tham số
+    IDNienKhoa, IDLopHoc, IDMonHoc, IDHocKy. Trả về None nếu không có dữ liệu.
+    """
+    IDNienKhoa = params.get("IDNienKhoa")
+    qs = DiemSo.objects.filter(
+        IDLopHoc=params.get("IDLopHoc"),
+        IDMonHoc=params.get("IDMonHoc"),
+        IDHocKy=params.get("IDHocKy"),
+        IDHocSinh__IDNienKhoaTiepNhan=IDNienKhoa
+    )
+
+    # Thông tin lọc
+    thong_tin = qs.values(
+        'IDLopHoc__TenLop', 'IDMonHoc__TenMonHoc', 'IDHocKy__TenHocKy',
+        'IDHocSinh__IDNienKhoaTiepNhan__TenNienKhoa',
+    ).first()
+    if thong_tin is None:
+        return None
+
+    # Điểm đạt môn theo quy định của niên khóa
+    diem_dat_mon = ThamSo.objects.filter(IDNienKhoa_id=IDNienKhoa).values_list('DiemDatMon', flat=True).first()
+    if diem_dat_mon is None:
+        diem_dat_mon = 5.0
+
+    export = ExcelExport()
+    ws = export.add_sheet("Bảng điểm")
+
+    # Tiêu đề + bộ lọc
+    ws.append(["BẢNG ĐIỂM MÔN HỌC"], style='tieu_de', track_width=False)
+    ws.merge("A1:E1")
+    ws.append([])
+    ws.append(["Niên khóa:", thong_tin['IDHocSinh__IDNienKhoaTiepNhan__TenNienKhoa']])
+    ws.append(["Lớp học:", thong_tin['IDLopHoc__TenLop']])
+    ws.append(["Môn học:", thong_tin['IDMonHoc__TenMonHoc']])
+    ws.append(["Học kỳ:", thong_tin['IDHocKy__TenHocKy']])
+    ws.append([])
+
+    # Header
+    ws.append(["Họ tên", "Điểm 15 phút", "Điểm 1 tiết", "Điểm TB", "Kết quả"], style='tieu_de_cot')
+
+    # Dữ liệu học sinh
+    rows = qs.order_by('IDHocSinh_id').values_list('IDHocSinh__Ho', 'IDHocSinh__Ten', 'Diem15', 'Diem1Tiet')
+    for ho, ten, diem15, diem1tiet in rows.iterator(chunk_size=2000):
+        tb = (diem15 + 2 * diem1tiet) / 3 if diem15 is not None and diem1tiet is not None else None
+        ket_qua = "Đạt" if tb is not None and tb >= diem_dat_mon else "Không đạt"
+        ws.append([
+            f"{ho} {ten}",
+            diem15 if diem15 is not None else "",
+            diem1tiet if diem1tiet is not None else "",
+            f"{tb:.2f}" if tb is not None else "",
+            ket_qua
+        ], style='o_khong_dat' if ket_qua == "Không đạt" else 'o')
+
+    return export, "bang_diem.xlsx"
+
+
+class XuatExcelDiemSoAPIView(XuatFileNenMixin, APIView):
     permission_classes = [IsAuthenticated]
+    loai_xuat = 'bang_diem'
 
     def get(self, request):
-        IDNienKhoa = request.query_params.get("IDNienKhoa")
-        IDLopHoc = request.query_params.get("IDLopHoc")
-        IDMonHoc = request.query_params.get("IDMonHoc")
-        IDHocKy = request.query_params.get("IDHocKy")
-
-        qs = DiemSo.objects.filter(
-            IDLopHoc=IDLopHoc,
-            IDMonHoc=IDMonHoc,
-            IDHocKy=IDHocKy,
-            IDHocSinh__IDNienKhoaTiepNhan=IDNienKhoa
-        ).select_related("IDHocSinh", "IDLopHoc", "IDMonHoc", "IDHocKy")
-
-        if not qs.exists():
+        if self.xuat_nen(request):
+            return self.tao_tac_vu(request)
+        result = tao_file_bang_diem(request.query_params)
+        if result is None:
             return HttpResponse("Không có dữ liệu", status=400)
+        export, filename = result
+        return export.as_response(filename)
+
+
+class TrichXuatDiemSoView(StreamExportMixin, APIView):
+    """
+    Trích xuất toàn bộ DIEMSO của một niên khóa dạng CSV (mặc định) hoặc NDJSON (?format=ndjson).
+    Tham số: IDNienKhoa, tùy chọn IDHocKy. Dữ liệu được stream bằng con trỏ phía server.
+    """
+    permission_classes = [IsAuthenticated, IsBGH | IsGiaoVu]
 
-        # Thông tin lọc
-        lop_hoc = qs[0].IDLopHoc.TenLop
-        mon_hoc = qs[0].IDMonHoc.TenMonHoc
-        hoc_ky = qs[0].IDHocKy.TenHocKy
-        nien_khoa = qs[0].IDHocSinh.IDNienKhoaTiepNhan.TenNienKhoa
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Bảng điểm"
-
-        # Styles
-        border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                        top=Side(style='thin'), bottom=Side(style='thin'))
-        bold_font = Font(bold=True)
-        center_align = Alignment(horizontal='center', vertical='center')
-        fill_khongdat = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
-
-        # Tiêu đề + bộ lọc
-        ws.merge_cells("A1:E1")
-        ws["A1"] = "BẢNG ĐIỂM MÔN HỌC"
-        ws["A1"].font = Font(size=14, bold=True)
-        ws["A1"].alignment = center_align
-
-        ws.append([])
-        ws.append(["Niên khóa:", nien_khoa])
-        ws.append(["Lớp học:", lop_hoc])
-        ws.append(["Môn học:", mon_hoc])
-        ws.append(["Học kỳ:", hoc_ky])
-        ws.append([])
-
-        # Header
-        headers = ["Họ tên", "Điểm 15 phút", "Điểm 1 tiết", "Điểm TB", "Kết quả"]
-        ws.append(headers)
-        for cell in ws[ws.max_row]:
-            cell.font = bold_font
-            cell.border = border
-            cell.alignment = center_align
-
-        # Điểm đạt môn
-        diem_dat_mon = ThamSo.objects.last().DiemDatMon if ThamSo.objects.exists() else 5.0
-
-        # Dữ liệu học sinh
-        for d in qs:
-            tb = (d.Diem15 + 2 * d.Diem1Tiet) / 3 if d.Diem15 is not None and d.Diem1Tiet is not None else None
-            ket_qua = "Đạt" if tb is not None and tb >= diem_dat_mon else "Không đạt"
-            ho_ten = f"{d.IDHocSinh.Ho} {d.IDHocSinh.Ten}"
-
-            row_data = [
-                ho_ten,
-                d.Diem15 or "",
-                d.Diem1Tiet or "",
-                f"{tb:.2f}" if tb is not None else "",
-                ket_qua
-            ]
-            ws.append(row_data)
-
-            for cell in ws[ws.max_row]:
-                cell.border = border
-                cell.alignment = center_align
-                if ket_qua == "Không đạt":
-                    cell.fill = fill_khongdat
-
-        auto_adjust_column_width(ws)
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return HttpResponse(
-            output,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=bang_diem.xlsx"},
+    COLUMNS = [
+        'IDHocSinh', 'HoTen', 'IDLopHoc', 'TenLop', 'IDMonHoc', 'TenMonHoc',
+        'IDHocKy', 'Diem15', 'Diem1Tiet', 'DiemTB',
+    ]
+
+    def get(self, request):
+        IDNienKhoa = request.query_params.get('IDNienKhoa')
+        if not IDNienKhoa:
+            return Response({"detail": "Thiếu tham số IDNienKhoa."}, status=400)
+
+        qs = DiemSo.objects.filter(IDLopHoc__IDNienKhoa_id=IDNienKhoa)
+        if request.query_params.get('IDHocKy'):
+            qs = qs.filter(IDHocKy_id=request.query_params.get('IDHocKy'))
+        rows = qs.order_by('id').values_list(
+            'IDHocSinh_id', 'IDHocSinh__Ho', 'IDHocSinh__Ten', 'IDLopHoc_id', 'IDLopHoc__TenLop',
+            'IDMonHoc_id', 'IDMonHoc__TenMonHoc', 'IDHocKy_id', 'Diem15', 'Diem1Tiet', 'DiemTB',
+        ).iterator(chunk_size=CHUNK_SIZE)
+
+        return stream_response(
+            self.dinh_dang_stream(request) or 'csv', self.COLUMNS,
+            ((hs, f"{ho} {ten}", *rest) for hs, ho, ten, *rest in rows),
+            f"diem_so_nien_khoa_{IDNienKhoa}",
         )
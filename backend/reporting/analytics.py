@@ -0,0 +1,237 @@
+# reporting/analytics.py
+"""
+Bộ tính báo cáo trên dữ liệu dạng cột bằng NumPy.
+
+Toàn bộ điểm của một phạm vi (niên khóa, môn, học kỳ...) được nạp bằng một truy vấn
+values_list vào các mảng (BangDiem). Trung bình nhóm, số lượng đạt, phân vị và phổ điểm
+được tính vectorized bằng np.unique / np.bincount, không lặp theo từng dòng điểm.
+
+Các hàm tinh_bao_cao_*_truc_tiep có cùng chữ ký và kết quả với reporting/queries.py nên
+dùng thay thế được (settings.REPORT_ANALYTICS_BACKEND = 'numpy').
+"""
+import numpy as np
+
+from grading.models import DiemSo
+from classes.models import LopHoc
+from configurations.models import ThamSo
+from subjects.models import MonHoc
+from .queries import DIEM_DAT_MON_MAC_DINH, lop_hoc_cua_mon
+
+COT = (
+    'IDLopHoc__IDNienKhoa_id', 'IDHocSinh_id', 'IDLopHoc_id', 'IDMonHoc_id', 'IDHocKy_id',
+    'Diem15', 'Diem1Tiet', 'DiemTB',
+)
+
+# Các mốc phổ điểm: [0,1), [1,2), ..., [9,10]
+MOC_PHO_DIEM = np.arange(0, 11, dtype=float)
+PHAN_VI_MAC_DINH = (10, 25, 50, 75, 90)
+
+
+class BangDiem:
+    """Các cột của DIEMSO dưới dạng mảng NumPy; điểm trống là NaN."""
+
+    def __init__(self, nien_khoa, hoc_sinh, lop, mon, hoc_ky, diem15, diem1tiet, diem_tb):
+        self.nien_khoa = nien_khoa
+        self.hoc_sinh = hoc_sinh
+        self.lop = lop
+        self.mon = mon
+        self.hoc_ky = hoc_ky
+        self.diem15 = diem15
+        self.diem1tiet = diem1tiet
+        self.diem_tb = diem_tb
+
+    @classmethod
+    def tai(cls, **filters):
+        """Nạp các dòng DIEMSO thỏa `filters` bằng một truy vấn."""
+        rows = list(DiemSo.objects.filter(**filters).values_list(*COT).order_by())
+        # None -> NaN khi ép sang float
+        arr = np.array(rows, dtype=float).reshape(len(rows), len(COT))
+        ids = arr[:, :5].astype(np.int64)
+        return cls(*ids.T, *arr[:, 5:].T)
+
+    def __len__(self):
+        return len(self.diem_tb)
+
+    def diem_dat_mon(self):
+        """Ngưỡng đạt của từng dòng theo ThamSo của niên khóa chứa lớp."""
+        cac_nien_khoa = np.unique(self.nien_khoa)
+        nguong = dict(
+            ThamSo.objects.filter(IDNienKhoa__in=cac_nien_khoa.tolist()).values_list('IDNienKhoa_id', 'DiemDatMon')
+        )
+        gia_tri = np.array([nguong.get(int(nk), DIEM_DAT_MON_MAC_DINH) for nk in cac_nien_khoa], dtype=float)
+        return gia_tri[np.searchsorted(cac_nien_khoa, self.nien_khoa)]
+
+
+# ====== Các phép tính theo nhóm ======
+def nhom(*cot):
+    """
+    Trả về (mảng khóa nhóm duy nhất, đã sắp xếp; chỉ số nhóm của từng dòng).
+    Mỗi cột được mã hóa thành 0..k-1 rồi gộp thành một số nguyên duy nhất, nên chỉ cần
+    np.unique trên mảng 1 chiều (nhanh hơn nhiều so với np.unique(axis=0)).
+    """
+    if not len(cot[0]):
+        return np.empty((0, len(cot)), dtype=np.int64), np.empty(0, dtype=np.int64)
+    gia_tri, ma, kich_thuoc = [], [], []
+    for c in cot:
+        u, inv = np.unique(c, return_inverse=True)
+        gia_tri.append(u)
+        ma.append(inv.ravel())
+        kich_thuoc.append(len(u))
+    khoa_gop, chi_so = np.unique(np.ravel_multi_index(ma, kich_thuoc), return_inverse=True)
+    khoa = np.column_stack([u[i] for u, i in zip(gia_tri, np.unravel_index(khoa_gop, kich_thuoc))])
+    return khoa, chi_so.ravel()
+
+
+def dem_nhom(chi_so, so_nhom):
+    return np.bincount(chi_so, minlength=so_nhom)
+
+
+def trung_binh_nhom(chi_so, gia_tri, so_nhom):
+    """Trung bình theo nhóm, bỏ qua NaN như AVG của SQL; nhóm không có giá trị -> NaN."""
+    co = ~np.isnan(gia_tri)
+    tong = np.bincount(chi_so[co], weights=gia_tri[co], minlength=so_nhom)
+    dem = np.bincount(chi_so[co], minlength=so_nhom)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return tong / dem
+
+
+def dem_dat_nhom(chi_so, gia_tri, nguong, so_nhom):
+    """Số giá trị >= ngưỡng theo nhóm (NaN không tính là đạt)."""
+    with np.errstate(invalid='ignore'):
+        dat = gia_tri >= nguong
+    return np.bincount(chi_so[dat], minlength=so_nhom)
+
+
+def phan_vi_nhom(chi_so, gia_tri, phan_vi, so_nhom):
+    """
+    Phân vị (nội suy tuyến tính như np.percentile) theo nhóm, bỏ qua NaN.
+    Sắp xếp một lần theo (nhóm, giá trị) rồi lấy vị trí của từng phân vị trong mỗi nhóm.
+    """
+    co = ~np.isnan(gia_tri)
+    chi_so, gia_tri = chi_so[co], gia_tri[co]
+    thu_tu = np.lexsort((gia_tri, chi_so))
+    gia_tri = gia_tri[thu_tu]
+    dem = np.bincount(chi_so, minlength=so_nhom)
+    bat_dau = np.concatenate(([0], np.cumsum(dem)[:-1]))
+
+    ket_qua = np.full((so_nhom, len(phan_vi)), np.nan)
+    co_du_lieu = dem > 0
+    bat_dau, dem = bat_dau[co_du_lieu], dem[co_du_lieu]
+    for j, q in enumerate(phan_vi):
+        vi_tri = bat_dau + (dem - 1) * (q / 100)
+        duoi = np.floor(vi_tri).astype(np.int64)
+        tren = np.ceil(vi_tri).astype(np.int64)
+        ket_qua[co_du_lieu, j] = gia_tri[duoi] + (gia_tri[tren] - gia_tri[duoi]) * (vi_tri - duoi)
+    return ket_qua
+
+
+def pho_diem_nhom(chi_so, gia_tri, so_nhom, moc=MOC_PHO_DIEM):
+    """Số giá trị rơi vào từng khoảng của `moc` theo nhóm (khoảng cuối lấy cả mốc trên)."""
+    co = ~np.isnan(gia_tri)
+    so_khoang = len(moc) - 1
+    khoang = np.clip(np.digitize(gia_tri[co], moc[1:-1]), 0, so_khoang - 1)
+    return np.bincount(chi_so[co] * so_khoang + khoang, minlength=so_nhom * so_khoang).reshape(so_nhom, so_khoang)
+
+
+# ====== Báo cáo (cùng kết quả với reporting/queries.py) ======
+def _ti_le(so_dat, si_so):
+    return round((so_dat / si_so) * 100, 2) if si_so > 0 else 0
+
+
+def _ten_lop(lop_ids):
+    return dict(LopHoc.objects.filter(pk__in=[int(x) for x in lop_ids]).values_list('id', 'TenLop'))
+
+
+def tong_hop_mon_hoc(bang):
+    """Các dòng (nien_khoa, lop, mon, hoc_ky, SiSo, SoLuongDat) theo (lớp, môn, học kỳ)."""
+    khoa, chi_so = nhom(bang.lop, bang.mon, bang.hoc_ky)
+    n = len(khoa)
+    si_so = dem_nhom(chi_so, n)
+    so_dat = dem_dat_nhom(chi_so, bang.diem_tb, bang.diem_dat_mon(), n)
+    nien_khoa = np.zeros(n, dtype=np.int64)
+    nien_khoa[chi_so] = bang.nien_khoa
+    return [
+        (int(nk), int(lop), int(mon), int(hk), int(ss), int(sd))
+        for nk, (lop, mon, hk), ss, sd in zip(nien_khoa, khoa, si_so, so_dat)
+    ]
+
+
+def tong_hop_hoc_ky(bang):
+    """Các dòng (nien_khoa, lop, hoc_ky, SiSo, SoLuongDat) theo (lớp, học kỳ), dựa trên điểm TB học kỳ."""
+    # Mức 1: điểm TB học kỳ của từng học sinh trong lớp
+    khoa_hs, chi_so_hs = nhom(bang.lop, bang.hoc_ky, bang.hoc_sinh)
+    n_hs = len(khoa_hs)
+    diem_hk = trung_binh_nhom(chi_so_hs, bang.diem_tb, n_hs)
+    nguong = np.zeros(n_hs)
+    nguong[chi_so_hs] = bang.diem_dat_mon()
+    nien_khoa = np.zeros(n_hs, dtype=np.int64)
+    nien_khoa[chi_so_hs] = bang.nien_khoa
+
+    # Mức 2: gộp học sinh theo (lớp, học kỳ)
+    khoa, chi_so = nhom(khoa_hs[:, 0], khoa_hs[:, 1])
+    n = len(khoa)
+    si_so = dem_nhom(chi_so, n)
+    with np.errstate(invalid='ignore'):
+        dat = diem_hk >= nguong
+    so_dat = np.bincount(chi_so[dat], minlength=n)
+    nk_nhom = np.zeros(n, dtype=np.int64)
+    nk_nhom[chi_so] = nien_khoa
+    return [
+        (int(nk), int(lop), int(hk), int(ss), int(sd))
+        for nk, (lop, hk), ss, sd in zip(nk_nhom, khoa, si_so, so_dat)
+    ]
+
+
+def tinh_bao_cao_mon_hoc_truc_tiep(IDMonHoc, IDHocKy):
+    dem = {
+        lop: (si_so, so_dat)
+        for _, lop, _, _, si_so, so_dat in tong_hop_mon_hoc(BangDiem.tai(IDMonHoc=IDMonHoc, IDHocKy=IDHocKy))
+    }
+    data = []
+    for lop, ten_lop in lop_hoc_cua_mon(IDMonHoc).order_by('id').values_list('id', 'TenLop'):
+        si_so, so_dat = dem.get(lop, (0, 0))
+        data.append({"IDLopHoc": lop, "TenLop": ten_lop, "SiSo": si_so, "SoLuongDat": so_dat, "TiLe": _ti_le(so_dat, si_so)})
+    return data
+
+
+def tinh_bao_cao_hoc_ky_truc_tiep(IDNienKhoa, IDHocKy):
+    rows = tong_hop_hoc_ky(BangDiem.tai(IDLopHoc__IDNienKhoa=IDNienKhoa, IDHocKy=IDHocKy))
+    ten_lop = _ten_lop(r[1] for r in rows)
+    return [
+        {"IDLopHoc": lop, "TenLop": ten_lop.get(lop), "SiSo": si_so, "SoLuongDat": so_dat, "TiLe": _ti_le(so_dat, si_so)}
+        for _, lop, _, si_so, so_dat in rows
+    ]
+
+
+def phan_bo_diem_mon_hoc(IDNienKhoa, IDHocKy=None, phan_vi=PHAN_VI_MAC_DINH):
+    """Phân bố DiemTB theo môn học của một niên khóa: trung bình, số đạt, phân vị và phổ điểm."""
+    filters = {'IDLopHoc__IDNienKhoa': IDNienKhoa}
+    if IDHocKy:
+        filters['IDHocKy'] = IDHocKy
+    bang = BangDiem.tai(**filters)
+    khoa, chi_so = nhom(bang.mon)
+    n = len(khoa)
+    so_diem = np.bincount(chi_so[~np.isnan(bang.diem_tb)], minlength=n)
+    trung_binh = trung_binh_nhom(chi_so, bang.diem_tb, n)
+    so_dat = dem_dat_nhom(chi_so, bang.diem_tb, bang.diem_dat_mon(), n)
+    cac_phan_vi = phan_vi_nhom(chi_so, bang.diem_tb, phan_vi, n)
+    pho_diem = pho_diem_nhom(chi_so, bang.diem_tb, n)
+
+    ten_mon = dict(MonHoc.objects.filter(pk__in=khoa[:, 0].tolist()).values_list('id', 'TenMonHoc'))
+
+    def _so(x):
+        return None if np.isnan(x) else round(float(x), 2)
+
+    return [
+        {
+            "IDMonHoc": int(mon),
+            "TenMonHoc": ten_mon.get(int(mon)),
+            "SoDiem": int(so_diem[i]),
+            "DiemTBTrungBinh": _so(trung_binh[i]),
+            "SoLuongDat": int(so_dat[i]),
+            "TiLe": _ti_le(int(so_dat[i]), int(so_diem[i])),
+            "PhanVi": {f"P{q}": _so(cac_phan_vi[i, j]) for j, q in enumerate(phan_vi)},
+            "PhoDiem": pho_diem[i].tolist(),
+        }
+        for i, (mon,) in enumerate(khoa)
+    ]
@@ -0,0 +1,141 @@
+# reporting/cache.py
+"""
+Cache kết quả báo cáo (JSON và file Excel) theo phiên bản dữ liệu của từng niên khóa.
+
+- Mỗi niên khóa có một bộ đếm phiên bản trong cache. Khóa cache của một báo cáo gồm
+  niên khóa, phiên bản hiện tại và các tham số (học kỳ, môn học...). Khi điểm, danh sách
+  lớp hoặc quy định của niên khóa thay đổi, chỉ cần đổi phiên bản (tang_phien_ban),
+  các kết quả cũ tự hết hạn mà không phải tìm và xóa từng khóa.
+- Chống dồn tải (stampede): khi nhiều request cùng trượt cache, chỉ request giữ được khóa
+  tính kết quả, các request còn lại chờ kết quả được ghi vào cache.
+- Dùng cache alias "baocao" (xem CACHES trong settings): LocMemCache trong một tiến trình,
+  hoặc FileBasedCache dùng chung giữa các worker.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+CACHE_ALIAS = "baocao"
+
+# Thời gian tối đa một request giữ khóa tính toán / các request khác chờ kết quả
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def dung_chung():
+    """
+    True nếu cache "baocao" dùng chung giữa các worker. Với LocMemCache, tang_phien_ban chỉ
+    đổi phiên bản trong tiến trình ghi, nên không được cache kết quả mà không có hạn.
+    """
+    return not isinstance(_cache(), LocMemCache)
+
+
+def _khoa_phien_ban(nien_khoa_id, nhom):
+    return f"{nhom}:phienban:{nien_khoa_id}"
+
+
+def _phien_ban_moi():
+    # Dùng giá trị chưa từng xuất hiện thay vì incr: FileBasedCache không incr nguyên tử,
+    # và nếu bộ đếm bị xóa khỏi cache thì phiên bản mới vẫn không trùng phiên bản cũ.
+    return f"{time.time_ns():x}{os.getpid():x}"
+
+
+def phien_ban(nien_khoa_id, nhom="baocao"):
+    """
+    Phiên bản dữ liệu hiện tại của niên khóa. `nhom` tách các bộ đếm độc lập
+    (ví dụ "goiy" cho chỉ mục gợi ý của classes/autocomplete.py).
+    """
+    cache = _cache()
+    key = _khoa_phien_ban(nien_khoa_id, nhom)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _phien_ban_moi(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def tang_phien_ban(nien_khoa_id, nhom="baocao"):
+    """Làm mọi kết quả đã cache theo phiên bản `nhom` của niên khóa trở nên cũ."""
+    _cache().set(_khoa_phien_ban(nien_khoa_id, nhom), _phien_ban_moi(), timeout=None)
+
+
+class _KhoaTinhToan:
+    """
+    Khóa loại trừ giữa các request cùng tính một báo cáo.
+    cache.add() là nguyên tử với LocMemCache nhưng không với FileBasedCache, nên với cache
+    trên đĩa khóa là một file tạo bằng O_EXCL trong thư mục cache.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.path = None
+        if isinstance(cache, FileBasedCache):
+            self.path = cache._key_to_file(key) + ".lock"
+
+    def acquire(self):
+        if self.path is None:
+            return self.cache.add(self.key, 1, timeout=LOCK_TIMEOUT)
+        try:
+            os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            # Khóa của một tiến trình đã chết: bỏ đi để lần thử sau lấy được
+            try:
+                if time.time() - os.path.getmtime(self.path) > LOCK_TIMEOUT:
+                    os.remove(self.path)
+            except OSError:
+                pass
+            return False
+        except FileNotFoundError:
+            # Thư mục cache chưa được tạo
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            return self.acquire()
+
+    def release(self):
+        if self.path is None:
+            self.cache.delete(self.key)
+            return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def lay_hoac_tinh(nien_khoa_id, tham_so, tinh, timeout=DEFAULT_TIMEOUT):
+    """
+    Trả về kết quả đã cache của báo cáo (nien_khoa_id, *tham_so) ở phiên bản dữ liệu hiện tại,
+    nếu chưa có thì gọi tinh() đúng một lần dù có nhiều request đồng thời.
+    `timeout` mặc định là settings.REPORT_CACHE_TIMEOUT, None nghĩa là không hết hạn.
+    """
+    cache = _cache()
+    key = ":".join(["baocao", str(nien_khoa_id), str(phien_ban(nien_khoa_id))] + [str(p) for p in tham_so])
+    khoa = _KhoaTinhToan(cache, key + ":khoa")
+    han_cho = time.monotonic() + LOCK_TIMEOUT
+
+    while True:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if khoa.acquire():
+            try:
+                value = cache.get(key)
+                if value is None:
+                    value = tinh()
+                    cache.set(key, value, settings.REPORT_CACHE_TIMEOUT if timeout is DEFAULT_TIMEOUT else timeout)
+                return value
+            finally:
+                khoa.release()
+        if time.monotonic() >= han_cho:
+            # Chờ quá lâu: tự tính để không treo request
+            return tinh()
+        time.sleep(POLL_INTERVAL)
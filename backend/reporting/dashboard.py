@@ -0,0 +1,120 @@
+# reporting/dashboard.py
+"""
+Số liệu trang chủ BGH cho một niên khóa, tính bằng vài truy vấn gom nhóm:
+tài khoản theo vai trò, lớp/học sinh theo khối, sĩ số so với SiSoToiDa và tỉ lệ đạt
+theo học kỳ, theo môn (đọc từ bảng tổng hợp BAOCAOHOCKY/BAOCAOMONHOC).
+"""
+from collections import defaultdict
+
+from django.db.models import Avg, Count, Sum
+
+from accounts.views import dem_tai_khoan_theo_vai_tro
+from classes.models import LopHoc
+from configurations.models import NienKhoa
+from grading.models import DiemSo, HocKy
+from subjects.models import MonHoc
+from .models import BaoCaoHocKy, BaoCaoMonHoc
+from .snapshots import da_dung, dong_hoc_ky, dong_mon_hoc
+
+# Số liệu tài khoản không gắn với phiên bản dữ liệu niên khóa nên chỉ giữ ngắn
+DASHBOARD_CACHE_TIMEOUT = 60
+
+
+def nien_khoa_hien_tai():
+    return NienKhoa.objects.select_related('thamso').order_by('-TenNienKhoa').first()
+
+
+def _ti_le(so_dat, si_so):
+    return round((so_dat / si_so) * 100, 2) if si_so else 0
+
+
+def _ty_le_dat(bang, nhom):
+    return list(
+        bang.values(*nhom).annotate(SiSo=Sum('SiSo'), SoLuongDat=Sum('SoLuongDat')).order_by(*nhom)
+    )
+
+
+def _ty_le_dat_truc_tiep(nien_khoa):
+    """Như hai lần _ty_le_dat() nhưng gộp từ DIEMSO, khi bảng tổng hợp của niên khóa chưa được dựng."""
+    diem = DiemSo.objects.filter(IDLopHoc__IDNienKhoa=nien_khoa)
+    ten_hoc_ky = dict(HocKy.objects.values_list('id', 'TenHocKy'))
+    ten_mon = dict(MonHoc.objects.filter(IDNienKhoa=nien_khoa).values_list('id', 'TenMonHoc'))
+
+    theo_hoc_ky, theo_mon = defaultdict(lambda: [0, 0]), defaultdict(lambda: [0, 0])
+    for dong in dong_hoc_ky(diem):
+        dem = theo_hoc_ky[dong.IDHocKy_id]
+        dem[0] += dong.SiSo
+        dem[1] += dong.SoLuongDat
+    for dong in dong_mon_hoc(diem):
+        dem = theo_mon[(dong.IDMonHoc_id, dong.IDHocKy_id)]
+        dem[0] += dong.SiSo
+        dem[1] += dong.SoLuongDat
+
+    hoc_ky = [
+        {'IDHocKy_id': hk, 'IDHocKy__TenHocKy': ten_hoc_ky.get(hk), 'SiSo': si_so, 'SoLuongDat': so_dat}
+        for hk, (si_so, so_dat) in sorted(theo_hoc_ky.items())
+    ]
+    mon_hoc = [
+        {'IDMonHoc_id': mon, 'IDMonHoc__TenMonHoc': ten_mon.get(mon), 'IDHocKy_id': hk, 'SiSo': si_so, 'SoLuongDat': so_dat}
+        for (mon, hk), (si_so, so_dat) in sorted(theo_mon.items())
+    ]
+    return hoc_ky, mon_hoc
+
+
+def tinh_dashboard(nien_khoa):
+    thamso = getattr(nien_khoa, 'thamso', None)
+
+    theo_vai_tro = dem_tai_khoan_theo_vai_tro()
+
+    khoi = []
+    tong_lop = tong_hoc_sinh = 0
+    for row in LopHoc.objects.filter(IDNienKhoa=nien_khoa).values('IDKhoi_id', 'IDKhoi__TenKhoi').annotate(
+        SoLop=Count('id'), SoHocSinh=Sum('SiSo'), SiSoTrungBinh=Avg('SiSo'),
+    ).order_by('IDKhoi_id'):
+        tong_lop += row['SoLop']
+        tong_hoc_sinh += row['SoHocSinh'] or 0
+        khoi.append({
+            "IDKhoi": row['IDKhoi_id'],
+            "TenKhoi": row['IDKhoi__TenKhoi'],
+            "SoLop": row['SoLop'],
+            "SoHocSinh": row['SoHocSinh'] or 0,
+            "SiSoTrungBinh": round(row['SiSoTrungBinh'] or 0, 2),
+        })
+
+    # Cả hai bảng tổng hợp chỉ được đọc khi niên khóa đã được dựng đầy đủ (rebuild_baocao)
+    if da_dung(nien_khoa.pk):
+        hoc_ky = _ty_le_dat(BaoCaoHocKy.objects.filter(IDNienKhoa=nien_khoa), ['IDHocKy_id', 'IDHocKy__TenHocKy'])
+        mon_hoc = _ty_le_dat(
+            BaoCaoMonHoc.objects.filter(IDNienKhoa=nien_khoa), ['IDMonHoc_id', 'IDMonHoc__TenMonHoc', 'IDHocKy_id']
+        )
+    else:
+        hoc_ky, mon_hoc = _ty_le_dat_truc_tiep(nien_khoa)
+
+    si_so_tb = round(tong_hoc_sinh / tong_lop, 2) if tong_lop else 0
+    si_so_toi_da = thamso.SiSoToiDa if thamso else None
+    return {
+        "NienKhoa": {"id": nien_khoa.pk, "TenNienKhoa": nien_khoa.TenNienKhoa},
+        "TaiKhoan": {"TongSo": sum(theo_vai_tro.values()), "TheoVaiTro": theo_vai_tro},
+        "Khoi": khoi,
+        "SiSo": {
+            "TongSoLop": tong_lop,
+            "TongSoHocSinh": tong_hoc_sinh,
+            "SiSoTrungBinh": si_so_tb,
+            "SiSoToiDa": si_so_toi_da,
+            "TiLeLapDay": _ti_le(si_so_tb, si_so_toi_da),
+        },
+        "HocKy": [
+            {
+                "IDHocKy": row['IDHocKy_id'], "TenHocKy": row['IDHocKy__TenHocKy'],
+                "SiSo": row['SiSo'], "SoLuongDat": row['SoLuongDat'], "TiLe": _ti_le(row['SoLuongDat'], row['SiSo']),
+            }
+            for row in hoc_ky
+        ],
+        "MonHoc": [
+            {
+                "IDMonHoc": row['IDMonHoc_id'], "TenMonHoc": row['IDMonHoc__TenMonHoc'], "IDHocKy": row['IDHocKy_id'],
+                "SiSo": row['SiSo'], "SoLuongDat": row['SoLuongDat'], "TiLe": _ti_le(row['SoLuongDat'], row['SiSo']),
+            }
+            for row in mon_hoc
+        ],
+    }
@@ -0,0 +1,148 @@
+# reporting/excel.py
+"""
+Bộ xuất Excel dùng chung cho các API xuất file (bảng điểm, báo cáo, danh sách lớp).
+
+- Workbook ở chế độ write-only: các dòng được ghi thẳng ra file tạm, bộ nhớ không tăng
+  theo số dòng.
+- Style được khai báo một lần dưới dạng NamedStyle, mỗi ô chỉ tham chiếu tên style.
+- Độ rộng cột được tính trong lúc ghi dòng. Do thẻ <cols> phải đứng trước dữ liệu,
+  một số dòng đầu (WIDTH_LOOKAHEAD_ROWS) được giữ lại để đo trước khi ghi.
+- Kết quả được trả về bằng FileResponse, gửi theo từng khối.
+"""
+import io
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Số dòng đầu tiên được giữ lại để tính độ rộng cột trước khi ghi ra file
+WIDTH_LOOKAHEAD_ROWS = 200
+
+# File nhỏ hơn ngưỡng này nằm trong RAM, lớn hơn sẽ được đẩy ra file tạm
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+_thin = Side(style='thin')
+_border = Border(left=_thin, right=_thin, top=_thin, bottom=_thin)
+_center = Alignment(horizontal='center', vertical='center')
+_left = Alignment(horizontal='left', vertical='center')
+
+# Tên style -> NamedStyle, đăng ký một lần cho mỗi workbook
+STYLES = {
+    'tieu_de': dict(font=Font(size=14, bold=True), alignment=_center),
+    'nhan': dict(font=Font(bold=True)),
+    'ghi_chu': dict(font=Font(italic=True)),
+    'tieu_de_cot': dict(font=Font(bold=True), border=_border, alignment=_center),
+    'o': dict(border=_border, alignment=_center),
+    'o_trai': dict(border=_border, alignment=_left),
+    'o_khong_dat': dict(
+        border=_border, alignment=_center,
+        fill=PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid"),
+    ),
+}
+
+
+class ExcelSheet:
+    """Một worksheet write-only, theo dõi độ rộng cột trong lúc ghi."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widths = {}
+        self._pending = []
+        self._flushed = False
+        self.row_count = 0
+
+    def append(self, values, style=None, styles=None, track_width=True):
+        """
+        Ghi một dòng. `style` áp dụng cho mọi ô, `styles` (list) chỉ định style theo cột;
+        None trong `styles` nghĩa là dùng `style`. Đặt `track_width=False` cho các dòng
+        tiêu đề gộp ô để không làm cột đầu quá rộng.
+        """
+        self.row_count += 1
+        if track_width:
+            for idx, value in enumerate(values, 1):
+                if value is not None and value != "":
+                    length = len(str(value))
+                    if length > self.widths.get(idx, 0):
+                        self.widths[idx] = length
+
+        row = [self._cell(value, (styles[i] if styles and i < len(styles) and styles[i] else style))
+               for i, value in enumerate(values)]
+        if self._flushed:
+            self.ws.append(row)
+        else:
+            self._pending.append(row)
+            if len(self._pending) >= WIDTH_LOOKAHEAD_ROWS:
+                self.flush()
+
+    def merge(self, ref):
+        self.ws.merged_cells.add(CellRange(ref))
+
+    def flush(self):
+        """Chốt độ rộng cột từ các dòng đã đo rồi ghi các dòng đang giữ."""
+        if self._flushed:
+            return
+        for idx, length in self.widths.items():
+            self.ws.column_dimensions[get_column_letter(idx)].width = length + 2
+        for row in self._pending:
+            self.ws.append(row)
+        self._pending = []
+        self._flushed = True
+
+    def _cell(self, value, style):
+        if style is None:
+            return value
+        cell = WriteOnlyCell(self.ws, value=value)
+        cell.style = style
+        return cell
+
+
+class ExcelExport:
+    """
+    Workbook write-only có sẵn các NamedStyle trong STYLES.
+
+        export = ExcelExport()
+        sheet = export.add_sheet("Bảng điểm")
+        sheet.append(["Họ tên", "Điểm"], style='tieu_de_cot')
+        return export.as_response("bang_diem.xlsx")
+    """
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        self.sheets = []
+        for name, attrs in STYLES.items():
+            self.wb.add_named_style(NamedStyle(name=name, **attrs))
+
+    def add_sheet(self, title):
+        # Tên sheet Excel tối đa 31 ký tự và không chứa các ký tự đặc biệt
+        for ch in '[]:*?/\\':
+            title = title.replace(ch, '-')
+        sheet = ExcelSheet(self.wb.create_sheet(title=title[:31]))
+        self.sheets.append(sheet)
+        return sheet
+
+    def save(self, fileobj):
+        for sheet in self.sheets:
+            sheet.flush()
+        self.wb.save(fileobj)
+
+    def to_bytes(self):
+        output = io.BytesIO()
+        self.save(output)
+        return output.getvalue()
+
+    def as_response(self, filename):
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.save(output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def bytes_response(content, filename):
+    """FileResponse cho nội dung file .xlsx đã có sẵn (ví dụ lấy từ cache)."""
+    return FileResponse(io.BytesIO(content), as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,291 @@
+# reporting/hoc_ba.py
+"""
+In học bạ hàng loạt cho một lớp, một khối hoặc cả niên khóa.
+
+- Dữ liệu của mọi học sinh được nạp bằng vài truy vấn (thành viên lớp, môn của lớp,
+  toàn bộ DIEMSO trong phạm vi, học kỳ, quy định) rồi gom thành dict thuần cho từng học sinh.
+- Mỗi học bạ (XLSX hoặc PDF) được dựng trong process pool; các tiến trình con được tạo
+  bằng 'spawn' và giữ lại giữa các request.
+- File dựng xong được ghi ngay vào một ZIP trên luồng không seek được và gửi đi qua
+  StreamingHttpResponse, không dùng thư mục tạm.
+"""
+import io
+import threading
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from xml.sax.saxutils import escape
+
+import django
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from openpyxl.utils import get_column_letter
+
+from classes.models import LopHoc_HocSinh, LopHoc_MonHoc
+from configurations.models import NienKhoa
+from grading.models import DiemSo, HocKy
+from .excel import ExcelExport
+from .queries import DIEM_DAT_MON_MAC_DINH
+from .streaming import stream_zip
+
+DINH_DANG = ('xlsx', 'pdf')
+
+# Số học bạ được gửi vào pool trước cho mỗi tiến trình, giới hạn bộ nhớ chờ ghi ra ZIP
+HANG_CHO_MOI_TIEN_TRINH = 4
+
+# File XLSX vốn đã nén nên chỉ lưu nguyên; PDF được nén thêm
+NEN_ZIP = {'xlsx': zipfile.ZIP_STORED, 'pdf': zipfile.ZIP_DEFLATED}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ====== Nạp dữ liệu ======
+def tai_hoc_ba(IDNienKhoa, IDLopHoc=None, IDKhoi=None):
+    """
+    Danh sách học bạ (dict) của các học sinh trong phạm vi, sắp theo lớp rồi tên.
+    Ném ObjectDoesNotExist nếu không có niên khóa.
+    """
+    nien_khoa = NienKhoa.objects.select_related('thamso').get(pk=IDNienKhoa)
+    try:
+        diem_dat_mon = nien_khoa.thamso.DiemDatMon
+    except ObjectDoesNotExist:
+        diem_dat_mon = DIEM_DAT_MON_MAC_DINH
+
+    pham_vi = {'IDLopHoc__IDNienKhoa': nien_khoa.pk}
+    if IDLopHoc:
+        pham_vi['IDLopHoc'] = IDLopHoc
+    if IDKhoi:
+        pham_vi['IDLopHoc__IDKhoi'] = IDKhoi
+
+    hoc_ky = list(HocKy.objects.order_by('id').values_list('id', 'TenHocKy'))
+
+    mon_cua_lop = defaultdict(set)
+    for lop, ten_mon in LopHoc_MonHoc.objects.filter(**pham_vi).values_list('IDLopHoc_id', 'IDMonHoc__TenMonHoc'):
+        mon_cua_lop[lop].add(ten_mon)
+
+    # (học sinh, lớp) -> tên môn -> học kỳ -> (Diem15, Diem1Tiet, DiemTB)
+    diem = defaultdict(lambda: defaultdict(dict))
+    rows = DiemSo.objects.filter(**pham_vi).values_list(
+        'IDHocSinh_id', 'IDLopHoc_id', 'IDMonHoc__TenMonHoc', 'IDHocKy_id', 'Diem15', 'Diem1Tiet', 'DiemTB',
+    )
+    for hs, lop, ten_mon, hk, diem15, diem1tiet, diem_tb in rows.iterator(chunk_size=2000):
+        diem[(hs, lop)][ten_mon][hk] = (diem15, diem1tiet, diem_tb)
+
+    thanh_vien = LopHoc_HocSinh.objects.filter(**pham_vi).select_related(
+        'IDHocSinh', 'IDLopHoc__IDKhoi',
+    ).order_by('IDLopHoc__TenLop', 'IDHocSinh__Ten', 'IDHocSinh__Ho', 'IDHocSinh_id')
+
+    ket_qua = []
+    for tv in thanh_vien:
+        hs, lop = tv.IDHocSinh, tv.IDLopHoc
+        diem_hs = diem.get((hs.pk, lop.pk), {})
+        ket_qua.append({
+            "IDHocSinh": hs.pk,
+            "HoTen": f"{hs.Ho} {hs.Ten}",
+            "NgaySinh": hs.NgaySinh.strftime('%d/%m/%Y'),
+            "GioiTinh": hs.GioiTinh,
+            "TenLop": lop.TenLop,
+            "TenKhoi": lop.IDKhoi.TenKhoi,
+            "TenNienKhoa": nien_khoa.TenNienKhoa,
+            "DiemDatMon": diem_dat_mon,
+            "HocKy": hoc_ky,
+            "MonHoc": [
+                (ten_mon, dict(diem_hs.get(ten_mon, {})))
+                for ten_mon in sorted(mon_cua_lop[lop.pk] | set(diem_hs))
+            ],
+        })
+    return ket_qua
+
+
+# ====== Dựng học bạ (chạy trong tiến trình con) ======
+def _so(value):
+    return "" if value is None else round(value, 2)
+
+
+def _ket_qua(diem_tb, diem_dat_mon):
+    if diem_tb is None:
+        return ""
+    return "Đạt" if diem_tb >= diem_dat_mon else "Không đạt"
+
+
+def _diem_tb_hoc_ky(hb):
+    """Điểm TB học kỳ = trung bình DiemTB các môn có điểm, như báo cáo học kỳ."""
+    ket_qua = {}
+    for hk, _ in hb["HocKy"]:
+        ds = [d[hk][2] for _, d in hb["MonHoc"] if hk in d and d[hk][2] is not None]
+        ket_qua[hk] = sum(ds) / len(ds) if ds else None
+    return ket_qua
+
+
+def _bang_diem(hb):
+    """Các dòng của bảng điểm: (tiêu đề cột, dòng từng môn, dòng điểm TB học kỳ)."""
+    tieu_de = ["Môn học"]
+    for _, ten_hk in hb["HocKy"]:
+        tieu_de += [f"{ten_hk} - 15 phút", f"{ten_hk} - 1 tiết", f"{ten_hk} - TB", f"{ten_hk} - Kết quả"]
+
+    dong_mon = []
+    for ten_mon, d in hb["MonHoc"]:
+        dong = [ten_mon]
+        for hk, _ in hb["HocKy"]:
+            diem15, diem1tiet, diem_tb = d.get(hk, (None, None, None))
+            dong += [_so(diem15), _so(diem1tiet), _so(diem_tb), _ket_qua(diem_tb, hb["DiemDatMon"])]
+        dong_mon.append(dong)
+
+    dong_tb = ["Điểm TB học kỳ"]
+    for hk, dtb in _diem_tb_hoc_ky(hb).items():
+        dong_tb += ["", "", _so(dtb), _ket_qua(dtb, hb["DiemDatMon"])]
+    return tieu_de, dong_mon, dong_tb
+
+
+def _thong_tin(hb):
+    return [
+        ("Họ tên:", hb["HoTen"]),
+        ("Ngày sinh:", hb["NgaySinh"]),
+        ("Giới tính:", hb["GioiTinh"]),
+        ("Lớp:", f'{hb["TenLop"]} ({hb["TenKhoi"]})'),
+        ("Niên khóa:", hb["TenNienKhoa"]),
+        ("Điểm đạt môn:", hb["DiemDatMon"]),
+    ]
+
+
+def _dung_xlsx(hb):
+    tieu_de, dong_mon, dong_tb = _bang_diem(hb)
+    export = ExcelExport()
+    ws = export.add_sheet("Học bạ")
+
+    ws.append(["HỌC BẠ HỌC SINH"], style='tieu_de', track_width=False)
+    ws.merge(f"A1:{get_column_letter(len(tieu_de))}1")
+    ws.append([])
+    for nhan, gia_tri in _thong_tin(hb):
+        ws.append([nhan, gia_tri], styles=['nhan', None])
+    ws.append([])
+
+    ws.append(tieu_de, style='tieu_de_cot')
+    ket_qua_cot = set(range(4, len(tieu_de), 4))
+    for dong in dong_mon + [dong_tb]:
+        styles = ['o_trai'] + [
+            'o_khong_dat' if i in ket_qua_cot and dong[i] == "Không đạt" else 'o'
+            for i in range(1, len(dong))
+        ]
+        ws.append(dong, styles=styles)
+    return export.to_bytes()
+
+
+_font_pdf = None
+
+
+def _font():
+    """Đăng ký font có dấu tiếng Việt một lần cho mỗi tiến trình; thiếu file font thì dùng Helvetica."""
+    global _font_pdf
+    if _font_pdf is None:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        try:
+            pdfmetrics.registerFont(TTFont("HocBa", settings.REPORT_PDF_FONT))
+            _font_pdf = "HocBa"
+        except Exception:
+            _font_pdf = "Helvetica"
+    return _font_pdf
+
+
+def _dung_pdf(hb):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    font = _font()
+    tieu_de, dong_mon, dong_tb = _bang_diem(hb)
+    # Tiêu đề cột ngắn gọn cho bản in, tên học kỳ đặt ở dòng trên
+    dong_hk = [""]
+    for _, ten_hk in hb["HocKy"]:
+        dong_hk += [ten_hk, "", "", ""]
+    dong_cot = ["Môn học"] + ["15 phút", "1 tiết", "TB", "Kết quả"] * len(hb["HocKy"])
+
+    style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+        ('BACKGROUND', (0, 0), (-1, 1), colors.lightgrey),
+    ] + [('SPAN', (c, 0), (c + 3, 0)) for c in range(1, len(tieu_de), 4)])
+    bang = Table([dong_hk, dong_cot] + dong_mon + [dong_tb], repeatRows=2, style=style)
+
+    chu = ParagraphStyle("hocba", fontName=font, fontSize=10, leading=14)
+    tieu_de_trang = ParagraphStyle("hocba-tieude", parent=chu, fontSize=16, leading=22, alignment=1)
+    output = io.BytesIO()
+    SimpleDocTemplate(output, pagesize=landscape(A4), title=f'Học bạ {hb["HoTen"]}').build(
+        [Paragraph("HỌC BẠ HỌC SINH", tieu_de_trang), Spacer(1, 8)]
+        + [Paragraph(f"<b>{nhan}</b> {escape(str(gia_tri))}", chu) for nhan, gia_tri in _thong_tin(hb)]
+        + [Spacer(1, 12), bang]
+    )
+    return output.getvalue()
+
+
+def ten_file(hb, dinh_dang):
+    """Đường dẫn trong ZIP: mỗi lớp một thư mục."""
+    def sach(s):
+        return "".join("-" if ch in '\\/:*?"<>|' else ch for ch in str(s))
+    return f'{sach(hb["TenLop"])}/{sach(hb["HoTen"])}_{hb["IDHocSinh"]}.{dinh_dang}'
+
+
+def dung_hoc_ba(dinh_dang, hb):
+    """Trả về (tên file trong ZIP, nội dung)."""
+    noi_dung = _dung_pdf(hb) if dinh_dang == 'pdf' else _dung_xlsx(hb)
+    return ten_file(hb, dinh_dang), noi_dung
+
+
+# ====== Process pool và ZIP ======
+def _lay_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.REPORT_CARD_PROCESSES,
+                mp_context=get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _pool
+
+
+def _bo_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _dung_lan_luot(hoc_ba, dinh_dang):
+    """Dựng các học bạ theo đúng thứ tự, giữ tối đa vài học bạ chờ trong pool."""
+    so_tien_trinh = settings.REPORT_CARD_PROCESSES
+    if so_tien_trinh <= 0:
+        for hb in hoc_ba:
+            yield dung_hoc_ba(dinh_dang, hb)
+        return
+
+    pool = _lay_pool()
+    dang_cho = deque()
+    try:
+        for hb in hoc_ba:
+            dang_cho.append(pool.submit(dung_hoc_ba, dinh_dang, hb))
+            if len(dang_cho) >= so_tien_trinh * HANG_CHO_MOI_TIEN_TRINH:
+                yield dang_cho.popleft().result()
+        while dang_cho:
+            yield dang_cho.popleft().result()
+    except BrokenProcessPool:
+        # Một tiến trình con chết: tạo pool mới cho request sau
+        _bo_pool()
+        raise
+    finally:
+        # Client ngắt kết nối giữa chừng: bỏ các học bạ chưa dựng
+        for future in dang_cho:
+            future.cancel()
+
+
+def stream_zip_hoc_ba(hoc_ba, dinh_dang):
+    """Generator các khối byte của file ZIP chứa học bạ của từng học sinh."""
+    return stream_zip(_dung_lan_luot(hoc_ba, dinh_dang), NEN_ZIP[dinh_dang])
@@ -0,0 +1,102 @@
+# reporting/jobs.py
+"""
+Xuất file chạy nền, dùng bảng TACVUXUATFILE làm hàng đợi.
+
+- API xuất file nhận ?async=1 thì chỉ ghi một dòng tác vụ rồi trả về 202 kèm đường dẫn
+  theo dõi tiến độ và tải file.
+- Lệnh `manage.py export_worker` nhận tác vụ bằng UPDATE có điều kiện (chỉ một worker
+  đổi được trạng thái CHO_XU_LY -> DANG_XU_LY) và dựng file trong một process pool.
+- Mỗi loại xuất ứng với một hàm dựng file `tao_file_*(params) -> (ExcelExport, tên file)`
+  hoặc None khi không có dữ liệu, dùng chung với API xuất trực tiếp.
+"""
+from django.db import close_old_connections
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import TacVuXuatFile
+
+# Loại xuất -> đường dẫn hàm dựng file (import khi chạy để tránh vòng import giữa các app)
+LOAI_XUAT = {
+    'bang_diem': 'grading.views.tao_file_bang_diem',
+    'bao_cao_mon_hoc': 'reporting.views.tao_file_bao_cao_mon_hoc',
+    'bao_cao_hoc_ky': 'reporting.views.tao_file_bao_cao_hoc_ky',
+    'danh_sach_lop': 'classes.views.tao_file_danh_sach_lop',
+    'danh_sach_nien_khoa': 'classes.views.tao_file_danh_sach_nien_khoa',
+}
+
+
+class XuatFileNenMixin:
+    """
+    Cho một API xuất file chạy nền khi có ?async=1. View khai báo `loai_xuat` và gọi
+
+        if self.xuat_nen(request):
+            return self.tao_tac_vu(request)
+
+    sau khi đã kiểm tra tham số.
+    """
+    loai_xuat = None
+
+    def xuat_nen(self, request):
+        return request.query_params.get('async') in ('1', 'true')
+
+    def tao_tac_vu(self, request):
+        params = {k: v for k, v in request.query_params.items() if k not in ('async', 'format')}
+        tac_vu = TacVuXuatFile.objects.create(
+            LoaiXuat=self.loai_xuat, ThamSoXuat=params,
+            NguoiTao=request.user if request.user.is_authenticated else None,
+        )
+        return Response({
+            "IDTacVu": tac_vu.pk,
+            "TrangThai": tac_vu.TrangThai,
+            "UrlTrangThai": reverse('tac-vu-xuat-chi-tiet', args=[tac_vu.pk]),
+            "UrlTaiVe": reverse('tac-vu-xuat-tai-ve', args=[tac_vu.pk]),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def nhan_tac_vu(so_luong):
+    """Nhận tối đa `so_luong` tác vụ đang chờ, trả về danh sách ID đã nhận được."""
+    da_nhan = []
+    ung_vien = TacVuXuatFile.objects.filter(
+        TrangThai=TacVuXuatFile.CHO_XU_LY,
+    ).order_by('ThoiGianTao').values_list('pk', flat=True)[:so_luong * 2]
+    for pk in ung_vien:
+        # Chỉ một worker cập nhật được dòng này khi nó còn ở trạng thái chờ
+        if TacVuXuatFile.objects.filter(pk=pk, TrangThai=TacVuXuatFile.CHO_XU_LY).update(
+            TrangThai=TacVuXuatFile.DANG_XU_LY, ThoiGianBatDau=timezone.now(), TienDo=5,
+        ):
+            da_nhan.append(pk)
+            if len(da_nhan) >= so_luong:
+                break
+    return da_nhan
+
+
+def _cap_nhat(pk, **fields):
+    TacVuXuatFile.objects.filter(pk=pk).update(**fields)
+
+
+def thuc_hien_tac_vu(pk):
+    """Dựng file cho một tác vụ đã nhận. Chạy trong tiến trình con của worker."""
+    close_old_connections()
+    tac_vu = TacVuXuatFile.objects.only('LoaiXuat', 'ThamSoXuat').get(pk=pk)
+    try:
+        tao_file = import_string(LOAI_XUAT[tac_vu.LoaiXuat])
+        _cap_nhat(pk, TienDo=10)
+        result = tao_file(tac_vu.ThamSoXuat)
+        if result is None:
+            _cap_nhat(pk, TrangThai=TacVuXuatFile.LOI, ThongBaoLoi="Không có dữ liệu", ThoiGianKetThuc=timezone.now())
+            return pk
+        export, filename = result
+        _cap_nhat(pk, TienDo=70)
+        content = export.to_bytes()
+        _cap_nhat(
+            pk, TrangThai=TacVuXuatFile.HOAN_THANH, TienDo=100, TenFile=filename,
+            NoiDung=content, ThoiGianKetThuc=timezone.now(),
+        )
+    except Exception as e:
+        # Ghi lỗi vào tác vụ để người dùng thấy, worker vẫn tiếp tục với tác vụ khác
+        _cap_nhat(pk, TrangThai=TacVuXuatFile.LOI, ThongBaoLoi=str(e) or e.__class__.__name__,
+                  ThoiGianKetThuc=timezone.now())
+    return pk
@@ -0,0 +1,151 @@
+# reporting/management/commands/benchmark_analytics.py
+import datetime
+import random
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from classes.models import Khoi, LopHoc, LopHoc_HocSinh
+from configurations.models import NienKhoa, ThamSo
+from grading.models import DiemSo, HocKy
+from students.models import HocSinh
+from subjects.models import MonHoc
+from reporting import analytics
+from reporting.snapshots import dong_hoc_ky, dong_mon_hoc
+
+
+class _HuyDuLieu(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "So sánh thời gian tính báo cáo môn học + học kỳ của cả một niên khóa giữa: vòng lặp Python "
+        "trên từng đối tượng DiemSo, GROUP BY trong SQL (reporting/queries) và NumPy (reporting/analytics). "
+        "Dữ liệu giả lập được tạo trong một transaction và bị hủy khi kết thúc."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hoc-sinh', type=int, default=5000)
+        parser.add_argument('--mon', type=int, default=9)
+        parser.add_argument('--si-so', type=int, default=40)
+        parser.add_argument('--lap', type=int, default=3, help="Số lần chạy mỗi cách, lấy thời gian nhỏ nhất")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                nien_khoa = self._tao_du_lieu(options)
+                self._do(nien_khoa.pk, options['lap'])
+                raise _HuyDuLieu
+        except _HuyDuLieu:
+            self.stdout.write("Đã hủy dữ liệu giả lập.")
+
+    def _tao_du_lieu(self, options):
+        rnd = random.Random(0)
+        nien_khoa = NienKhoa.objects.create(TenNienKhoa="0000-0001")
+        ThamSo.objects.create(
+            IDNienKhoa=nien_khoa, TuoiToiThieu=15, TuoiToiDa=20, SoMonHocToiDa=options['mon'],
+            SiSoToiDa=options['si_so'], DiemDatMon=5.0,
+        )
+        hoc_ky = list(HocKy.objects.order_by('id')[:2]) or [
+            HocKy.objects.create(TenHocKy="Học kỳ 1"), HocKy.objects.create(TenHocKy="Học kỳ 2"),
+        ]
+        khoi = Khoi.objects.order_by('id').first() or Khoi.objects.create(TenKhoi="Khối 10")
+        mon_list = MonHoc.objects.bulk_create(
+            [MonHoc(TenMonHoc=f"Môn {i}", IDNienKhoa=nien_khoa) for i in range(options['mon'])]
+        )
+        so_lop = -(-options['hoc_sinh'] // options['si_so'])
+        lop_list = LopHoc.objects.bulk_create([
+            LopHoc(TenLop=f"L{i}", IDKhoi=khoi, IDNienKhoa=nien_khoa, SiSo=options['si_so'])
+            for i in range(so_lop)
+        ])
+        hoc_sinh = HocSinh.objects.bulk_create([
+            HocSinh(
+                Ho="Nguyễn", Ten=f"HS{i}", GioiTinh="Nam", NgaySinh=datetime.date(2008, 1, 1),
+                DiaChi="-", IDNienKhoaTiepNhan=nien_khoa,
+            )
+            for i in range(options['hoc_sinh'])
+        ], batch_size=1000)
+
+        thanh_vien, diem = [], []
+        for i, hs in enumerate(hoc_sinh):
+            lop = lop_list[i // options['si_so']]
+            thanh_vien.append(LopHoc_HocSinh(IDLopHoc=lop, IDHocSinh=hs, IDNienKhoa=nien_khoa))
+            for mon in mon_list:
+                for hk in hoc_ky:
+                    d15 = rnd.choice([None] + [float(x) for x in range(11)] * 10)
+                    d1t = float(rnd.randint(0, 10))
+                    diem.append(DiemSo(
+                        IDHocSinh=hs, IDLopHoc=lop, IDMonHoc=mon, IDHocKy=hk,
+                        Diem15=d15, Diem1Tiet=d1t, DiemTB=DiemSo.tinh_diem_tb(d15, d1t),
+                    ))
+        LopHoc_HocSinh.objects.bulk_create(thanh_vien, batch_size=2000)
+        DiemSo.objects.bulk_create(diem, batch_size=2000)
+        self.stdout.write(f"Dữ liệu giả lập: {len(hoc_sinh)} học sinh, {len(lop_list)} lớp, {len(diem)} dòng điểm.")
+        return nien_khoa
+
+    def _do(self, nien_khoa_id, lap):
+        cach_tinh = {
+            "Vòng lặp Python trên đối tượng DiemSo": lambda: _vong_lap(nien_khoa_id),
+            "GROUP BY trong SQL": lambda: _sql(nien_khoa_id),
+            "NumPy": lambda: _numpy(nien_khoa_id),
+        }
+        ket_qua, thoi_gian = {}, {}
+        for ten, ham in cach_tinh.items():
+            tot_nhat = None
+            for _ in range(lap):
+                bat_dau = time.perf_counter()
+                ket_qua[ten] = ham()
+                da_chay = time.perf_counter() - bat_dau
+                tot_nhat = da_chay if tot_nhat is None else min(tot_nhat, da_chay)
+            thoi_gian[ten] = tot_nhat
+
+        moc = thoi_gian["Vòng lặp Python trên đối tượng DiemSo"]
+        chuan = next(iter(ket_qua.values()))
+        for ten, giay in thoi_gian.items():
+            khop = "khớp" if ket_qua[ten] == chuan else "KHÔNG KHỚP"
+            self.stdout.write(f"{ten:40s} {giay * 1000:9.1f} ms  x{moc / giay:6.1f}  ({khop})")
+
+
+# Mỗi cách trả về (tập dòng báo cáo môn học, tập dòng báo cáo học kỳ) đã chuẩn hóa để so sánh
+def _vong_lap(nien_khoa_id):
+    diem_dat_mon = ThamSo.objects.get(IDNienKhoa_id=nien_khoa_id).DiemDatMon
+    mon = defaultdict(lambda: [0, 0])
+    hoc_ky = defaultdict(list)
+    for d in DiemSo.objects.filter(IDLopHoc__IDNienKhoa_id=nien_khoa_id):
+        o = mon[(d.IDLopHoc_id, d.IDMonHoc_id, d.IDHocKy_id)]
+        o[0] += 1
+        if d.DiemTB is not None and d.DiemTB >= diem_dat_mon:
+            o[1] += 1
+        if d.DiemTB is not None:
+            hoc_ky[(d.IDLopHoc_id, d.IDHocKy_id, d.IDHocSinh_id)].append(d.DiemTB)
+        else:
+            hoc_ky.setdefault((d.IDLopHoc_id, d.IDHocKy_id, d.IDHocSinh_id), [])
+    lop_hk = defaultdict(lambda: [0, 0])
+    for (lop, hk, _), ds in hoc_ky.items():
+        o = lop_hk[(lop, hk)]
+        o[0] += 1
+        if ds and sum(ds) / len(ds) >= diem_dat_mon:
+            o[1] += 1
+    return (
+        {(k[0], k[1], k[2], v[0], v[1]) for k, v in mon.items()},
+        {(k[0], k[1], v[0], v[1]) for k, v in lop_hk.items()},
+    )
+
+
+def _sql(nien_khoa_id):
+    diem = DiemSo.objects.filter(IDLopHoc__IDNienKhoa_id=nien_khoa_id)
+    return (
+        {(r.IDLopHoc_id, r.IDMonHoc_id, r.IDHocKy_id, r.SiSo, r.SoLuongDat) for r in dong_mon_hoc(diem)},
+        {(r.IDLopHoc_id, r.IDHocKy_id, r.SiSo, r.SoLuongDat) for r in dong_hoc_ky(diem)},
+    )
+
+
+def _numpy(nien_khoa_id):
+    bang = analytics.BangDiem.tai(IDLopHoc__IDNienKhoa_id=nien_khoa_id)
+    return (
+        {r[1:] for r in analytics.tong_hop_mon_hoc(bang)},
+        {r[1:] for r in analytics.tong_hop_hoc_ky(bang)},
+    )
@@ -0,0 +1,81 @@
+# reporting/management/commands/export_worker.py
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+# Module này được import lại trong tiến trình con trước khi Django được nạp,
+# nên không import model ở mức module.
+
+
+def _khoi_tao_tien_trinh():
+    # Tiến trình con được tạo bằng 'spawn' nên phải tự nạp Django
+    django.setup()
+
+
+def _thuc_hien(pk):
+    from reporting.jobs import thuc_hien_tac_vu
+    return thuc_hien_tac_vu(pk)
+
+
+class Command(BaseCommand):
+    help = "Worker xuất file chạy nền: lấy tác vụ từ bảng TACVUXUATFILE và dựng file trong process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help="Số tiến trình dựng file song song")
+        parser.add_argument('--poll', type=float, default=1.0, help="Số giây chờ giữa hai lần kiểm tra hàng đợi")
+        parser.add_argument('--once', action='store_true', help="Xử lý hết các tác vụ đang chờ rồi thoát")
+        parser.add_argument(
+            '--stale-minutes', type=int, default=30,
+            help="Tác vụ ở trạng thái đang xử lý quá số phút này (worker cũ bị dừng) được đưa lại hàng đợi",
+        )
+
+    def handle(self, *args, **options):
+        from reporting.jobs import nhan_tac_vu
+
+        so_tien_trinh = max(1, options['processes'])
+        self._dua_lai_tac_vu_treo(options['stale_minutes'])
+
+        # Đóng kết nối của tiến trình cha trước khi tạo các tiến trình con
+        connections.close_all()
+        dang_chay = set()
+        with ProcessPoolExecutor(
+            max_workers=so_tien_trinh,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_khoi_tao_tien_trinh,
+        ) as pool:
+            while True:
+                con_trong = so_tien_trinh - len(dang_chay)
+                for pk in (nhan_tac_vu(con_trong) if con_trong > 0 else []):
+                    self.stdout.write(f"Nhận tác vụ {pk}")
+                    dang_chay.add(pool.submit(_thuc_hien, pk))
+
+                if not dang_chay:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                xong, dang_chay = wait(dang_chay, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                dang_chay = set(dang_chay)
+                for future in xong:
+                    try:
+                        self.stdout.write(f"Xong tác vụ {future.result()}")
+                    except Exception as e:
+                        # Tiến trình con chết giữa chừng; tác vụ sẽ được đưa lại hàng đợi khi quá hạn
+                        self.stderr.write(f"Lỗi tiến trình dựng file: {e}")
+
+    def _dua_lai_tac_vu_treo(self, phut):
+        from reporting.models import TacVuXuatFile
+
+        so_dong = TacVuXuatFile.objects.filter(
+            TrangThai=TacVuXuatFile.DANG_XU_LY,
+            ThoiGianBatDau__lt=timezone.now() - timedelta(minutes=phut),
+        ).update(TrangThai=TacVuXuatFile.CHO_XU_LY, TienDo=0, ThoiGianBatDau=None)
+        if so_dong:
+            self.stdout.write(f"Đưa lại hàng đợi {so_dong} tác vụ bị treo")
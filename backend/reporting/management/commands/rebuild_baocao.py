@@ -0,0 +1,34 @@
+# reporting/management/commands/rebuild_baocao.py
+from django.core.management.base import BaseCommand, CommandError
+
+from configurations.models import NienKhoa
+from reporting.models import BaoCaoHocKy, BaoCaoMonHoc
+from reporting.snapshots import tinh_lai_nien_khoa
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính lại toàn bộ bảng tổng hợp BAOCAOMONHOC và BAOCAOHOCKY của một niên khóa từ DIEMSO. "
+        "Báo cáo chỉ đọc từ bảng tổng hợp của niên khóa đã chạy lệnh này, trước đó tính trực tiếp."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nien-khoa', type=int, help="ID niên khóa cần tính lại")
+        parser.add_argument('--all', action='store_true', help="Tính lại cho mọi niên khóa")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            nien_khoa_ids = list(NienKhoa.objects.values_list('pk', flat=True))
+        elif options['nien_khoa']:
+            if not NienKhoa.objects.filter(pk=options['nien_khoa']).exists():
+                raise CommandError(f"Không tìm thấy niên khóa có ID {options['nien_khoa']}.")
+            nien_khoa_ids = [options['nien_khoa']]
+        else:
+            raise CommandError("Hãy truyền --nien-khoa <ID> hoặc --all.")
+
+        for nk in nien_khoa_ids:
+            tinh_lai_nien_khoa(nk)
+            self.stdout.write(
+                f"Niên khóa {nk}: {BaoCaoMonHoc.objects.filter(IDNienKhoa=nk).count()} dòng báo cáo môn học, "
+                f"{BaoCaoHocKy.objects.filter(IDNienKhoa=nk).count()} dòng báo cáo học kỳ."
+            )
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0001_initial'),
+        ('configurations', '0005_remove_thamso_chophepsuadiem_remove_thamso_ghichu_and_more'),
+        ('grading', '0003_diemso_unique_va_index'),
+        ('reporting', '0002_remove_baocaomonhoc_idhocky_and_more'),
+        ('subjects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BaoCaoMonHoc',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('SiSo', models.IntegerField()),
+                ('SoLuongDat', models.IntegerField()),
+                ('TiLe', models.FloatField()),
+                ('IDHocKy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='grading.hocky')),
+                ('IDLopHoc', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='classes.lophoc')),
+                ('IDMonHoc', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='subjects.monhoc')),
+                ('IDNienKhoa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.nienkhoa')),
+            ],
+            options={
+                'db_table': 'BAOCAOMONHOC',
+            },
+        ),
+        migrations.CreateModel(
+            name='BaoCaoHocKy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('SiSo', models.IntegerField()),
+                ('SoLuongDat', models.IntegerField()),
+                ('TiLe', models.FloatField()),
+                ('IDHocKy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='grading.hocky')),
+                ('IDLopHoc', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='classes.lophoc')),
+                ('IDNienKhoa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.nienkhoa')),
+            ],
+            options={
+                'db_table': 'BAOCAOHOCKY',
+                'indexes': [models.Index(fields=['IDNienKhoa', 'IDHocKy'], name='IX_BAOCAOHOCKY_NK_HK')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='baocaohocky',
+            constraint=models.UniqueConstraint(fields=('IDLopHoc', 'IDHocKy'), name='UQ_BAOCAOHOCKY_LOP_HK'),
+        ),
+        migrations.AddIndex(
+            model_name='baocaomonhoc',
+            index=models.Index(fields=['IDMonHoc', 'IDHocKy'], name='IX_BAOCAOMONHOC_MON_HK'),
+        ),
+        migrations.AddConstraint(
+            model_name='baocaomonhoc',
+            constraint=models.UniqueConstraint(fields=('IDLopHoc', 'IDMonHoc', 'IDHocKy'), name='UQ_BAOCAOMONHOC_LOP_MON_HK'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporting', '0003_bang_bao_cao_tong_hop'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacVuXuatFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('LoaiXuat', models.CharField(max_length=50)),
+                ('ThamSoXuat', models.JSONField(default=dict)),
+                ('TrangThai', models.CharField(choices=[('ChoXuLy', 'Chờ xử lý'), ('DangXuLy', 'Đang xử lý'), ('HoanThanh', 'Hoàn thành'), ('Loi', 'Lỗi')], default='ChoXuLy', max_length=20)),
+                ('TienDo', models.PositiveSmallIntegerField(default=0)),
+                ('TenFile', models.CharField(blank=True, max_length=255)),
+                ('NoiDung', models.BinaryField(blank=True, null=True)),
+                ('ThongBaoLoi', models.TextField(blank=True)),
+                ('ThoiGianTao', models.DateTimeField(auto_now_add=True)),
+                ('ThoiGianBatDau', models.DateTimeField(blank=True, null=True)),
+                ('ThoiGianKetThuc', models.DateTimeField(blank=True, null=True)),
+                ('NguoiTao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'TACVUXUATFILE',
+                'indexes': [models.Index(fields=['TrangThai', 'ThoiGianTao'], name='IX_TACVUXUAT_TRANGTHAI')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0005_remove_thamso_chophepsuadiem_remove_thamso_ghichu_and_more'),
+        ('reporting', '0004_tac_vu_xuat_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BaoCaoNienKhoa',
+            fields=[
+                ('IDNienKhoa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='configurations.nienkhoa')),
+                ('ThoiGianDung', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'BAOCAONIENKHOA',
+            },
+        ),
+    ]
@@ -1,3 +1,92 @@
 # reporting/models.py
 from django.db import models
 
+
+class BaoCaoMonHoc(models.Model):
+    """
+    Bảng tổng hợp tỉ lệ đạt theo (lớp, môn, học kỳ). Được cập nhật từng ô khi điểm,
+    danh sách lớp hoặc điểm đạt môn thay đổi (xem reporting/snapshots.py).
+    """
+    IDNienKhoa = models.ForeignKey('configurations.NienKhoa', on_delete=models.CASCADE)
+    IDLopHoc = models.ForeignKey('classes.LopHoc', on_delete=models.CASCADE)
+    IDMonHoc = models.ForeignKey('subjects.MonHoc', on_delete=models.CASCADE)
+    IDHocKy = models.ForeignKey('grading.HocKy', on_delete=models.CASCADE)
+    SiSo = models.IntegerField()
+    SoLuongDat = models.IntegerField()
+    TiLe = models.FloatField()
+
+    class Meta:
+        db_table = 'BAOCAOMONHOC'
+        constraints = [
+            models.UniqueConstraint(fields=['IDLopHoc', 'IDMonHoc', 'IDHocKy'], name='UQ_BAOCAOMONHOC_LOP_MON_HK'),
+        ]
+        indexes = [
+            models.Index(fields=['IDMonHoc', 'IDHocKy'], name='IX_BAOCAOMONHOC_MON_HK'),
+        ]
+
+
+class BaoCaoHocKy(models.Model):
+    """Bảng tổng hợp tỉ lệ học sinh đạt theo (lớp, học kỳ), dựa trên điểm TB học kỳ."""
+    IDNienKhoa = models.ForeignKey('configurations.NienKhoa', on_delete=models.CASCADE)
+    IDLopHoc = models.ForeignKey('classes.LopHoc', on_delete=models.CASCADE)
+    IDHocKy = models.ForeignKey('grading.HocKy', on_delete=models.CASCADE)
+    SiSo = models.IntegerField()
+    SoLuongDat = models.IntegerField()
+    TiLe = models.FloatField()
+
+    class Meta:
+        db_table = 'BAOCAOHOCKY'
+        constraints = [
+            models.UniqueConstraint(fields=['IDLopHoc', 'IDHocKy'], name='UQ_BAOCAOHOCKY_LOP_HK'),
+        ]
+        indexes = [
+            models.Index(fields=['IDNienKhoa', 'IDHocKy'], name='IX_BAOCAOHOCKY_NK_HK'),
+        ]
+
+
+class BaoCaoNienKhoa(models.Model):
+    """
+    Đánh dấu niên khóa đã được dựng đầy đủ hai bảng tổng hợp (snapshots.tinh_lai_nien_khoa).
+    Chỉ khi có dòng này các báo cáo mới đọc từ bảng tổng hợp; các lần cập nhật từng ô trước
+    đó chỉ làm bảng có một phần dữ liệu.
+    """
+    IDNienKhoa = models.OneToOneField('configurations.NienKhoa', on_delete=models.CASCADE, primary_key=True)
+    ThoiGianDung = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'BAOCAONIENKHOA'
+
+
+class TacVuXuatFile(models.Model):
+    """
+    Một yêu cầu xuất file chạy nền. Bảng này đồng thời là hàng đợi: worker
+    (manage.py export_worker) nhận các tác vụ CHO_XU_LY bằng một lệnh UPDATE có điều kiện.
+    """
+    CHO_XU_LY = 'ChoXuLy'
+    DANG_XU_LY = 'DangXuLy'
+    HOAN_THANH = 'HoanThanh'
+    LOI = 'Loi'
+    TRANG_THAI_CHOICES = [
+        (CHO_XU_LY, 'Chờ xử lý'),
+        (DANG_XU_LY, 'Đang xử lý'),
+        (HOAN_THANH, 'Hoàn thành'),
+        (LOI, 'Lỗi'),
+    ]
+
+    LoaiXuat = models.CharField(max_length=50)
+    ThamSoXuat = models.JSONField(default=dict)
+    NguoiTao = models.ForeignKey('auth.User', on_delete=models.CASCADE, null=True, blank=True)
+    TrangThai = models.CharField(max_length=20, choices=TRANG_THAI_CHOICES, default=CHO_XU_LY)
+    TienDo = models.PositiveSmallIntegerField(default=0)
+    TenFile = models.CharField(max_length=255, blank=True)
+    NoiDung = models.BinaryField(null=True, blank=True)
+    ThongBaoLoi = models.TextField(blank=True)
+    ThoiGianTao = models.DateTimeField(auto_now_add=True)
+    ThoiGianBatDau = models.DateTimeField(null=True, blank=True)
+    ThoiGianKetThuc = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'TACVUXUATFILE'
+        indexes = [
+            models.Index(fields=['TrangThai', 'ThoiGianTao'], name='IX_TACVUXUAT_TRANGTHAI'),
+        ]
@@ -0,0 +1,148 @@
+# reporting/queries.py
+"""
+Các truy vấn gom nhóm dùng chung cho báo cáo: tính trực tiếp từ DIEMSO bằng GROUP BY,
+không lặp theo từng lớp/học sinh.
+"""
+from django.db.models import Avg, Count, F, FilteredRelation, FloatField, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, PercentRank, Rank
+
+from grading.models import DiemSo
+from classes.models import LopHoc
+from configurations.models import ThamSo
+
+
+# Điểm đạt môn theo quy định (ThamSo) của niên khóa chứa lớp, mặc định 5.0
+DIEM_DAT_MON_MAC_DINH = 5.0
+DIEM_DAT_MON_CUA_LOP = Coalesce(
+    F('IDLopHoc__IDNienKhoa__thamso__DiemDatMon'), Value(DIEM_DAT_MON_MAC_DINH), output_field=FloatField()
+)
+# Như trên nhưng dùng trong truy vấn xuất phát từ LOPHOC
+DIEM_DAT_MON_CUA_LOP_HOC = Coalesce(
+    F('IDNienKhoa__thamso__DiemDatMon'), Value(DIEM_DAT_MON_MAC_DINH), output_field=FloatField()
+)
+
+
+def lop_hoc_cua_mon(IDMonHoc):
+    """Các lớp có học môn (LOPHOC_MONHOC): mỗi lớp một dòng trong báo cáo môn học."""
+    return LopHoc.objects.filter(lophoc_monhoc__IDMonHoc=IDMonHoc)
+
+
+def bao_cao_mon_hoc_queryset(IDMonHoc, IDHocKy):
+    """
+    Một truy vấn GROUP BY lớp, xuất phát từ các lớp có học môn và LEFT JOIN DIEMSO của môn,
+    học kỳ: sĩ số (số dòng điểm) và số dòng có DiemTB >= DiemDatMon của niên khóa chứa lớp.
+    Lớp chưa có điểm vẫn có dòng với sĩ số 0.
+    """
+    return lop_hoc_cua_mon(IDMonHoc).annotate(
+        diem=FilteredRelation('diemso', condition=Q(diemso__IDMonHoc=IDMonHoc, diemso__IDHocKy=IDHocKy)),
+    ).values('id', 'TenLop').annotate(
+        SoDiem=Count('diem'),
+        SoDiemDat=Count('diem', filter=Q(diem__DiemTB__gte=DIEM_DAT_MON_CUA_LOP_HOC)),
+    ).order_by('id')
+
+
+def tinh_bao_cao_mon_hoc_truc_tiep(IDMonHoc, IDHocKy):
+    """Tỉ lệ đạt của một môn học trong một học kỳ, theo từng lớp."""
+    data = []
+    for row in bao_cao_mon_hoc_queryset(IDMonHoc, IDHocKy):
+        si_so = row['SoDiem']
+        ti_le = (row['SoDiemDat'] / si_so) * 100 if si_so > 0 else 0
+        data.append({
+            "IDLopHoc": row['id'],
+            "TenLop": row['TenLop'],
+            "SiSo": si_so,
+            "SoLuongDat": row['SoDiemDat'],
+            "TiLe": round(ti_le, 2),
+        })
+    return data
+
+
+def diem_tb_hoc_ky_queryset(IDNienKhoa, IDHocKy, IDLopHoc=None, voi_ho_ten=False):
+    """
+    Mức 1 của báo cáo học kỳ: điểm TB học kỳ của từng học sinh trong từng lớp
+    (trung bình DiemTB các môn), gom nhóm ngay trong SQL.
+    """
+    qs = DiemSo.objects.filter(IDLopHoc__IDNienKhoa=IDNienKhoa, IDHocKy=IDHocKy)
+    if IDLopHoc:
+        qs = qs.filter(IDLopHoc=IDLopHoc)
+    fields = ['IDLopHoc_id', 'IDLopHoc__TenLop', 'IDHocSinh_id']
+    if voi_ho_ten:
+        fields += ['IDHocSinh__Ho', 'IDHocSinh__Ten']
+    return qs.values(*fields).annotate(
+        DiemTBHocKy=Avg('DiemTB'),
+    ).order_by('IDLopHoc_id', 'IDHocSinh_id')
+
+
+def lay_diem_dat_mon(IDNienKhoa):
+    diem_dat_mon = ThamSo.objects.filter(IDNienKhoa=IDNienKhoa).values_list('DiemDatMon', flat=True).first()
+    return DIEM_DAT_MON_MAC_DINH if diem_dat_mon is None else diem_dat_mon
+
+
+def tinh_bao_cao_hoc_ky_truc_tiep(IDNienKhoa, IDHocKy):
+    """Tỉ lệ học sinh đạt (điểm TB học kỳ >= điểm đạt môn) của từng lớp trong niên khóa."""
+    diem_dat_mon = lay_diem_dat_mon(IDNienKhoa)
+
+    # Mức 2: gộp điểm TB của từng học sinh thành sĩ số và số lượng đạt theo lớp
+    lop_map = {}
+    for row in diem_tb_hoc_ky_queryset(IDNienKhoa, IDHocKy):
+        lop = lop_map.setdefault(row['IDLopHoc_id'], {
+            "IDLopHoc": row['IDLopHoc_id'], "TenLop": row['IDLopHoc__TenLop'], "SiSo": 0, "SoLuongDat": 0,
+        })
+        lop["SiSo"] += 1
+        if row['DiemTBHocKy'] is not None and row['DiemTBHocKy'] >= diem_dat_mon:
+            lop["SoLuongDat"] += 1
+
+    data = []
+    for lop in lop_map.values():
+        lop["TiLe"] = round((lop["SoLuongDat"] / lop["SiSo"]) * 100, 2)
+        data.append(lop)
+    return data
+
+
+def xu_huong_mon_hoc_queryset(IDNienKhoa, IDHocKy=None):
+    """
+    Một truy vấn GROUP BY (tên môn, khối) trên DIEMSO JOIN MONHOC, LOPHOC của một niên khóa:
+    số dòng điểm, số dòng đạt, tổng và số DiemTB (để gộp trung bình có trọng số).
+    """
+    qs = DiemSo.objects.filter(IDLopHoc__IDNienKhoa=IDNienKhoa)
+    if IDHocKy:
+        qs = qs.filter(IDHocKy=IDHocKy)
+    return qs.values(
+        'IDMonHoc__TenMonHoc', 'IDLopHoc__IDKhoi_id', 'IDLopHoc__IDKhoi__TenKhoi',
+    ).annotate(
+        SoDiem=Count('id'),
+        SoLuongDat=Count('id', filter=Q(DiemTB__gte=DIEM_DAT_MON_CUA_LOP)),
+        SoDiemTB=Count('DiemTB'),
+        TongDiemTB=Sum('DiemTB'),
+    ).order_by('IDMonHoc__TenMonHoc', 'IDLopHoc__IDKhoi_id')
+
+
+def _xep_hang(partition_by, diem):
+    """RANK() và PERCENT_RANK() theo điểm giảm dần trong từng nhóm; học sinh chưa có điểm xếp cuối."""
+    thu_tu = diem.desc(nulls_last=True)
+    return {
+        "Hang": Window(Rank(), partition_by=partition_by, order_by=thu_tu),
+        "PhanTramHang": Window(PercentRank(), partition_by=partition_by, order_by=thu_tu),
+    }
+
+
+def xep_hang_lop_queryset(IDNienKhoa, IDHocKy):
+    """
+    Thứ hạng của học sinh trong lớp theo điểm TB học kỳ: window function chạy trên kết quả
+    GROUP BY của diem_tb_hoc_ky_queryset, cả niên khóa trong một truy vấn.
+    """
+    return diem_tb_hoc_ky_queryset(IDNienKhoa, IDHocKy, voi_ho_ten=True).annotate(
+        **_xep_hang([F('IDLopHoc_id')], F('DiemTBHocKy'))
+    ).order_by('IDLopHoc_id', 'Hang', 'IDHocSinh_id')
+
+
+def xep_hang_khoi_queryset(IDNienKhoa, IDHocKy, IDMonHoc):
+    """Thứ hạng của học sinh trong khối theo DiemTB của một môn học trong học kỳ."""
+    return DiemSo.objects.filter(
+        IDLopHoc__IDNienKhoa=IDNienKhoa, IDHocKy=IDHocKy, IDMonHoc=IDMonHoc,
+    ).values(
+        'IDLopHoc__IDKhoi_id', 'IDLopHoc__IDKhoi__TenKhoi', 'IDLopHoc_id', 'IDLopHoc__TenLop',
+        'IDHocSinh_id', 'IDHocSinh__Ho', 'IDHocSinh__Ten', 'DiemTB',
+    ).annotate(
+        **_xep_hang([F('IDLopHoc__IDKhoi_id')], F('DiemTB'))
+    ).order_by('IDLopHoc__IDKhoi_id', 'Hang', 'IDHocSinh_id')
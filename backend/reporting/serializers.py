@@ -0,0 +1,13 @@
+# reporting/serializers.py
+from rest_framework import serializers
+
+from .models import TacVuXuatFile
+
+
+class TacVuXuatFileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TacVuXuatFile
+        fields = [
+            'id', 'LoaiXuat', 'ThamSoXuat', 'TrangThai', 'TienDo', 'TenFile', 'ThongBaoLoi',
+            'ThoiGianTao', 'ThoiGianBatDau', 'ThoiGianKetThuc',
+        ]
@@ -0,0 +1,75 @@
+# reporting/signals.py
+"""
+Đánh dấu phạm vi cần tính lại của bảng tổng hợp báo cáo và làm cũ cache báo cáo
+khi dữ liệu nguồn thay đổi.
+"""
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+from grading.models import DiemSo
+from classes.models import LopHoc, LopHoc_HocSinh
+from configurations.models import ThamSo
+from subjects.models import MonHoc
+from . import snapshots
+from .cache import tang_phien_ban
+
+
+def _tang_phien_ban_sau_commit(nien_khoa_id):
+    # Đổi phiên bản sau commit để request đồng thời không cache lại dữ liệu chưa commit
+    transaction.on_commit(lambda: tang_phien_ban(nien_khoa_id))
+
+
+@receiver(post_save, sender=DiemSo)
+@receiver(post_delete, sender=DiemSo)
+def danh_dau_diem_so(sender, instance, **kwargs):
+    snapshots.danh_dau_o(instance.IDLopHoc_id, instance.IDMonHoc_id, instance.IDHocKy_id)
+
+
+@receiver(post_save, sender=LopHoc_HocSinh)
+@receiver(post_delete, sender=LopHoc_HocSinh)
+def danh_dau_thanh_vien_lop(sender, instance, **kwargs):
+    snapshots.danh_dau_lop(instance.IDLopHoc_id)
+
+
+@receiver(m2m_changed, sender=LopHoc.HocSinh.through)
+def danh_dau_thanh_vien_lop_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # 'instance' là LopHoc
+        if action in ("post_add", "post_remove", "post_clear"):
+            snapshots.danh_dau_lop(instance.pk)
+        return
+    # 'instance' là HocSinh, pk_set là ID các lớp (clear không có pk_set nên lấy trước khi xóa)
+    if action == "pre_clear":
+        instance._lop_truoc_khi_xoa = list(instance.lophoc_list.values_list('pk', flat=True))
+    elif action == "post_clear":
+        pk_set = getattr(instance, '_lop_truoc_khi_xoa', ())
+    if action in ("post_add", "post_remove", "post_clear"):
+        for lop_hoc_id in pk_set or ():
+            snapshots.danh_dau_lop(lop_hoc_id)
+
+
+@receiver(pre_save, sender=ThamSo)
+def ghi_nho_diem_dat_mon(sender, instance, **kwargs):
+    instance._diem_dat_mon_cu = (
+        ThamSo.objects.filter(pk=instance.pk).values_list('DiemDatMon', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=ThamSo)
+def danh_dau_diem_dat_mon(sender, instance, created, **kwargs):
+    # Chỉ điểm đạt môn ảnh hưởng đến bảng tổng hợp; bật/tắt khóa điểm thì không cần tính lại
+    if not created and instance._diem_dat_mon_cu != instance.DiemDatMon:
+        snapshots.danh_dau_nien_khoa(instance.pk)
+    else:
+        _tang_phien_ban_sau_commit(instance.pk)
+
+
+@receiver(post_save, sender=LopHoc)
+@receiver(post_delete, sender=LopHoc)
+@receiver(post_save, sender=MonHoc)
+@receiver(post_delete, sender=MonHoc)
+def danh_dau_ten_lop_mon(sender, instance, **kwargs):
+    # Tên lớp/môn xuất hiện trong báo cáo đã cache
+    _tang_phien_ban_sau_commit(instance.IDNienKhoa_id)
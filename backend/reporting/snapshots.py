@@ -0,0 +1,215 @@
+# reporting/snapshots.py
+"""
+Duy trì hai bảng tổng hợp BAOCAOMONHOC và BAOCAOHOCKY.
+
+Mỗi thay đổi (điểm, danh sách lớp, điểm đạt môn) chỉ đánh dấu phạm vi bị ảnh hưởng:
+    - một ô (lớp, môn, học kỳ)           -> danh_dau_o()
+    - toàn bộ một lớp                     -> danh_dau_lop()
+    - toàn bộ một niên khóa               -> danh_dau_nien_khoa()
+Các phạm vi được gom lại theo thread và tính lại một lần sau khi transaction commit,
+nên một lần lưu 40 dòng điểm của cùng một lớp chỉ làm mới một ô. Việc tính lại luôn
+đọc lại từ DIEMSO nên chạy thừa (ví dụ sau rollback) cũng không làm sai dữ liệu.
+
+Bảng của một niên khóa chỉ được coi là đầy đủ sau khi tinh_lai_nien_khoa() đã chạy cho
+niên khóa đó (lệnh rebuild_baocao, ghi dòng BaoCaoNienKhoa); da_dung() là phép kiểm tra
+dùng chung của các báo cáo, các API đọc không bao giờ tự dựng bảng.
+"""
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q
+
+from grading.models import DiemSo
+from classes.models import LopHoc
+from . import analytics
+from .cache import tang_phien_ban
+from .models import BaoCaoHocKy, BaoCaoMonHoc, BaoCaoNienKhoa
+from .queries import DIEM_DAT_MON_CUA_LOP
+
+logger = logging.getLogger(__name__)
+
+_hang_doi = threading.local()
+
+
+def _pending():
+    if not hasattr(_hang_doi, 'o'):
+        _hang_doi.o, _hang_doi.lop, _hang_doi.nien_khoa = set(), set(), set()
+    return _hang_doi
+
+
+def _danh_dau(ten, gia_tri):
+    getattr(_pending(), ten).add(gia_tri)
+    # Đăng ký mỗi lần đánh dấu: nếu transaction trước bị rollback thì callback của nó
+    # bị hủy, lần đánh dấu sau vẫn được xử lý. Callback thừa chỉ gặp hàng đợi rỗng.
+    transaction.on_commit(xu_ly_hang_doi)
+
+
+def danh_dau_o(lop_hoc_id, mon_hoc_id, hoc_ky_id):
+    _danh_dau('o', (int(lop_hoc_id), int(mon_hoc_id), int(hoc_ky_id)))
+
+
+def danh_dau_lop(lop_hoc_id):
+    _danh_dau('lop', int(lop_hoc_id))
+
+
+def danh_dau_nien_khoa(nien_khoa_id):
+    _danh_dau('nien_khoa', int(nien_khoa_id))
+
+
+def xu_ly_hang_doi():
+    """
+    Tính lại mọi phạm vi đang chờ rồi xóa hàng đợi. Chạy trong on_commit của request ghi điểm
+    nên không được ném lỗi: khi tính lại thất bại, bỏ dấu "đã dựng" của các niên khóa bị ảnh
+    hưởng để báo cáo tính trực tiếp cho đến khi chạy lại rebuild_baocao.
+    """
+    hang_doi = _pending()
+    o, lop, nien_khoa = hang_doi.o, hang_doi.lop, hang_doi.nien_khoa
+    if not (o or lop or nien_khoa):
+        return
+    hang_doi.o, hang_doi.lop, hang_doi.nien_khoa = set(), set(), set()
+
+    # Các ô thuộc lớp được tính lại toàn bộ thì bỏ qua
+    o = {cell for cell in o if cell[0] not in lop}
+    lop_ids = lop | {cell[0] for cell in o}
+    nien_khoa_anh_huong = set(nien_khoa)
+    try:
+        if lop_ids:
+            nien_khoa_anh_huong |= set(LopHoc.objects.filter(pk__in=lop_ids).values_list('IDNienKhoa_id', flat=True))
+        with transaction.atomic():
+            for nk in nien_khoa:
+                tinh_lai_nien_khoa(nk)
+            for lop_id in lop:
+                tinh_lai_lop(lop_id)
+            if o:
+                tinh_lai_o(o)
+    except Exception:
+        logger.exception("Không tính lại được bảng tổng hợp báo cáo của niên khóa %s", sorted(nien_khoa_anh_huong))
+        try:
+            BaoCaoNienKhoa.objects.filter(IDNienKhoa_id__in=nien_khoa_anh_huong).delete()
+        except Exception:
+            logger.exception("Không bỏ được dấu đã dựng của niên khóa %s", sorted(nien_khoa_anh_huong))
+
+    # Kết quả báo cáo đã cache của các niên khóa bị ảnh hưởng không còn đúng
+    for nk in nien_khoa_anh_huong:
+        tang_phien_ban(nk)
+
+
+# ====== Tính lại từ DIEMSO ======
+def dong_mon_hoc(diem_qs):
+    rows = diem_qs.values(
+        'IDLopHoc_id', 'IDLopHoc__IDNienKhoa_id', 'IDMonHoc_id', 'IDHocKy_id',
+    ).annotate(
+        SiSo=Count('id'),
+        SoLuongDat=Count('id', filter=Q(DiemTB__gte=DIEM_DAT_MON_CUA_LOP)),
+    ).order_by()
+    return [
+        BaoCaoMonHoc(
+            IDNienKhoa_id=row['IDLopHoc__IDNienKhoa_id'], IDLopHoc_id=row['IDLopHoc_id'],
+            IDMonHoc_id=row['IDMonHoc_id'], IDHocKy_id=row['IDHocKy_id'],
+            SiSo=row['SiSo'], SoLuongDat=row['SoLuongDat'],
+            TiLe=_ti_le(row['SoLuongDat'], row['SiSo']),
+        )
+        for row in rows
+    ]
+
+
+def dong_hoc_ky(diem_qs):
+    # Mức 1: điểm TB học kỳ của từng học sinh, kèm điểm đạt môn của niên khóa chứa lớp
+    rows = diem_qs.values(
+        'IDLopHoc_id', 'IDLopHoc__IDNienKhoa_id', 'IDHocKy_id', 'IDHocSinh_id',
+    ).annotate(
+        DiemTBHocKy=Avg('DiemTB'),
+        DiemDatMon=Max(DIEM_DAT_MON_CUA_LOP),
+    ).order_by()
+
+    # Mức 2: gộp theo (lớp, học kỳ)
+    tong_hop = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (row['IDLopHoc__IDNienKhoa_id'], row['IDLopHoc_id'], row['IDHocKy_id'])
+        dem = tong_hop[key]
+        dem[0] += 1
+        if row['DiemTBHocKy'] is not None and row['DiemTBHocKy'] >= row['DiemDatMon']:
+            dem[1] += 1
+    return [
+        BaoCaoHocKy(
+            IDNienKhoa_id=nk, IDLopHoc_id=lop_id, IDHocKy_id=hk_id,
+            SiSo=si_so, SoLuongDat=so_dat, TiLe=_ti_le(so_dat, si_so),
+        )
+        for (nk, lop_id, hk_id), (si_so, so_dat) in tong_hop.items()
+    ]
+
+
+def _ti_le(so_dat, si_so):
+    return round((so_dat / si_so) * 100, 2) if si_so > 0 else 0
+
+
+def _thay_the(model, dieu_kien, dong_moi):
+    model.objects.filter(dieu_kien).delete()
+    model.objects.bulk_create(dong_moi, batch_size=500)
+
+
+def _hop_dieu_kien(dieu_kien):
+    q = Q(pk__in=[])
+    for item in dieu_kien:
+        q |= item
+    return q
+
+
+def tinh_lai_o(cac_o):
+    """Tính lại các ô (lớp, môn, học kỳ) và dòng (lớp, học kỳ) chứa chúng."""
+    q_mon = _hop_dieu_kien(Q(IDLopHoc_id=lop, IDMonHoc_id=mon, IDHocKy_id=hk) for lop, mon, hk in cac_o)
+    q_hk = _hop_dieu_kien(Q(IDLopHoc_id=lop, IDHocKy_id=hk) for lop, hk in {(c[0], c[2]) for c in cac_o})
+    with transaction.atomic():
+        _thay_the(BaoCaoMonHoc, q_mon, dong_mon_hoc(DiemSo.objects.filter(q_mon)))
+        _thay_the(BaoCaoHocKy, q_hk, dong_hoc_ky(DiemSo.objects.filter(q_hk)))
+
+
+def tinh_lai_lop(lop_hoc_id):
+    q = Q(IDLopHoc_id=lop_hoc_id)
+    with transaction.atomic():
+        _thay_the(BaoCaoMonHoc, q, dong_mon_hoc(DiemSo.objects.filter(q)))
+        _thay_the(BaoCaoHocKy, q, dong_hoc_ky(DiemSo.objects.filter(q)))
+
+
+def _dong_nien_khoa_numpy(nien_khoa_id):
+    bang = analytics.BangDiem.tai(IDLopHoc__IDNienKhoa_id=nien_khoa_id)
+    dong_mon = [
+        BaoCaoMonHoc(
+            IDNienKhoa_id=nk, IDLopHoc_id=lop, IDMonHoc_id=mon, IDHocKy_id=hk,
+            SiSo=si_so, SoLuongDat=so_dat, TiLe=_ti_le(so_dat, si_so),
+        )
+        for nk, lop, mon, hk, si_so, so_dat in analytics.tong_hop_mon_hoc(bang)
+    ]
+    dong_hk = [
+        BaoCaoHocKy(
+            IDNienKhoa_id=nk, IDLopHoc_id=lop, IDHocKy_id=hk,
+            SiSo=si_so, SoLuongDat=so_dat, TiLe=_ti_le(so_dat, si_so),
+        )
+        for nk, lop, hk, si_so, so_dat in analytics.tong_hop_hoc_ky(bang)
+    ]
+    return dong_mon, dong_hk
+
+
+def tinh_lai_nien_khoa(nien_khoa_id):
+    """Tính lại toàn bộ bảng tổng hợp của một niên khóa (dùng cho lệnh rebuild_baocao)."""
+    if settings.REPORT_ANALYTICS_BACKEND == 'numpy':
+        dong_mon, dong_hk = _dong_nien_khoa_numpy(nien_khoa_id)
+    else:
+        diem = DiemSo.objects.filter(IDLopHoc__IDNienKhoa_id=nien_khoa_id)
+        dong_mon, dong_hk = dong_mon_hoc(diem), dong_hoc_ky(diem)
+    q = Q(IDNienKhoa_id=nien_khoa_id)
+    with transaction.atomic():
+        _thay_the(BaoCaoMonHoc, q, dong_mon)
+        _thay_the(BaoCaoHocKy, q, dong_hk)
+        BaoCaoNienKhoa.objects.update_or_create(IDNienKhoa_id=nien_khoa_id)
+
+
+def da_dung(nien_khoa_id):
+    """
+    True nếu bảng tổng hợp của niên khóa đầy đủ (đã có dòng BaoCaoNienKhoa). Chỉ đọc: khi chưa
+    có, người gọi tự tính trực tiếp từ DIEMSO; bảng được dựng bằng lệnh rebuild_baocao.
+    """
+    return BaoCaoNienKhoa.objects.filter(IDNienKhoa_id=nien_khoa_id).exists()
@@ -0,0 +1,149 @@
+# reporting/streaming.py
+"""
+Xuất dữ liệu dạng máy đọc được (?format=csv hoặc ?format=ndjson) cho các API danh sách
+và báo cáo.
+
+Các dòng được lấy từ QuerySet.iterator(chunk_size=...) (con trỏ phía server) và ghi thẳng
+ra StreamingHttpResponse theo từng khối, nên bộ nhớ không tăng theo số dòng.
+
+stream_zip() gửi một file ZIP theo từng file thành phần, dùng cho các API tải nhiều file.
+"""
+import csv
+import io
+import json
+import zipfile
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from django.http import StreamingHttpResponse
+
+CHUNK_SIZE = 2000
+
+# Số dòng gộp vào một lần gửi của StreamingHttpResponse
+DONG_MOI_KHOI = 500
+
+
+def _json(value):
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Đăng ký format 'csv' với DRF để ?format=csv không bị từ chối khi thương lượng nội dung.
+    Dữ liệu chính được stream trực tiếp; renderer này chỉ dùng cho các Response thông thường
+    (ví dụ thông báo lỗi 400).
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        output = io.StringIO()
+        if rows and isinstance(rows[0], dict):
+            writer = csv.DictWriter(output, fieldnames=list(rows[0].keys()), extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        return output.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Mỗi dòng một đối tượng JSON (xem CSVRenderer)."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        return "".join(_json(row) + "\n" for row in rows).encode(self.charset)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _dong_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _dong_ndjson(columns, rows):
+    for row in rows:
+        yield _json(dict(zip(columns, row))) + "\n"
+
+
+def _gom_khoi(lines):
+    khoi = []
+    for line in lines:
+        khoi.append(line)
+        if len(khoi) >= DONG_MOI_KHOI:
+            yield "".join(khoi)
+            khoi = []
+    if khoi:
+        yield "".join(khoi)
+
+
+def stream_response(dinh_dang, columns, rows, filename):
+    """
+    StreamingHttpResponse cho các dòng `rows` (iterable các tuple theo thứ tự `columns`).
+    `filename` không kèm phần mở rộng.
+    """
+    if dinh_dang == 'csv':
+        lines, content_type = _dong_csv(columns, rows), 'text/csv; charset=utf-8'
+    else:
+        lines, content_type = _dong_ndjson(columns, rows), 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(_gom_khoi(lines), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{dinh_dang}"'
+    return response
+
+
+def dict_rows(columns, data):
+    """Chuyển danh sách dict (ví dụ kết quả báo cáo) thành các tuple theo `columns`."""
+    return ([row.get(col) for col in columns] for row in data)
+
+
+class StreamExportMixin:
+    """
+    Thêm ?format=csv|ndjson cho một API. View gọi
+
+        dinh_dang = self.dinh_dang_stream(request)
+        if dinh_dang:
+            return stream_response(dinh_dang, columns, rows, filename)
+    """
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [CSVRenderer, NDJSONRenderer]
+
+    def dinh_dang_stream(self, request):
+        dinh_dang = request.query_params.get('format')
+        return dinh_dang if dinh_dang in (CSVRenderer.format, NDJSONRenderer.format) else None
+
+
+class _LuongZip:
+    """Luồng chỉ ghi, không seek: zipfile ghi vào đây, các byte được lấy ra ngay để gửi đi."""
+
+    def __init__(self):
+        self._phan = []
+
+    def write(self, data):
+        self._phan.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def lay(self):
+        data = b"".join(self._phan)
+        self._phan = []
+        return data
+
+
+def stream_zip(files, compression=zipfile.ZIP_DEFLATED):
+    """Generator các khối byte của file ZIP; `files` là iterable (tên file, nội dung bytes)."""
+    luong = _LuongZip()
+    with zipfile.ZipFile(luong, 'w', compression=compression) as zf:
+        for ten, noi_dung in files:
+            zf.writestr(ten, noi_dung)
+            yield luong.lay()
+    yield luong.lay()
@@ -1,3 +1,72 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from classes.membership import cap_nhat_danh_sach_lop
+from classes.models import Khoi, LopHoc, LopHoc_MonHoc
+from classes.tests import tao_hoc_sinh, tao_nien_khoa
+from grading.models import DiemSo, HocKy
+from subjects.models import MonHoc
+from . import queries, snapshots
+from .models import BaoCaoHocKy, BaoCaoMonHoc, BaoCaoNienKhoa
+from .views import tinh_bao_cao_hoc_ky, tinh_bao_cao_mon_hoc
+
+
+class BangTongHopTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nien_khoa = tao_nien_khoa("2024-2025")
+        cls.hoc_ky = HocKy.objects.create(id=1, TenHocKy="Học kỳ 1")
+        khoi = Khoi.objects.create(TenKhoi="Khối 10")
+        cls.lop = LopHoc.objects.create(TenLop="10A1", IDKhoi=khoi, IDNienKhoa=cls.nien_khoa)
+        cls.mon = MonHoc.objects.create(TenMonHoc="Toán", IDNienKhoa=cls.nien_khoa)
+        LopHoc_MonHoc.objects.create(IDLopHoc=cls.lop, IDMonHoc=cls.mon)
+        hs1, hs2 = tao_hoc_sinh(cls.nien_khoa, 2)
+        cap_nhat_danh_sach_lop(cls.lop, [hs1.pk, hs2.pk])
+        cls.diem_dat = DiemSo.objects.create(
+            IDHocSinh=hs1, IDLopHoc=cls.lop, IDMonHoc=cls.mon, IDHocKy=cls.hoc_ky, Diem15=8, Diem1Tiet=8,
+        )
+        cls.diem_truot = DiemSo.objects.create(
+            IDHocSinh=hs2, IDLopHoc=cls.lop, IDMonHoc=cls.mon, IDHocKy=cls.hoc_ky, Diem15=2, Diem1Tiet=2,
+        )
+
+    def so_luong_dat(self, model):
+        return model.objects.filter(IDLopHoc=self.lop, IDHocKy=self.hoc_ky).values_list('SoLuongDat', flat=True).get()
+
+    def test_chua_dung_thi_tinh_truc_tiep(self):
+        data = tinh_bao_cao_mon_hoc(self.mon.pk, self.hoc_ky.pk)
+        self.assertEqual([(r["SiSo"], r["SoLuongDat"]) for r in data], [(2, 1)])
+        self.assertFalse(snapshots.da_dung(self.nien_khoa.pk))
+        self.assertFalse(BaoCaoNienKhoa.objects.exists())
+
+    def test_bang_tong_hop_theo_kip_khi_sua_diem(self):
+        snapshots.tinh_lai_nien_khoa(self.nien_khoa.pk)
+        self.assertTrue(snapshots.da_dung(self.nien_khoa.pk))
+        self.assertEqual(self.so_luong_dat(BaoCaoMonHoc), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.diem_truot.Diem15 = self.diem_truot.Diem1Tiet = 9
+            self.diem_truot.save()
+
+        self.assertEqual(self.so_luong_dat(BaoCaoMonHoc), 2)
+        self.assertEqual(self.so_luong_dat(BaoCaoHocKy), 2)
+        truc_tiep = queries.tinh_bao_cao_mon_hoc_truc_tiep(self.mon.pk, self.hoc_ky.pk)
+        for row in truc_tiep:
+            row.pop("IDLopHoc")
+        self.assertEqual(tinh_bao_cao_mon_hoc(self.mon.pk, self.hoc_ky.pk), truc_tiep)
+        self.assertEqual(
+            [r["SoLuongDat"] for r in tinh_bao_cao_hoc_ky(self.nien_khoa.pk, self.hoc_ky.pk)], [2],
+        )
+
+    def test_tinh_lai_loi_thi_bo_dau_da_dung(self):
+        snapshots.tinh_lai_nien_khoa(self.nien_khoa.pk)
+        with mock.patch.object(snapshots, "tinh_lai_o", side_effect=RuntimeError), \
+                self.assertLogs("reporting.snapshots", level="ERROR"), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.diem_truot.Diem15 = self.diem_truot.Diem1Tiet = 9
+            self.diem_truot.save()
+
+        self.diem_truot.refresh_from_db()
+        self.assertEqual(self.diem_truot.Diem15, 9)
+        self.assertFalse(snapshots.da_dung(self.nien_khoa.pk))
+        self.assertEqual([r["SoLuongDat"] for r in tinh_bao_cao_mon_hoc(self.mon.pk, self.hoc_ky.pk)], [2])
@@ -1,7 +1,9 @@
 from django.urls import path
 from .views import (
     BaoCaoMonHocView, ExportBaoCaoMonHocExcel,
-    BaoCaoHocKyView, ExportBaoCaoHocKyExcel,
+    BaoCaoHocKyView, ExportBaoCaoHocKyExcel, DiemTBHocKyView,
+    TacVuXuatFileDetailView, TaiFileTacVuXuatView, DashboardView,
+    XuHuongMonHocView, PhanBoDiemView, XepHangLopView, XepHangKhoiView, HocBaView,
 )
 
 urlpatterns = [
@@ -12,4 +14,23 @@ urlpatterns = [
     # Báo cáo theo học kỳ
     path('baocao/hocky/', BaoCaoHocKyView.as_view(), name='baocao-hocky'),
     path('baocao/hocky/xuat-excel/', ExportBaoCaoHocKyExcel.as_view(), name='baocao-hocky-excel'),
+    path('baocao/hocky/diem-trung-binh/', DiemTBHocKyView.as_view(), name='baocao-hocky-diem-trung-binh'),
+    path('baocao/phan-bo-diem/', PhanBoDiemView.as_view(), name='baocao-phan-bo-diem'),
+
+    # Xếp hạng trong lớp (điểm TB học kỳ) và trong khối (theo môn học)
+    path('xep-hang/lop/', XepHangLopView.as_view(), name='xep-hang-lop'),
+    path('xep-hang/khoi/', XepHangKhoiView.as_view(), name='xep-hang-khoi'),
+
+    # In học bạ hàng loạt (ZIP)
+    path('hocba/', HocBaView.as_view(), name='hoc-ba'),
+
+    # Xu hướng tỉ lệ đạt theo môn học qua các niên khóa
+    path('xu-huong/monhoc/', XuHuongMonHocView.as_view(), name='xu-huong-monhoc'),
+
+    # Số liệu trang chủ BGH cho niên khóa hiện tại
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+
+    # Tác vụ xuất file chạy nền (?async=1 trên các API xuất Excel)
+    path('tac-vu-xuat/<int:pk>/', TacVuXuatFileDetailView.as_view(), name='tac-vu-xuat-chi-tiet'),
+    path('tac-vu-xuat/<int:pk>/tai-ve/', TaiFileTacVuXuatView.as_view(), name='tac-vu-xuat-tai-ve'),
 ]
@@ -1,58 +1,89 @@
+from bisect import bisect_right
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
-import io
-import openpyxl
-from openpyxl.styles import Border, Side, Alignment, Font
-from openpyxl.cell.cell import Cell
+from rest_framework import generics
+from django.http import StreamingHttpResponse
+from rest_framework.utils.urls import replace_query_param
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import FilteredRelation, Q
+from django.db.models.functions import Coalesce
 
-from grading.models import DiemSo, HocKy
-from classes.models import LopHoc, LopHoc_MonHoc
-from configurations.models import ThamSo
+from accounts.permissions import IsBGH, IsGiaoVu
+from grading.models import HocKy
+from configurations.models import NienKhoa, ThamSo
 from subjects.models import MonHoc
-
-
-# ======= STYLE CHUNG =========
-def style_excel_header(ws, headers):
-    border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                    top=Side(style='thin'), bottom=Side(style='thin'))
-    font = Font(bold=True)
-    align = Alignment(horizontal='center', vertical='center')
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=5, column=col_num, value=header)
-        cell.font = font
-        cell.border = border
-        cell.alignment = align
-
-
-def style_excel_rows(ws, data_start_row=6):
-    border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                    top=Side(style='thin'), bottom=Side(style='thin'))
-    align = Alignment(horizontal='center', vertical='center')
-    for row in ws.iter_rows(min_row=data_start_row):
-        for cell in row:
-            cell.border = border
-            cell.alignment = align
-
-
-def auto_adjust_column_width(ws):
-    for col in ws.columns:
-        max_length = 0
-        column_letter = None
-        for cell in col:
-            if isinstance(cell, Cell):
-                if column_letter is None:
-                    column_letter = cell.column_letter
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-        if column_letter:
-            ws.column_dimensions[column_letter].width = max_length + 2
+from .excel import ExcelExport, bytes_response
+from .hoc_ba import DINH_DANG as DINH_DANG_HOC_BA, stream_zip_hoc_ba, tai_hoc_ba
+from .jobs import XuatFileNenMixin
+from .models import BaoCaoHocKy, TacVuXuatFile
+from .queries import (
+    diem_tb_hoc_ky_queryset, lay_diem_dat_mon, xu_huong_mon_hoc_queryset,
+    xep_hang_khoi_queryset, xep_hang_lop_queryset,
+)
+from . import analytics, queries, snapshots
+from .cache import dung_chung, lay_hoac_tinh
+from .dashboard import DASHBOARD_CACHE_TIMEOUT, nien_khoa_hien_tai, tinh_dashboard
+from .serializers import TacVuXuatFileSerializer
+from .streaming import CHUNK_SIZE, StreamExportMixin, dict_rows, stream_response
+
+# Cột của các báo cáo tỉ lệ đạt theo lớp
+COT_BAO_CAO = ["TenLop", "SiSo", "SoLuongDat", "TiLe"]
+
+
+def _bo_tinh():
+    # Tính trực tiếp từ DIEMSO bằng GROUP BY (queries) hoặc trên mảng NumPy (analytics)
+    return analytics if settings.REPORT_ANALYTICS_BACKEND == 'numpy' else queries
+
+
+def _doc_bang_tong_hop(qs):
+    return [
+        {"TenLop": row['IDLopHoc__TenLop'], "SiSo": row['SiSo'], "SoLuongDat": row['SoLuongDat'], "TiLe": row['TiLe']}
+        for row in qs.order_by('IDLopHoc_id').values('IDLopHoc__TenLop', 'SiSo', 'SoLuongDat', 'TiLe')
+    ]
+
+
+def _doc_bao_cao_mon_hoc(IDMonHoc, IDHocKy):
+    """Các lớp có học môn LEFT JOIN BAOCAOMONHOC: lớp chưa có điểm có dòng sĩ số 0."""
+    qs = queries.lop_hoc_cua_mon(IDMonHoc).annotate(
+        bc=FilteredRelation('baocaomonhoc', condition=Q(baocaomonhoc__IDMonHoc=IDMonHoc, baocaomonhoc__IDHocKy=IDHocKy)),
+    ).order_by('id').values_list(
+        'TenLop', Coalesce('bc__SiSo', 0), Coalesce('bc__SoLuongDat', 0), Coalesce('bc__TiLe', 0.0),
+    )
+    return [
+        {"TenLop": ten_lop, "SiSo": si_so, "SoLuongDat": so_dat, "TiLe": ti_le}
+        for ten_lop, si_so, so_dat, ti_le in qs
+    ]
+
+
+def tinh_bao_cao_mon_hoc(IDMonHoc, IDHocKy, IDNienKhoa=None):
+    """
+    Đọc từ bảng tổng hợp BAOCAOMONHOC khi bảng của niên khóa đã đầy đủ (snapshots.da_dung),
+    ngược lại tính trực tiếp từ DIEMSO. Không đánh dấu ô nào từ đường đọc.
+    """
+    IDNienKhoa = IDNienKhoa or _nien_khoa_cua_mon(IDMonHoc)
+    if IDNienKhoa is not None and snapshots.da_dung(IDNienKhoa):
+        return _doc_bao_cao_mon_hoc(IDMonHoc, IDHocKy)
+    data = _bo_tinh().tinh_bao_cao_mon_hoc_truc_tiep(IDMonHoc, IDHocKy)
+    for row in data:
+        row.pop("IDLopHoc")
+    return data
+
+
+def tinh_bao_cao_hoc_ky(IDNienKhoa, IDHocKy):
+    """Đọc từ bảng tổng hợp BAOCAOHOCKY khi đã đầy đủ, ngược lại tính trực tiếp."""
+    if snapshots.da_dung(IDNienKhoa):
+        return _doc_bang_tong_hop(BaoCaoHocKy.objects.filter(IDNienKhoa=IDNienKhoa, IDHocKy=IDHocKy))
+    data = _bo_tinh().tinh_bao_cao_hoc_ky_truc_tiep(IDNienKhoa, IDHocKy)
+    for row in data:
+        row.pop("IDLopHoc")
+    return data
 
 
 # ======== API BÁO CÁO MÔN HỌC =========
-class BaoCaoMonHocView(APIView):
+class BaoCaoMonHocView(StreamExportMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -62,199 +93,474 @@ class BaoCaoMonHocView(APIView):
         if not IDMonHoc or not IDHocKy:
             return Response({"detail": "Thiếu IDMonHoc hoặc IDHocKy"}, status=400)
 
-        lop_ids = LopHoc_MonHoc.objects.filter(IDMonHoc=IDMonHoc).values_list("IDLopHoc", flat=True).distinct()
-        lop_list = LopHoc.objects.filter(id__in=lop_ids)
+        data = lay_bao_cao_mon_hoc(IDMonHoc, IDHocKy)
+        dinh_dang = self.dinh_dang_stream(request)
+        if dinh_dang:
+            return stream_response(dinh_dang, COT_BAO_CAO, dict_rows(COT_BAO_CAO, data), "bao_cao_mon_hoc")
+        return Response(data)
 
-        data = []
-        for lop in lop_list:
-            diem_list = DiemSo.objects.filter(IDLopHoc=lop.id, IDMonHoc=IDMonHoc, IDHocKy=IDHocKy)
-            si_so = diem_list.count()
-            so_luong_dat = 0
-
-            for diem in diem_list:
-                dtb = (diem.Diem15 + 2 * diem.Diem1Tiet) / 3 if diem.Diem15 is not None and diem.Diem1Tiet is not None else None
-                try:
-                    diem_dat_mon = ThamSo.objects.get(IDNienKhoa=diem.IDHocSinh.IDNienKhoaTiepNhan).DiemDatMon
-                except ThamSo.DoesNotExist:
-                    diem_dat_mon = 5.0
-                if dtb is not None and dtb >= diem_dat_mon:
-                    so_luong_dat += 1
-
-            ti_le = (so_luong_dat / si_so) * 100 if si_so > 0 else 0
-            if si_so > 0:
-                data.append({
-                    "TenLop": lop.TenLop,
-                    "SiSo": si_so,
-                    "SoLuongDat": so_luong_dat,
-                    "TiLe": round(ti_le, 2),
-                })
 
-        return Response(data)
+def _nien_khoa_cua_mon(IDMonHoc):
+    return MonHoc.objects.filter(pk=IDMonHoc).values_list('IDNienKhoa_id', flat=True).first()
+
+
+def lay_bao_cao_mon_hoc(IDMonHoc, IDHocKy):
+    """tinh_bao_cao_mon_hoc qua cache, theo phiên bản dữ liệu của niên khóa chứa môn học."""
+    nien_khoa = _nien_khoa_cua_mon(IDMonHoc)
+    if nien_khoa is None:
+        return tinh_bao_cao_mon_hoc(IDMonHoc, IDHocKy)
+    return lay_hoac_tinh(
+        nien_khoa, ("monhoc", IDHocKy, IDMonHoc), lambda: tinh_bao_cao_mon_hoc(IDMonHoc, IDHocKy, nien_khoa)
+    )
+
+
+def _ten_hoc_ky(IDHocKy):
+    try:
+        return HocKy.objects.get(id=int(IDHocKy)).TenHocKy
+    except (TypeError, ValueError, ObjectDoesNotExist):
+        return f"Học kỳ {IDHocKy}"
+
+
+def _ten_nien_khoa(IDNienKhoa):
+    try:
+        return ThamSo.objects.select_related('IDNienKhoa').get(IDNienKhoa=int(IDNienKhoa)).IDNienKhoa.TenNienKhoa
+    except (TypeError, ValueError, ObjectDoesNotExist):
+        return "Không rõ"
 
 
-class ExportBaoCaoMonHocExcel(APIView):
+def _tao_file_bao_cao(sheet_title, title, thong_tin, data):
+    """Bố cục chung của các file báo cáo: tiêu đề, dòng thông tin, bảng tỉ lệ đạt theo lớp."""
+    export = ExcelExport()
+    ws = export.add_sheet(sheet_title)
+
+    ws.append([title], style='tieu_de', track_width=False)
+    ws.merge("A1:D1")
+    ws.append(thong_tin, style='ghi_chu')
+    ws.append([])
+    ws.append([])
+
+    ws.append(["Lớp", "Sĩ số", "Số lượng đạt", "Tỉ lệ (%)"], style='tieu_de_cot')
+    for row in data:
+        ws.append([row["TenLop"], row["SiSo"], row["SoLuongDat"], row["TiLe"]], style='o')
+    return export
+
+
+def tao_file_bao_cao_mon_hoc(params):
+    IDMonHoc = params.get("IDMonHoc")
+    IDHocKy = params.get("IDHocKy")
+    IDNienKhoa = params.get("IDNienKhoa")
+
+    data = tinh_bao_cao_mon_hoc(IDMonHoc, IDHocKy)
+
+    # === Đảm bảo lấy đúng tên môn học ===
+    try:
+        ten_mon = MonHoc.objects.get(id=int(IDMonHoc)).TenMonHoc
+    except (TypeError, ValueError, ObjectDoesNotExist):
+        ten_mon = "Không rõ"
+
+    export = _tao_file_bao_cao(
+        "Báo cáo môn học", "BÁO CÁO TỔNG KẾT MÔN HỌC",
+        [f"Niên khóa: {_ten_nien_khoa(IDNienKhoa)}", f"Môn học: {ten_mon}", f"Học kỳ: {_ten_hoc_ky(IDHocKy)}"],
+        data,
+    )
+    return export, "bao_cao_mon_hoc.xlsx"
+
+
+class ExportBaoCaoMonHocExcel(XuatFileNenMixin, APIView):
     permission_classes = [IsAuthenticated]
+    loai_xuat = 'bao_cao_mon_hoc'
 
     def get(self, request):
-        IDMonHoc = request.query_params.get("IDMonHoc")
+        if not request.query_params.get("IDMonHoc") or not request.query_params.get("IDHocKy"):
+            return Response({"detail": "Thiếu IDMonHoc hoặc IDHocKy"}, status=400)
+        if self.xuat_nen(request):
+            return self.tao_tac_vu(request)
+        params = request.query_params
+        nien_khoa = _nien_khoa_cua_mon(params.get("IDMonHoc"))
+        if nien_khoa is None:
+            export, filename = tao_file_bao_cao_mon_hoc(params)
+            return export.as_response(filename)
+
+        content = lay_hoac_tinh(
+            nien_khoa, ("monhoc-excel", params.get("IDHocKy"), params.get("IDMonHoc"), params.get("IDNienKhoa")),
+            lambda: tao_file_bao_cao_mon_hoc(params)[0].to_bytes(),
+        )
+        return bytes_response(content, "bao_cao_mon_hoc.xlsx")
+
+
+# ========= API BÁO CÁO HỌC KỲ ==========
+def dong_diem_tb_hoc_ky(IDNienKhoa, IDHocKy, IDLopHoc=None):
+    """Điểm TB học kỳ của từng học sinh, là dữ liệu nền của báo cáo học kỳ (đọc bằng con trỏ)."""
+    diem_dat_mon = lay_diem_dat_mon(IDNienKhoa)
+    rows = diem_tb_hoc_ky_queryset(IDNienKhoa, IDHocKy, IDLopHoc, voi_ho_ten=True)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        dtb = row['DiemTBHocKy']
+        yield {
+            "IDHocSinh": row['IDHocSinh_id'],
+            "HoTen": f"{row['IDHocSinh__Ho']} {row['IDHocSinh__Ten']}",
+            "IDLopHoc": row['IDLopHoc_id'],
+            "TenLop": row['IDLopHoc__TenLop'],
+            "DiemTBHocKy": round(dtb, 2) if dtb is not None else None,
+            "KetQua": None if dtb is None else ("Đạt" if dtb >= diem_dat_mon else "Không đạt"),
+        }
+
+
+def tinh_diem_tb_hoc_ky(IDNienKhoa, IDHocKy, IDLopHoc=None):
+    return list(dong_diem_tb_hoc_ky(IDNienKhoa, IDHocKy, IDLopHoc))
+
+
+class BaoCaoHocKyView(StreamExportMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        IDNienKhoa = request.query_params.get("IDNienKhoa")
         IDHocKy = request.query_params.get("IDHocKy")
+
+        if not IDNienKhoa or not IDHocKy:
+            return Response({"detail": "Thiếu IDNienKhoa hoặc IDHocKy"}, status=400)
+
+        data = lay_hoac_tinh(IDNienKhoa, ("hocky", IDHocKy), lambda: tinh_bao_cao_hoc_ky(IDNienKhoa, IDHocKy))
+        dinh_dang = self.dinh_dang_stream(request)
+        if dinh_dang:
+            return stream_response(dinh_dang, COT_BAO_CAO, dict_rows(COT_BAO_CAO, data), "bao_cao_hoc_ky")
+        return Response(data)
+
+
+class DiemTBHocKyView(StreamExportMixin, APIView):
+    """
+    Điểm TB học kỳ của từng học sinh (dữ liệu nền của báo cáo học kỳ).
+    Tham số: IDNienKhoa, IDHocKy, tùy chọn IDLopHoc.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
         IDNienKhoa = request.query_params.get("IDNienKhoa")
+        IDHocKy = request.query_params.get("IDHocKy")
 
-        request._request.path = "/api/reporting/baocao/monhoc/"
-        response = BaoCaoMonHocView().get(request)
-        data = response.data
+        if not IDNienKhoa or not IDHocKy:
+            return Response({"detail": "Thiếu IDNienKhoa hoặc IDHocKy"}, status=400)
 
-        # === Đảm bảo lấy đúng tên môn học ===
-        try:
-            ten_mon = MonHoc.objects.get(id=int(IDMonHoc)).TenMonHoc
-        except (ValueError, ObjectDoesNotExist):
-            ten_mon = "Không rõ"
+        IDLopHoc = request.query_params.get("IDLopHoc")
+        dinh_dang = self.dinh_dang_stream(request)
+        if dinh_dang:
+            columns = ["IDHocSinh", "HoTen", "IDLopHoc", "TenLop", "DiemTBHocKy", "KetQua"]
+            rows = dict_rows(columns, dong_diem_tb_hoc_ky(IDNienKhoa, IDHocKy, IDLopHoc))
+            return stream_response(dinh_dang, columns, rows, "diem_tb_hoc_ky")
+        return Response(tinh_diem_tb_hoc_ky(IDNienKhoa, IDHocKy, IDLopHoc))
 
-        try:
-            ten_hocky = HocKy.objects.get(id=int(IDHocKy)).TenHocKy
-        except:
-            ten_hocky = f"Học kỳ {IDHocKy}"
 
-        try:
-            thamso = ThamSo.objects.get(IDNienKhoa=int(IDNienKhoa))
-            nien_khoa = thamso.IDNienKhoa.TenNienKhoa
-        except:
-            nien_khoa = "Không rõ"
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Báo cáo môn học"
-
-        ws.merge_cells("A1:D1")
-        ws["A1"] = "BÁO CÁO TỔNG KẾT MÔN HỌC"
-        ws["A1"].font = Font(size=14, bold=True)
-        ws["A1"].alignment = Alignment(horizontal="center")
-
-        ws["A2"] = f"Niên khóa: {nien_khoa}"
-        ws["B2"] = f"Môn học: {ten_mon}"
-        ws["C2"] = f"Học kỳ: {ten_hocky}"
-        for col in ["A2", "B2", "C2"]:
-            ws[col].font = Font(italic=True)
-
-        headers = ["Lớp", "Sĩ số", "Số lượng đạt", "Tỉ lệ (%)"]
-        style_excel_header(ws, headers)
-
-        for idx, row in enumerate(data, start=6):
-            ws.append([row["TenLop"], row["SiSo"], row["SoLuongDat"], row["TiLe"]])
-
-        style_excel_rows(ws, data_start_row=6)
-        auto_adjust_column_width(ws)
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return HttpResponse(
-            output,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=bao_cao_mon_hoc.xlsx"},
+def tao_file_bao_cao_hoc_ky(params):
+    IDHocKy = params.get("IDHocKy")
+    IDNienKhoa = params.get("IDNienKhoa")
+
+    data = tinh_bao_cao_hoc_ky(IDNienKhoa, IDHocKy)
+    export = _tao_file_bao_cao(
+        "Báo cáo học kỳ", "BÁO CÁO TỔNG KẾT HỌC KỲ",
+        [f"Niên khóa: {_ten_nien_khoa(IDNienKhoa)}", f"Học kỳ: {_ten_hoc_ky(IDHocKy)}"],
+        data,
+    )
+    return export, "bao_cao_hoc_ky.xlsx"
+
+
+class ExportBaoCaoHocKyExcel(XuatFileNenMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    loai_xuat = 'bao_cao_hoc_ky'
+
+    def get(self, request):
+        if not request.query_params.get("IDNienKhoa") or not request.query_params.get("IDHocKy"):
+            return Response({"detail": "Thiếu IDNienKhoa hoặc IDHocKy"}, status=400)
+        if self.xuat_nen(request):
+            return self.tao_tac_vu(request)
+        params = request.query_params
+        content = lay_hoac_tinh(
+            params.get("IDNienKhoa"), ("hocky-excel", params.get("IDHocKy")),
+            lambda: tao_file_bao_cao_hoc_ky(params)[0].to_bytes(),
         )
+        return bytes_response(content, "bao_cao_hoc_ky.xlsx")
 
 
-# ========= API BÁO CÁO HỌC KỲ ==========
-class BaoCaoHocKyView(APIView):
+class PhanBoDiemView(APIView):
+    """
+    Phân bố DiemTB theo môn học của một niên khóa: trung bình, tỉ lệ đạt, phân vị
+    P10..P90 và phổ điểm theo 10 khoảng [0,1) ... [9,10]. Tham số: IDNienKhoa, tùy chọn IDHocKy.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         IDNienKhoa = request.query_params.get("IDNienKhoa")
         IDHocKy = request.query_params.get("IDHocKy")
+        if not IDNienKhoa:
+            return Response({"detail": "Thiếu IDNienKhoa"}, status=400)
+
+        return Response(lay_hoac_tinh(
+            IDNienKhoa, ("phanbo", IDHocKy), lambda: analytics.phan_bo_diem_mon_hoc(IDNienKhoa, IDHocKy),
+        ))
+
+
+# ========= XẾP HẠNG ==========
+# Số dòng mỗi trang mặc định / tối đa của API xếp hạng
+SO_DONG_XEP_HANG = 50
+SO_DONG_XEP_HANG_TOI_DA = 500
+
+
+def _dong_xep_hang(row, diem):
+    return {
+        "IDHocSinh": row['IDHocSinh_id'],
+        "HoTen": f"{row['IDHocSinh__Ho']} {row['IDHocSinh__Ten']}",
+        "IDLopHoc": row['IDLopHoc_id'],
+        "TenLop": row['IDLopHoc__TenLop'],
+        "Diem": round(diem, 2) if diem is not None else None,
+        "Hang": row['Hang'],
+        # Phần trăm học sinh trong nhóm xếp sau: hạng nhất là 100, hạng cuối là 0
+        "PhanVi": round((1 - row['PhanTramHang']) * 100, 2),
+    }
+
+
+def tinh_xep_hang_lop(IDNienKhoa, IDHocKy):
+    return [
+        _dong_xep_hang(row, row['DiemTBHocKy'])
+        for row in xep_hang_lop_queryset(IDNienKhoa, IDHocKy).iterator(chunk_size=CHUNK_SIZE)
+    ]
+
+
+def tinh_xep_hang_khoi(IDNienKhoa, IDHocKy, IDMonHoc):
+    data = []
+    for row in xep_hang_khoi_queryset(IDNienKhoa, IDHocKy, IDMonHoc).iterator(chunk_size=CHUNK_SIZE):
+        dong = _dong_xep_hang(row, row['DiemTB'])
+        dong["IDKhoi"] = row['IDLopHoc__IDKhoi_id']
+        dong["TenKhoi"] = row['IDLopHoc__IDKhoi__TenKhoi']
+        data.append(dong)
+    return data
+
+
+class XepHangMixin:
+    """
+    Phân trang keyset trên bảng xếp hạng đã cache: các dòng được sắp theo
+    (nhóm, Hang, IDHocSinh), con trỏ `cursor` là khóa của dòng cuối trang trước nên
+    mỗi trang chỉ cần tìm nhị phân, không phụ thuộc vị trí trang.
+    Trả về {"next": url trang sau hoặc null, "results": [...]}.
+    """
+    permission_classes = [IsAuthenticated]
+    nhom = None
+
+    def _khoa(self, dong):
+        return (dong[self.nhom], dong["Hang"], dong["IDHocSinh"])
+
+    def phan_trang(self, request, data):
+        try:
+            so_dong = int(request.query_params.get("page_size", SO_DONG_XEP_HANG))
+            cursor = request.query_params.get("cursor")
+            sau = tuple(int(x) for x in cursor.split(".")) if cursor else None
+        except ValueError:
+            return Response({"detail": "Tham số phân trang không hợp lệ"}, status=400)
+        so_dong = min(max(so_dong, 1), SO_DONG_XEP_HANG_TOI_DA)
+
+        bat_dau = bisect_right(data, sau, key=self._khoa) if sau else 0
+        trang = data[bat_dau:bat_dau + so_dong]
+        tiep_theo = None
+        if bat_dau + so_dong < len(data):
+            cursor = ".".join(str(x) for x in self._khoa(trang[-1]))
+            tiep_theo = replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+        return Response({"next": tiep_theo, "results": trang})
+
+
+class XepHangLopView(XepHangMixin, APIView):
+    """
+    Thứ hạng của học sinh trong lớp theo điểm TB học kỳ (RANK, PERCENT_RANK tính bằng window
+    function). Tham số: IDNienKhoa, IDHocKy, tùy chọn IDLopHoc, cursor, page_size.
+    Kết quả cache theo (niên khóa, học kỳ) và tự làm mới khi điểm thay đổi.
+    """
+    nhom = "IDLopHoc"
 
+    def get(self, request):
+        IDNienKhoa = request.query_params.get("IDNienKhoa")
+        IDHocKy = request.query_params.get("IDHocKy")
         if not IDNienKhoa or not IDHocKy:
             return Response({"detail": "Thiếu IDNienKhoa hoặc IDHocKy"}, status=400)
 
-        lop_list = LopHoc.objects.filter(IDNienKhoa=IDNienKhoa)
-        data = []
+        data = lay_hoac_tinh(IDNienKhoa, ("xephang-lop", IDHocKy), lambda: tinh_xep_hang_lop(IDNienKhoa, IDHocKy))
+        IDLopHoc = request.query_params.get("IDLopHoc")
+        if IDLopHoc:
+            data = [dong for dong in data if str(dong["IDLopHoc"]) == IDLopHoc]
+        return self.phan_trang(request, data)
 
-        for lop in lop_list:
-            diem_list = DiemSo.objects.filter(IDLopHoc=lop.id, IDHocKy=IDHocKy)
-            hoc_sinh_ids = diem_list.values_list("IDHocSinh", flat=True).distinct()
-            si_so = len(hoc_sinh_ids)
-            so_luong_dat = 0
-
-            for hs_id in hoc_sinh_ids:
-                diem_hs = diem_list.filter(IDHocSinh_id=hs_id)
-                diem_tbs = [(d.Diem15 + 2 * d.Diem1Tiet) / 3 for d in diem_hs if d.Diem15 is not None and d.Diem1Tiet is not None]
-                if not diem_tbs:
-                    continue
-
-                diem_tb_hocky = sum(diem_tbs) / len(diem_tbs)
-
-                try:
-                    diem_dat_mon = ThamSo.objects.get(IDNienKhoa=IDNienKhoa).DiemDatMon
-                except ThamSo.DoesNotExist:
-                    diem_dat_mon = 5.0
-
-                if diem_tb_hocky >= diem_dat_mon:
-                    so_luong_dat += 1
-
-            ti_le = (so_luong_dat / si_so) * 100 if si_so > 0 else 0
-            if si_so > 0:
-                data.append({
-                    "TenLop": lop.TenLop,
-                    "SiSo": si_so,
-                    "SoLuongDat": so_luong_dat,
-                    "TiLe": round(ti_le, 2),
-                })
 
-        return Response(data)
+class XepHangKhoiView(XepHangMixin, APIView):
+    """
+    Thứ hạng của học sinh trong khối theo DiemTB của một môn học.
+    Tham số: IDNienKhoa, IDHocKy, IDMonHoc, tùy chọn IDKhoi, cursor, page_size.
+    """
+    nhom = "IDKhoi"
+
+    def get(self, request):
+        IDNienKhoa = request.query_params.get("IDNienKhoa")
+        IDHocKy = request.query_params.get("IDHocKy")
+        IDMonHoc = request.query_params.get("IDMonHoc")
+        if not IDNienKhoa or not IDHocKy or not IDMonHoc:
+            return Response({"detail": "Thiếu IDNienKhoa, IDHocKy hoặc IDMonHoc"}, status=400)
+
+        data = lay_hoac_tinh(
+            IDNienKhoa, ("xephang-khoi", IDHocKy, IDMonHoc),
+            lambda: tinh_xep_hang_khoi(IDNienKhoa, IDHocKy, IDMonHoc),
+        )
+        IDKhoi = request.query_params.get("IDKhoi")
+        if IDKhoi:
+            data = [dong for dong in data if str(dong["IDKhoi"]) == IDKhoi]
+        return self.phan_trang(request, data)
 
 
-class ExportBaoCaoHocKyExcel(APIView):
+# ========= HỌC BẠ ==========
+class HocBaView(APIView):
+    """
+    In học bạ hàng loạt: một file ZIP gồm học bạ (XLSX hoặc PDF) của từng học sinh,
+    được gửi dần trong lúc dựng. Tham số: IDNienKhoa, tùy chọn IDLopHoc hoặc IDKhoi,
+    dinh_dang=xlsx|pdf (mặc định xlsx).
+    """
+    permission_classes = [IsAuthenticated, IsBGH | IsGiaoVu]
+
+    def get(self, request):
+        IDNienKhoa = request.query_params.get("IDNienKhoa")
+        IDLopHoc = request.query_params.get("IDLopHoc")
+        IDKhoi = request.query_params.get("IDKhoi")
+        dinh_dang = request.query_params.get("dinh_dang", "xlsx")
+        if not IDNienKhoa:
+            return Response({"detail": "Thiếu IDNienKhoa"}, status=400)
+        if dinh_dang not in DINH_DANG_HOC_BA:
+            return Response({"detail": "Định dạng học bạ phải là xlsx hoặc pdf"}, status=400)
+
+        try:
+            hoc_ba = tai_hoc_ba(IDNienKhoa, IDLopHoc, IDKhoi)
+        except (ValueError, ObjectDoesNotExist):
+            return Response({"detail": "Không tìm thấy niên khóa."}, status=404)
+        if not hoc_ba:
+            return Response({"detail": "Không có học sinh nào trong phạm vi đã chọn."}, status=404)
+
+        response = StreamingHttpResponse(stream_zip_hoc_ba(hoc_ba, dinh_dang), content_type="application/zip")
+        response['Content-Disposition'] = f'attachment; filename="hoc_ba_{dinh_dang}.zip"'
+        return response
+
+
+# ========= DASHBOARD BGH ==========
+class DashboardView(APIView):
+    """
+    Số liệu tổng hợp cho trang chủ BGH trong một request.
+    Mặc định lấy niên khóa mới nhất, hoặc truyền IDNienKhoa.
+    """
+    permission_classes = [IsAuthenticated, IsBGH]
+
+    def get(self, request):
+        IDNienKhoa = request.query_params.get("IDNienKhoa")
+        if IDNienKhoa:
+            nien_khoa = NienKhoa.objects.select_related('thamso').filter(pk=IDNienKhoa).first()
+        else:
+            nien_khoa = nien_khoa_hien_tai()
+        if nien_khoa is None:
+            return Response({"detail": "Không tìm thấy niên khóa."}, status=404)
+
+        return Response(lay_hoac_tinh(
+            nien_khoa.pk, ("dashboard",), lambda: tinh_dashboard(nien_khoa),
+            timeout=min(DASHBOARD_CACHE_TIMEOUT, settings.REPORT_CACHE_TIMEOUT),
+        ))
+
+
+# ========= XU HƯỚNG TỈ LỆ ĐẠT QUA CÁC NĂM ==========
+def _nien_khoa_da_dong(nien_khoa, moi_nhat):
+    """Niên khóa cũ đã khóa nhập điểm cả hai học kỳ thì dữ liệu điểm không còn thay đổi."""
+    if nien_khoa.pk == moi_nhat.pk:
+        return False
+    thamso = getattr(nien_khoa, 'thamso', None)
+    return thamso is None or not (thamso.ChoPhepSuaDiemHK1 or thamso.ChoPhepSuaDiemHK2)
+
+
+def tinh_xu_huong_mon_hoc(IDNienKhoa, IDHocKy=None):
+    """Tỉ lệ đạt và điểm TB trung bình theo (tên môn, khối) và theo tên môn của một niên khóa."""
+    theo_khoi, theo_mon = [], {}
+    for row in xu_huong_mon_hoc_queryset(IDNienKhoa, IDHocKy):
+        theo_khoi.append({
+            "TenMonHoc": row['IDMonHoc__TenMonHoc'],
+            "IDKhoi": row['IDLopHoc__IDKhoi_id'],
+            "TenKhoi": row['IDLopHoc__IDKhoi__TenKhoi'],
+            "SoDiem": row['SoDiem'],
+            "SoLuongDat": row['SoLuongDat'],
+            "TiLe": round(row['SoLuongDat'] / row['SoDiem'] * 100, 2) if row['SoDiem'] else 0,
+            "DiemTBTrungBinh": round(row['TongDiemTB'] / row['SoDiemTB'], 2) if row['SoDiemTB'] else None,
+        })
+        # Gộp các khối của cùng một môn, trung bình có trọng số theo số dòng điểm
+        mon = theo_mon.setdefault(row['IDMonHoc__TenMonHoc'], [0, 0, 0, 0.0])
+        mon[0] += row['SoDiem']
+        mon[1] += row['SoLuongDat']
+        mon[2] += row['SoDiemTB']
+        mon[3] += row['TongDiemTB'] or 0
+
+    return {
+        "TheoMonHoc": [
+            {
+                "TenMonHoc": ten, "SoDiem": so_diem, "SoLuongDat": so_dat,
+                "TiLe": round(so_dat / so_diem * 100, 2) if so_diem else 0,
+                "DiemTBTrungBinh": round(tong / so_tb, 2) if so_tb else None,
+            }
+            for ten, (so_diem, so_dat, so_tb, tong) in theo_mon.items()
+        ],
+        "TheoKhoi": theo_khoi,
+    }
+
+
+class XuHuongMonHocView(APIView):
+    """
+    Tỉ lệ đạt và điểm TB theo tên môn học và theo khối cho mọi niên khóa, để so sánh
+    giữa các năm. Tùy chọn: IDHocKy. Khi cache dùng chung giữa các worker (REPORT_CACHE_DIR),
+    kết quả của niên khóa đã đóng được cache vĩnh viễn (mọi thay đổi dữ liệu vẫn đổi phiên bản
+    cache của niên khóa đó); với cache trong tiến trình thì hết hạn sau REPORT_CACHE_TIMEOUT.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         IDHocKy = request.query_params.get("IDHocKy")
-        IDNienKhoa = request.query_params.get("IDNienKhoa")
+        nien_khoa_list = list(NienKhoa.objects.select_related('thamso').order_by('TenNienKhoa'))
+        if not nien_khoa_list:
+            return Response([])
+        moi_nhat = nien_khoa_list[-1]
 
-        request._request.path = "/api/reporting/baocao/hocky/"
-        response = BaoCaoHocKyView().get(request)
-        data = response.data
+        cache_vinh_vien = dung_chung()
+        data = []
+        for nien_khoa in nien_khoa_list:
+            da_dong = _nien_khoa_da_dong(nien_khoa, moi_nhat)
+            ket_qua = lay_hoac_tinh(
+                nien_khoa.pk, ("xuhuong-monhoc", IDHocKy),
+                lambda: tinh_xu_huong_mon_hoc(nien_khoa.pk, IDHocKy),
+                **({'timeout': None} if da_dong and cache_vinh_vien else {}),
+            )
+            data.append({
+                "IDNienKhoa": nien_khoa.pk,
+                "TenNienKhoa": nien_khoa.TenNienKhoa,
+                "DaDong": da_dong,
+                **ket_qua,
+            })
+        return Response(data)
 
-        try:
-            ten_hocky = HocKy.objects.get(id=int(IDHocKy)).TenHocKy
-        except:
-            ten_hocky = f"Học kỳ {IDHocKy}"
 
-        try:
-            thamso = ThamSo.objects.get(IDNienKhoa=int(IDNienKhoa))
-            nien_khoa = thamso.IDNienKhoa.TenNienKhoa
-        except:
-            nien_khoa = "Không rõ"
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Báo cáo học kỳ"
-
-        ws.merge_cells("A1:D1")
-        ws["A1"] = "BÁO CÁO TỔNG KẾT HỌC KỲ"
-        ws["A1"].font = Font(size=14, bold=True)
-        ws["A1"].alignment = Alignment(horizontal="center")
-
-        ws["A2"] = f"Niên khóa: {nien_khoa}"
-        ws["B2"] = f"Học kỳ: {ten_hocky}"
-        for col in ["A2", "B2"]:
-            ws[col].font = Font(italic=True)
-
-        headers = ["Lớp", "Sĩ số", "Số lượng đạt", "Tỉ lệ (%)"]
-        style_excel_header(ws, headers)
-
-        for idx, row in enumerate(data, start=6):
-            ws.append([row["TenLop"], row["SiSo"], row["SoLuongDat"], row["TiLe"]])
-
-        style_excel_rows(ws, data_start_row=6)
-        auto_adjust_column_width(ws)
-
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return HttpResponse(
-            output,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=bao_cao_hoc_ky.xlsx"},
-        )
+# ========= TÁC VỤ XUẤT FILE CHẠY NỀN ==========
+class TacVuXuatFileMixin:
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Người dùng chỉ xem được tác vụ do mình tạo; không tải cột NoiDung khi chỉ xem trạng thái
+        return TacVuXuatFile.objects.filter(NguoiTao=self.request.user).defer('NoiDung')
+
+
+class TacVuXuatFileDetailView(TacVuXuatFileMixin, generics.RetrieveAPIView):
+    """Trạng thái và tiến độ (0-100) của một tác vụ xuất file."""
+    serializer_class = TacVuXuatFileSerializer
+
+
+class TaiFileTacVuXuatView(TacVuXuatFileMixin, APIView):
+    def get(self, request, pk):
+        tac_vu = self.get_queryset().filter(pk=pk).first()
+        if tac_vu is None:
+            return Response({"detail": "Không tìm thấy tác vụ."}, status=404)
+        if tac_vu.TrangThai != TacVuXuatFile.HOAN_THANH:
+            return Response(
+                {"detail": "File chưa sẵn sàng.", "TrangThai": tac_vu.TrangThai, "TienDo": tac_vu.TienDo},
+                status=409,
+            )
+        return bytes_response(bytes(tac_vu.NoiDung), tac_vu.TenFile)
@@ -0,0 +1,269 @@
+# students/intake.py
+"""
+Tiếp nhận học sinh hàng loạt từ file Excel (.xlsx) hoặc CSV.
+
+- File được đọc lần lượt từng dòng (openpyxl read_only / csv reader), không nạp cả workbook.
+- ThamSo của niên khóa tiếp nhận được đọc một lần; tuổi tại ngày 1/9 của năm bắt đầu
+  niên khóa được tính cho mọi dòng cùng lúc trên mảng datetime64 của NumPy.
+- Email được kiểm tra trùng trong file và với CSDL bằng một tập email đã có.
+- Các dòng hợp lệ được thêm bằng bulk_create theo lô; lỗi được trả về theo số dòng.
+"""
+import codecs
+import csv
+import io
+import unicodedata
+from datetime import date, datetime
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from openpyxl import load_workbook
+
+from accounts.search import bo_dau, gan_khoa_tim_kiem
+from classes.autocomplete import tang_phien_ban_goi_y
+from classes.models import Khoi
+from configurations.models import ThamSo
+from .models import HocSinh
+
+BATCH_SIZE = 500
+
+# Số email mỗi truy vấn IN (SQL Server giới hạn 2100 tham số)
+EMAIL_MOI_TRUY_VAN = 1000
+
+# Tiêu đề cột (đã bỏ dấu, bỏ khoảng trắng) -> trường của HocSinh
+COT = {
+    'ho': 'Ho', 'ten': 'Ten', 'gioitinh': 'GioiTinh', 'ngaysinh': 'NgaySinh',
+    'diachi': 'DiaChi', 'email': 'Email', 'khoidukien': 'KhoiDuKien', 'khoi': 'KhoiDuKien',
+}
+COT_BAT_BUOC = ('Ho', 'Ten', 'GioiTinh', 'NgaySinh', 'DiaChi')
+
+GIOI_TINH = {bo_dau(g): g for g, _ in HocSinh.GENDER_CHOICES}
+DINH_DANG_NGAY = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y')
+
+# Mã hóa thử lần lượt cho file CSV: Excel trên Windows lưu "CSV" tiếng Việt bằng cp1258
+MA_HOA_CSV = ('utf-8-sig', 'cp1258')
+
+
+class LoiFile(Exception):
+    """File không đọc được hoặc thiếu cột bắt buộc."""
+
+
+def _ma_hoa_csv(file):
+    """Mã hóa đầu tiên trong MA_HOA_CSV giải mã được cả file (đọc từng khối, không nạp cả file)."""
+    for ma_hoa in MA_HOA_CSV:
+        decoder = codecs.getincrementaldecoder(ma_hoa)()
+        file.seek(0)
+        try:
+            for khoi in iter(lambda: file.read(64 * 1024), b''):
+                decoder.decode(khoi)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            continue
+        file.seek(0)
+        return ma_hoa
+    raise LoiFile("Không đọc được file CSV: hãy lưu file với mã hóa UTF-8 (CSV UTF-8).")
+
+
+def doc_dong(file, ten_file):
+    """Các dòng (số dòng trong file, list giá trị) kể cả dòng tiêu đề."""
+    if ten_file.lower().endswith('.csv'):
+        reader = csv.reader(io.TextIOWrapper(file, encoding=_ma_hoa_csv(file), newline=''))
+        # cp1258 ghi dấu thanh thành ký tự tổ hợp riêng: chuẩn hóa NFC trước khi lưu/so khớp
+        for so_dong, values in enumerate(reader, 1):
+            yield so_dong, [unicodedata.normalize('NFC', v) for v in values]
+        return
+    try:
+        wb = load_workbook(file, read_only=True, data_only=True)
+    except Exception:
+        raise LoiFile("Không đọc được file. Chỉ hỗ trợ .xlsx hoặc .csv.")
+    try:
+        for so_dong, values in enumerate(wb.worksheets[0].iter_rows(values_only=True), 1):
+            yield so_dong, list(values)
+    finally:
+        wb.close()
+
+
+def _chuoi(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _ngay(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = _chuoi(value)
+    for fmt in DINH_DANG_NGAY:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _khoi_theo_ten():
+    khoi = {}
+    for id, ten in Khoi.objects.values_list('id', 'TenKhoi'):
+        khoi[bo_dau(ten)] = id
+        # "10" hoặc "Khối 10" đều được
+        khoi[bo_dau(ten).replace('khoi ', '')] = id
+    return khoi
+
+
+class TiepNhanHocSinh:
+    """
+        ket_qua = TiepNhanHocSinh(nien_khoa).doc(file, ten_file)
+        ket_qua.them()
+    """
+
+    def __init__(self, nien_khoa, khoi_mac_dinh=None):
+        self.nien_khoa = nien_khoa
+        self.khoi_mac_dinh = khoi_mac_dinh
+        self.so_dong = 0
+        self.hop_le = []   # (số dòng, dict trường)
+        self.loi = {}      # số dòng -> [thông báo]
+
+    def _them_loi(self, so_dong, thong_bao):
+        self.loi.setdefault(so_dong, []).append(thong_bao)
+
+    # ---- Đọc và kiểm tra từng dòng ----
+    def doc(self, file, ten_file):
+        khoi = _khoi_theo_ten()
+        cot = None
+        for so_dong, values in doc_dong(file, ten_file):
+            if cot is None:
+                cot = {i: COT.get(bo_dau(_chuoi(v)).replace(' ', '')) for i, v in enumerate(values)}
+                thieu = [c for c in COT_BAT_BUOC if c not in cot.values()]
+                if thieu:
+                    raise LoiFile(f"Thiếu cột bắt buộc: {', '.join(thieu)}")
+                continue
+            if all(_chuoi(v) == "" for v in values):
+                continue
+            self.so_dong += 1
+            dong = {truong: values[i] for i, truong in cot.items() if truong and i < len(values)}
+            hs = self._kiem_tra_dong(so_dong, dong, khoi)
+            if hs is not None:
+                self.hop_le.append((so_dong, hs))
+        if cot is None:
+            raise LoiFile("File không có dữ liệu.")
+
+        self._kiem_tra_tuoi()
+        self._kiem_tra_email()
+        self.hop_le = [(so_dong, hs) for so_dong, hs in self.hop_le if so_dong not in self.loi]
+        return self
+
+    def _kiem_tra_dong(self, so_dong, dong, khoi):
+        hs = {}
+        for truong, max_length in (('Ho', 50), ('Ten', 50), ('DiaChi', 255)):
+            value = _chuoi(dong.get(truong))
+            if not value:
+                self._them_loi(so_dong, f"{truong} không được để trống.")
+            elif len(value) > max_length:
+                self._them_loi(so_dong, f"{truong} dài quá {max_length} ký tự.")
+            hs[truong] = value
+
+        gioi_tinh = GIOI_TINH.get(bo_dau(_chuoi(dong.get('GioiTinh'))))
+        if gioi_tinh is None:
+            self._them_loi(so_dong, "Giới tính phải là Nam, Nữ hoặc Khác.")
+        hs['GioiTinh'] = gioi_tinh
+
+        ngay_sinh = _ngay(dong.get('NgaySinh'))
+        if ngay_sinh is None:
+            self._them_loi(so_dong, "Ngày sinh không hợp lệ (dd/mm/yyyy).")
+        hs['NgaySinh'] = ngay_sinh
+
+        email = _chuoi(dong.get('Email')) or None
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                self._them_loi(so_dong, f"Email '{email}' không hợp lệ.")
+        hs['Email'] = email
+
+        ten_khoi = _chuoi(dong.get('KhoiDuKien'))
+        if ten_khoi:
+            hs['KhoiDuKien_id'] = khoi.get(bo_dau(ten_khoi))
+            if hs['KhoiDuKien_id'] is None:
+                self._them_loi(so_dong, f"Không có khối '{ten_khoi}'.")
+        else:
+            hs['KhoiDuKien_id'] = self.khoi_mac_dinh
+
+        return None if so_dong in self.loi else hs
+
+    # ---- Kiểm tra trên cả lô ----
+    def _kiem_tra_tuoi(self):
+        """Tuổi tại 1/9 năm bắt đầu niên khóa, tính cùng lúc cho mọi dòng (như HocSinh.clean)."""
+        if not self.hop_le:
+            return
+        tham_so = ThamSo.objects.get(IDNienKhoa=self.nien_khoa)
+        moc = date(int(self.nien_khoa.TenNienKhoa.split('-')[0]), 9, 1)
+
+        ngay_sinh = np.array([hs['NgaySinh'] for _, hs in self.hop_le], dtype='datetime64[D]')
+        nam = ngay_sinh.astype('datetime64[Y]').astype(np.int64) + 1970
+        thang = ngay_sinh.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        ngay = (ngay_sinh - ngay_sinh.astype('datetime64[M]')).astype(np.int64) + 1
+        tuoi = moc.year - nam - ((moc.month * 100 + moc.day) < (thang * 100 + ngay))
+
+        tuong_lai = ngay_sinh > np.datetime64(date.today())
+        sai_tuoi = (tuoi < tham_so.TuoiToiThieu) | (tuoi > tham_so.TuoiToiDa)
+        for k in np.flatnonzero(tuong_lai | sai_tuoi):
+            so_dong = self.hop_le[k][0]
+            if tuong_lai[k]:
+                self._them_loi(so_dong, "Ngày sinh không được lớn hơn ngày hiện tại.")
+            else:
+                self._them_loi(
+                    so_dong,
+                    f"Tuổi của học sinh ({tuoi[k]} tuổi) tại thời điểm tiếp nhận ({moc.strftime('%d/%m/%Y')}) "
+                    f"không nằm trong khoảng quy định ({tham_so.TuoiToiThieu}-{tham_so.TuoiToiDa} tuổi).",
+                )
+
+    def _kiem_tra_email(self):
+        """Email trùng trong file hoặc đã có trong CSDL (không phân biệt hoa thường)."""
+        emails = list({hs['Email'].lower() for _, hs in self.hop_le if hs['Email']})
+        da_co = set()
+        # So sánh trên LOWER(Email) để không phụ thuộc collation của CSDL
+        email_da_co = HocSinh.objects.annotate(EmailThuong=Lower('Email'))
+        for i in range(0, len(emails), EMAIL_MOI_TRUY_VAN):
+            da_co.update(
+                email_da_co.filter(EmailThuong__in=emails[i:i + EMAIL_MOI_TRUY_VAN])
+                .values_list('EmailThuong', flat=True)
+            )
+
+        trong_file = {}
+        for so_dong, hs in self.hop_le:
+            if not hs['Email']:
+                continue
+            email = hs['Email'].lower()
+            if email in da_co:
+                self._them_loi(so_dong, f"Địa chỉ email {hs['Email']} đã được sử dụng.")
+            elif email in trong_file:
+                self._them_loi(so_dong, f"Email {hs['Email']} trùng với dòng {trong_file[email]}.")
+            else:
+                trong_file[email] = so_dong
+
+    # ---- Ghi ----
+    def them(self):
+        """
+        Thêm các dòng hợp lệ bằng bulk_create theo lô, trả về số học sinh đã thêm. Ném
+        IntegrityError (không thêm dòng nào) nếu một email vừa được thêm cùng lúc ở nơi khác.
+        """
+        hoc_sinh = []
+        for _, hs in self.hop_le:
+            obj = HocSinh(IDNienKhoaTiepNhan=self.nien_khoa, **hs)
+            gan_khoa_tim_kiem(obj)
+            hoc_sinh.append(obj)
+        with transaction.atomic():
+            for i in range(0, len(hoc_sinh), BATCH_SIZE):
+                HocSinh.objects.bulk_create(hoc_sinh[i:i + BATCH_SIZE])
+            # bulk_create không phát signal: tự làm cũ chỉ mục gợi ý
+            tang_phien_ban_goi_y(self.nien_khoa.pk)
+        return len(hoc_sinh)
+
+    def danh_sach_loi(self):
+        return [{"Dong": so_dong, "Loi": loi} for so_dong, loi in sorted(self.loi.items())]
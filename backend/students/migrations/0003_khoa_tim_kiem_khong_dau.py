@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:14
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def bo_dau(value):
+    # Chép từ accounts.search.bo_dau để migration không đổi theo mã ứng dụng
+    value = unicodedata.normalize('NFD', value or '').replace('đ', 'd').replace('Đ', 'D')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(value.lower().split())
+
+
+def tao_khoa_tim_kiem(apps, schema_editor):
+    HocSinh = apps.get_model('students', 'HocSinh')
+    batch = []
+    for obj in HocSinh.objects.only('id', 'Ho', 'Ten').iterator(chunk_size=2000):
+        obj.HoTenKhongDau = bo_dau(f"{obj.Ho} {obj.Ten}")
+        obj.TenKhongDau = bo_dau(obj.Ten)
+        batch.append(obj)
+        if len(batch) >= 2000:
+            HocSinh.objects.bulk_update(batch, ['HoTenKhongDau', 'TenKhongDau'])
+            batch = []
+    if batch:
+        HocSinh.objects.bulk_update(batch, ['HoTenKhongDau', 'TenKhongDau'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_hocsinh_khoidukien_alter_hocsinh_gioitinh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hocsinh',
+            name='HoTenKhongDau',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=101),
+        ),
+        migrations.AddField(
+            model_name='hocsinh',
+            name='TenKhongDau',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=50),
+        ),
+        migrations.RunPython(tao_khoa_tim_kiem, migrations.RunPython.noop),
+    ]
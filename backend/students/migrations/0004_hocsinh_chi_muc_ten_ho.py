@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0002_lophoc_hocsinh_nien_khoa'),
+        ('configurations', '0005_remove_thamso_chophepsuadiem_remove_thamso_ghichu_and_more'),
+        ('students', '0003_khoa_tim_kiem_khong_dau'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hocsinh',
+            index=models.Index(fields=['Ten', 'Ho', 'id'], name='IX_HOCSINH_TEN_HO'),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from datetime import date
 from configurations.models import ThamSo # Import ThamSo để kiểm tra tuổi
+from accounts.search import gan_khoa_tim_kiem
 
 class HocSinh(models.Model):
     Ho = models.CharField(max_length=50)
@@ -20,9 +21,27 @@ class HocSinh(models.Model):
     IDNienKhoaTiepNhan = models.ForeignKey('configurations.NienKhoa', on_delete=models.PROTECT)
     # ID này phải trỏ rõ ràng đến app 'classes'
     KhoiDuKien = models.ForeignKey('classes.Khoi', on_delete=models.PROTECT, null=True, blank=True) 
+    # Họ tên / tên không dấu, chữ thường để tìm kiếm theo tiền tố (accounts/search.py)
+    HoTenKhongDau = models.CharField(max_length=101, blank=True, default='', editable=False, db_index=True)
+    TenKhongDau = models.CharField(max_length=50, blank=True, default='', editable=False, db_index=True)
+
+    # Các trường có trong chỉ mục gợi ý (classes/autocomplete.py): chỉ khi một trong số này
+    # đổi thì chỉ mục mới phải dựng lại
+    TRUONG_GOI_Y = ('Ho', 'Ten', 'Email', 'GioiTinh', 'NgaySinh', 'KhoiDuKien_id', 'IDNienKhoaTiepNhan_id')
 
     def __str__(self): return f"{self.Ho} {self.Ten}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Giá trị lúc đọc từ CSDL, để signal so sánh mà không phải truy vấn lại
+        if not instance.get_deferred_fields() & set(cls.TRUONG_GOI_Y):
+            instance._goi_y_cu = instance.gia_tri_goi_y()
+        return instance
+
+    def gia_tri_goi_y(self):
+        return tuple(getattr(self, truong) for truong in self.TRUONG_GOI_Y)
+
     def clean(self):
         super().clean()
         if not self.IDNienKhoaTiepNhan:
@@ -56,7 +75,15 @@ class HocSinh(models.Model):
             )
         
     def save(self, *args, **kwargs):
+        gan_khoa_tim_kiem(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'HoTenKhongDau', 'TenKhongDau'}
         self.full_clean()
         super().save(*args, **kwargs)
 
-    class Meta: db_table = 'HOCSINH'
\ No newline at end of file
+    class Meta:
+        db_table = 'HOCSINH'
+        indexes = [
+            # Thứ tự Ten, Ho của tra cứu học sinh và khóa phân trang keyset của nó
+            models.Index(fields=['Ten', 'Ho', 'id'], name='IX_HOCSINH_TEN_HO'),
+        ]
\ No newline at end of file
@@ -13,7 +13,7 @@ class HocSinhSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = HocSinh
-        fields = '__all__'
+        exclude = ['HoTenKhongDau', 'TenKhongDau']
         extra_kwargs = {
             'Email': {
                 'error_messages': {
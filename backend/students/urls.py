@@ -5,6 +5,7 @@ from . import views
 
 urlpatterns = [
     path('hocsinh/', views.HocSinhListCreateView.as_view(), name='hocsinh-list-create'),
+    path('hocsinh/nhap-file/', views.TiepNhanHocSinhFileView.as_view(), name='hocsinh-nhap-file'),
     path('hocsinh/<int:pk>/', views.HocSinhDetailView.as_view(), name='hocsinh-detail'),
     
    
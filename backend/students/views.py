@@ -1,24 +1,32 @@
 # students/views.py
 
-from rest_framework import generics, status, filters
+from rest_framework import generics, status
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from accounts.permissions import IsBGH, IsGiaoVu, IsGiaoVien
+from accounts.pagination import KeysetPagination
+from accounts.search import TimKiemKhongDauFilter
 
 from .models import HocSinh
 from .serializers import HocSinhSerializer
+from .intake import LoiFile, TiepNhanHocSinh
 
 
-from configurations.models import NienKhoa
+from configurations.models import NienKhoa, ThamSo
 from configurations.serializers import NienKhoaSerializer
 from classes.models import Khoi
 from classes.serializers import KhoiSerializer
 
+from django.db import IntegrityError
 from django.db.models import Avg, Subquery, OuterRef, FloatField, CharField
 from django.db.models.functions import Round
 from .serializers import HocSinhSerializer, TraCuuHocSinhSerializer
 from grading.models import DiemSo, HocKy
 from classes.models import LopHoc, LopHoc_HocSinh
+from reporting.streaming import CHUNK_SIZE, StreamExportMixin, stream_response
 
 class HocSinhListCreateView(generics.ListCreateAPIView):
     queryset = HocSinh.objects.select_related('IDNienKhoaTiepNhan', 'KhoiDuKien').all()
@@ -26,8 +34,10 @@ class HocSinhListCreateView(generics.ListCreateAPIView):
    
     permission_classes = [IsAuthenticated, IsBGH | IsGiaoVu] # Hoặc [IsAuthenticated, IsBGH | IsGiaoVu] nếu có IsGiaoVu
 
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['Ho', 'Ten', 'Email']
+    # ?search= theo tiền tố họ tên không dấu (hoặc Email nếu có '@')
+    filter_backends = [TimKiemKhongDauFilter]
+    tim_kiem_email = True
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -70,6 +80,55 @@ class HocSinhDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 
+class TiepNhanHocSinhFileView(APIView):
+    """
+    Tiếp nhận học sinh hàng loạt từ file .xlsx/.csv (multipart): file, IDNienKhoaTiepNhan,
+    tùy chọn KhoiDuKien (id khối mặc định cho dòng không ghi khối) và bo_qua_loi=1.
+    Cột: Ho, Ten, GioiTinh, NgaySinh, DiaChi, Email, KhoiDuKien (tiêu đề có dấu cũng được).
+    Mặc định file có dòng lỗi thì không thêm dòng nào; bo_qua_loi=1 thì vẫn thêm các dòng hợp lệ.
+    """
+    permission_classes = [IsAuthenticated, IsBGH | IsGiaoVu]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        file = request.FILES.get('file')
+        IDNienKhoa = request.data.get('IDNienKhoaTiepNhan')
+        if file is None:
+            return Response({"detail": "Thiếu file."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            nien_khoa = NienKhoa.objects.get(pk=IDNienKhoa)
+        except (NienKhoa.DoesNotExist, ValueError, TypeError):
+            return Response({"detail": "Không tìm thấy niên khóa."}, status=status.HTTP_404_NOT_FOUND)
+        if not ThamSo.objects.filter(IDNienKhoa=nien_khoa).exists():
+            return Response({"detail": "Không tìm thấy quy định (ThamSo) cho niên khóa tiếp nhận."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        khoi_mac_dinh = request.data.get('KhoiDuKien') or None
+        if khoi_mac_dinh is not None and not Khoi.objects.filter(pk=khoi_mac_dinh).exists():
+            return Response({"detail": "Không tìm thấy khối dự kiến."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tiep_nhan = TiepNhanHocSinh(nien_khoa, khoi_mac_dinh).doc(file, file.name)
+        except LoiFile as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        loi = tiep_nhan.danh_sach_loi()
+        if loi and request.data.get('bo_qua_loi') not in ('1', 'true'):
+            return Response({
+                "detail": f"Có {len(loi)} dòng không hợp lệ, chưa thêm học sinh nào.",
+                "SoDong": tiep_nhan.so_dong, "DaThem": 0, "Loi": loi,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            da_them = tiep_nhan.them()
+        except IntegrityError:
+            # Email trùng với học sinh vừa được thêm sau bước kiểm tra
+            return Response({"detail": "Dữ liệu học sinh vừa thay đổi (trùng email), vui lòng gửi lại file."},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({"SoDong": tiep_nhan.so_dong, "DaThem": da_them, "Loi": loi},
+                        status=status.HTTP_201_CREATED)
+
+
 class NienKhoaFilterListView(generics.ListAPIView):
     queryset = NienKhoa.objects.all().order_by('-TenNienKhoa') # Sắp xếp niên khóa mới nhất lên đầu
     serializer_class = NienKhoaSerializer
@@ -80,16 +139,20 @@ class KhoiFilterListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsBGH | IsGiaoVu] 
 
 
-class TraCuuHocSinhView(generics.ListAPIView):
+class TraCuuHocSinhView(StreamExportMixin, generics.ListAPIView):
     """
     API tra cứu học sinh toàn diện:
     - Bắt buộc: `nien_khoa_id`
-    - Tùy chọn: `khoi_id`, `lophoc_id`, `search`
+    - Tùy chọn: `khoi_id`, `lophoc_id`, `search`, `format` (csv | ndjson),
+      `cursor` / `page_size` / `estimate_total` (phân trang keyset)
     """
     serializer_class = TraCuuHocSinhSerializer
     permission_classes = [IsAuthenticated] # Mọi người dùng đã đăng nhập đều có thể tra cứu
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['Ho', 'Ten'] # Tìm kiếm theo Họ và Tên
+    filter_backends = [TimKiemKhongDauFilter] # Tìm kiếm theo tiền tố Họ tên / Tên, không dấu
+    pagination_class = KeysetPagination
+    # Khi phân trang giữ đúng thứ tự Ten, Ho của danh sách không phân trang (id để khóa duy nhất,
+    # chỉ mục IX_HOCSINH_TEN_HO)
+    keyset_ordering = ('Ten', 'Ho', 'id')
 
     def get_queryset(self):
         # Lấy các tham số từ query string
@@ -153,4 +216,22 @@ class TraCuuHocSinhView(generics.ListAPIView):
 
     def get_serializer_context(self):
         # Không cần truyền context tên lớp nữa vì đã annotate trực tiếp
-        return super().get_serializer_context()
\ No newline at end of file
+        return super().get_serializer_context()
+
+    def list(self, request, *args, **kwargs):
+        dinh_dang = self.dinh_dang_stream(request)
+        if not dinh_dang:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # DiemTB_HK1/HK2 chỉ được annotate khi có học kỳ tương ứng
+        cot_diem = [c for c in ('DiemTB_HK1', 'DiemTB_HK2') if c in queryset.query.annotations]
+        rows = queryset.values_list('id', 'Ho', 'Ten', 'TenLop', *cot_diem).iterator(chunk_size=CHUNK_SIZE)
+        return stream_response(
+            dinh_dang, TraCuuHocSinhSerializer.Meta.fields,
+            (
+                (hs_id, f"{ho} {ten}", ten_lop, *(diem + [None] * (2 - len(diem))))
+                for hs_id, ho, ten, ten_lop, *diem in rows
+            ),
+            "tra_cuu_hoc_sinh",
+        )
\ No newline at end of file
@@ -23,7 +23,11 @@ class MonHocSerializer(serializers.ModelSerializer):
         validators = []
 
     def get_is_deletable(self, obj):
-        return not LopHoc_MonHoc.objects.filter(IDMonHoc=obj).exists()
+        # Các danh sách đã annotate DaGanLop thì không cần truy vấn thêm cho từng môn
+        da_gan_lop = getattr(obj, 'DaGanLop', None)
+        if da_gan_lop is None:
+            da_gan_lop = LopHoc_MonHoc.objects.filter(IDMonHoc=obj).exists()
+        return not da_gan_lop
     
     # THÊM PHƯƠNG THỨC VALIDATE NÀY
     def validate(self, data):
@@ -1,8 +1,10 @@
 # subjects/views.py
 from rest_framework import generics, filters # Thêm filters
+from django.db.models import Exists, OuterRef
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.exceptions import PermissionDenied
 from accounts.permissions import IsBGH, IsGiaoVu # Import thêm IsGiaoVu
+from accounts.pagination import KeysetPagination
 from .models import ToHop, MonHoc
 from .serializers import ToHopSerializer, MonHocSerializer
 
@@ -23,10 +25,15 @@ class MonHocListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, IsBGH | IsGiaoVu]
     filter_backends = [filters.SearchFilter]
     search_fields = ['TenMonHoc']
+    pagination_class = KeysetPagination
+    # Khi phân trang giữ thứ tự tên môn của danh sách không phân trang
+    keyset_ordering = ('TenMonHoc', 'id')
 
     def get_queryset(self):
         # ... (logic get_queryset giữ nguyên) ...
-        queryset = MonHoc.objects.select_related('IDNienKhoa', 'IDToHop').all()
+        queryset = MonHoc.objects.select_related('IDNienKhoa', 'IDToHop').annotate(
+            DaGanLop=Exists(LopHoc_MonHoc.objects.filter(IDMonHoc=OuterRef('pk')))
+        )
         
         nienkhoa_id = self.request.query_params.get('nienkhoa_id')
         if not nienkhoa_id:
@@ -216,19 +216,20 @@ const NhapDiemHocSinh = () => {
         const filtersAtSaveStart = { ...filters };
 
         setLoading(true);
-        const promises = hocSinhData.map(hs =>
-            api.post("/api/grading/diemso/cap-nhat/", {
+        // Gửi toàn bộ bảng điểm trong một request thay vì mỗi học sinh một request
+        const request = api.post("/api/grading/diemso/cap-nhat-hang-loat/", {
+            IDLopHoc: filters.lopHoc,
+            IDMonHoc: filters.monHoc,
+            IDHocKy: filters.hocKy,
+            DanhSachDiem: hocSinhData.map(hs => ({
                 IDHocSinh: hs.id,
-                IDLopHoc: filters.lopHoc,
-                IDMonHoc: filters.monHoc,
-                IDHocKy: filters.hocKy,
                 Diem15: getNumericValue(hs.Diem15),
                 Diem1Tiet: getNumericValue(hs.Diem1Tiet)
-            })
-        );
+            }))
+        });
         
         try {
-            await toast.promise(Promise.all(promises), {
+            await toast.promise(request, {
               pending: 'Đang lưu điểm...',
               success: 'Lưu điểm thành công!',
               error: 'Có lỗi xảy ra khi lưu điểm!'